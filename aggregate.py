@@ -0,0 +1,141 @@
+"""
+Batch aggregation of shopping lists for large meal plans. Repeated recipes
+are first combined into one entry scaled by their total servings, then
+ingredient names are factorised to integer codes and amounts summed per
+code with NumPy, falling back to pure Python when NumPy is not installed.
+"""
+
+from array import array
+
+from recipe import Recipe, ScaledRecipe, servings_of
+from units import from_base
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def factorise(recipes) -> tuple[array, array, list[tuple[str, str, str]]]:
+    """
+    Assigns an integer code to every distinct (name, dimension) pair in the
+    recipes, in first-seen order. Codes for a recipe are worked out once
+    however many times it appears in the plan.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings.
+
+    Return: Tuple of the code of each ingredient, the base amount of each
+    ingredient scaled by its recipe's servings and, per code, its
+    (name, dimension, first measure).
+
+    Example:
+    >>> codes, amounts, labels = factorise([PEANUT_BUTTER, PEANUT_BUTTER])
+    >>> list(codes)
+    [0, 1, 2, 0, 1, 2]
+    >>> labels
+    [('peanuts', 'mass', 'g'), ('salt', 'volume', 'tsp'), ('oil', 'volume', 'tsp')]
+    """
+    code_of = {}
+    labels = []
+    recipe_codes = {}
+    codes = array('q')
+    amounts = array('d')
+    for recipe in recipes:
+        recipe, servings = servings_of(recipe)
+        entry = recipe_codes.get(id(recipe))
+        if entry is None:
+            ingredient_codes = array('q')
+            for ingredient in recipe.ingredients:
+                key = (ingredient.name, ingredient.dimension)
+                code = code_of.get(key)
+                if code is None:
+                    code = code_of[key] = len(labels)
+                    labels.append((ingredient.name, ingredient.dimension,
+                                   ingredient.measure))
+                ingredient_codes.append(code)
+            # Holds on to the recipe so its id cannot be reused
+            entry = recipe_codes[id(recipe)] = (recipe, ingredient_codes)
+        codes.extend(entry[1])
+        if servings == 1.0:
+            amounts.extend(recipe.base_amounts)
+        else:
+            # Scales the pre-parsed amounts in one call
+            amounts.extend(map(servings.__mul__, recipe.base_amounts))
+    return codes, amounts, labels
+
+
+def combine_servings(recipes) -> list[Recipe | ScaledRecipe]:
+    """
+    Collapses a meal plan so each recipe appears once, scaled by the total
+    number of times it is made, keeping first-seen order.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings.
+
+    Return: List of Recipe objects for recipes made once and ScaledRecipe
+    entries for the rest.
+
+    Example:
+    >>> combine_servings([PEANUT_BUTTER, SEITAN, PEANUT_BUTTER])
+    [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil') x 2,
+    ('seitan', '1 cup vital wheat gluten,...')]
+    """
+    # Maps the id of each compiled recipe to [recipe, total servings];
+    # the recipe is held so its id cannot be reused
+    totals = {}
+    for entry in recipes:
+        recipe, servings = servings_of(entry)
+        total = totals.get(id(recipe))
+        if total is None:
+            totals[id(recipe)] = [recipe, servings]
+        else:
+            total[1] += servings
+    return [recipe if servings == 1.0 else ScaledRecipe(recipe, servings)
+            for recipe, servings in totals.values()]
+
+
+def sum_by_code(codes: array, amounts: array, size: int) -> list[float]:
+    """
+    Sums amounts that share a code.
+
+    Parameters: Array of codes, array of amounts and the number of codes.
+
+    Return: List of totals indexed by code.
+
+    Example:
+    >>> sum_by_code(array('q', [0, 1, 0]), array('d', [1.0, 2.0, 3.0]), 2)
+    [4.0, 2.0]
+    """
+    if np is not None:
+        totals = np.bincount(np.frombuffer(codes, dtype=np.int64),
+                             weights=np.frombuffer(amounts, dtype=np.float64),
+                             minlength=size)
+        return totals.tolist()
+    totals = [0.0] * size
+    for code, amount in zip(codes, amounts):
+        totals[code] += amount
+    return totals
+
+
+def aggregate_batch(recipes) -> list[tuple[float, str, str]]:
+    """
+    Generates a shopping list for a large meal plan in one vectorised pass,
+    with each distinct recipe contributing once however often it is made.
+    The result matches generate_shopping_list, including first-seen order,
+    up to floating point rounding.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings.
+
+    Return: List of tuples containing float of amount, and strings of
+    measure and ingredient name.
+
+    Example:
+    >>> aggregate_batch([PEANUT_BUTTER, PEANUT_BUTTER])
+    [(600.0, 'g', 'peanuts'), (1.0, 'tsp', 'salt'), (4.0, 'tsp', 'oil')]
+    """
+    codes, amounts, labels = factorise(combine_servings(recipes))
+    totals = sum_by_code(codes, amounts, len(labels))
+    return [(from_base(total, measure), measure, name)
+            for total, (name, _, measure) in zip(totals, labels)]
@@ -0,0 +1,98 @@
+"""
+Memory benchmark for the columnar shopping list. Measures the memory taken
+by a large shopping list held as a list of (amount, measure, name) tuples,
+both with measure and name strings shared between rows and with a string
+object per row as when read from text, against the same rows in a
+ColumnarShoppingList. Also times building the columns, saving them to a
+file and loading them back, and checks the round trip.
+
+Run from the repository root:
+    python benchmarks/bench_columnar.py [number of rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from columnar import ColumnarShoppingList
+
+DEFAULT_ROWS = 1_000_000
+DISTINCT_NAMES = 50_000
+MEASURES = ['g', 'kg', 'ml', 'l', 'tsp', 'tbsp', 'cup', 'each', 'large',
+            'pinch', 'stalk', 'medium']
+
+
+def make_rows(count: int, seed: int = 26) -> list[tuple[float, str, str]]:
+    rng = random.Random(seed)
+    names = [f'ingredient {i}' for i in range(DISTINCT_NAMES)]
+    return [(round(rng.uniform(0.1, 500.0), 2), rng.choice(MEASURES),
+             rng.choice(names)) for _ in range(count)]
+
+
+def traced(build):
+    """
+    Returns what build returns and the bytes it left allocated.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, allocated
+
+
+def report(label: str, allocated: int, count: int) -> None:
+    print(f"{label:>28}: {allocated / 2 ** 20:8.1f} MiB, "
+          f"{allocated / count:6.1f} bytes per row")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    rows = make_rows(count)
+    print(f"{count} rows, {DISTINCT_NAMES} distinct ingredient names")
+
+    # Copies of the rows with fresh amount objects and, for the parsed
+    # list, fresh strings, so none of their memory is shared with rows
+    shared, allocated = traced(lambda: [(amount + 0.0, measure, name)
+                                        for amount, measure, name in rows])
+    report('tuples, shared strings', allocated, count)
+    del shared
+    parsed, allocated = traced(lambda: [
+        (amount + 0.0, (measure + ' ')[:-1], (name + ' ')[:-1])
+        for amount, measure, name in rows])
+    report('tuples, string per row', allocated, count)
+    del parsed
+
+    columns, allocated = traced(lambda: ColumnarShoppingList(rows))
+    report('columnar', allocated, count)
+    # Timed without tracing, which slows allocation down
+    del columns
+    start = time.perf_counter()
+    columns = ColumnarShoppingList(rows)
+    print(f"{'build':>28}: {time.perf_counter() - start:.2f} s")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'list.smcol')
+        start = time.perf_counter()
+        columns.save(path)
+        saved = time.perf_counter() - start
+        print(f"{'save':>28}: {saved * 1e3:.1f} ms, "
+              f"{os.path.getsize(path) / 2 ** 20:.1f} MiB file, "
+              f"{os.path.getsize(path) / count:.1f} bytes per row")
+        start = time.perf_counter()
+        loaded = ColumnarShoppingList.load(path)
+        loading = time.perf_counter() - start
+        assert loaded == rows
+        del loaded
+        loaded, allocated = traced(lambda: ColumnarShoppingList.load(path))
+        print(f"{'load':>28}: {loading * 1e3:.1f} ms, "
+              f"{allocated / 2 ** 20:.1f} MiB allocated for the dictionaries")
+        del loaded
+
+
+if __name__ == '__main__':
+    main()
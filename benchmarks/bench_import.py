@@ -0,0 +1,79 @@
+"""
+Benchmark for the bulk importer: writes CSV and JSON-lines dumps of
+synthetic recipes, a few of them malformed, imports each into an on-disk
+recipe store and reports the time taken and the peak memory of the process,
+which should not grow with the size of the dump.
+
+Run from the repository root:
+    python benchmarks/bench_import.py [number of recipes]
+"""
+
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from importer import import_file
+from recipe_store import RecipeStore
+
+DEFAULT_SIZE = 1_000_000
+# One line in this many is malformed
+MALFORMED_EVERY = 10_000
+MEASURES = ['g', 'tsp', 'tbsp', 'cup', 'ml', 'each']
+
+
+def make_ingredients(i: int) -> list[str]:
+    ingredients = [f'{(i + j) % 9 + 0.5} {MEASURES[(i + j) % len(MEASURES)]} '
+                   f'ingredient {(i * 7 + j) % 5000}' for j in range(8)]
+    if i % MALFORMED_EVERY == MALFORMED_EVERY - 1:
+        ingredients[3] = 'a pinch of salt'
+    return ingredients
+
+
+def write_dumps(directory: str, size: int) -> tuple[str, str]:
+    csv_path = os.path.join(directory, 'recipes.csv')
+    jsonl_path = os.path.join(directory, 'recipes.jsonl')
+    with open(csv_path, 'w', newline='') as csv_file, \
+            open(jsonl_path, 'w') as jsonl_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['name', 'ingredients'])
+        for i in range(size):
+            ingredients = make_ingredients(i)
+            writer.writerow([f'recipe {i}', ','.join(ingredients)])
+            jsonl_file.write(json.dumps({'name': f'recipe {i}',
+                                         'ingredients': ingredients}) + '\n')
+    return csv_path, jsonl_path
+
+
+def peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path, jsonl_path = write_dumps(directory, size)
+        print(f"{size} recipes, peak memory before importing: "
+              f"{peak_memory_mb():.1f} MB")
+        for dump in (csv_path, jsonl_path):
+            store_path = os.path.join(directory,
+                                      os.path.basename(dump) + '.smr')
+            start = time.perf_counter()
+            with RecipeStore(store_path) as store:
+                report = import_file(dump, store)
+                assert len(store) == report.imported
+            elapsed = time.perf_counter() - start
+            assert report.rejected == size // MALFORMED_EVERY
+            print(f"{os.path.basename(dump):>14}: {elapsed:.2f} s "
+                  f"({report.imported / elapsed:,.0f} recipes/s), "
+                  f"{report.rejected} rejected, "
+                  f"peak memory {peak_memory_mb():.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark for suggesting recipes close to a mistyped name. Builds a name
+index over a large cook book of generated names, then times queries with a
+typo in them: a letter missing, doubled, replaced, or swapped with the next
+one. Reports latency percentiles and how often the intended recipe is the
+first suggestion or among the first five. Also times the command sanitiser
+against the original list comprehension.
+
+Run from the repository root:
+    python benchmarks/bench_names.py [number of recipes]
+"""
+
+import importlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+from name_index import NameIndex
+
+DEFAULT_RECIPES = 100_000
+QUERIES = 2000
+SANITISED = 200_000
+ADJECTIVES = ['spicy', 'smoky', 'sweet', 'tangy', 'creamy', 'crispy',
+              'roasted', 'grilled', 'baked', 'vegan', 'classic', 'rustic',
+              'golden', 'herby', 'zesty', 'lemon', 'garlic', 'ginger',
+              'maple', 'chilli', '5 spice', '3 bean']
+MAINS = ['tofu', 'tempeh', 'chickpea', 'lentil', 'mushroom', 'potato',
+         'pumpkin', 'cauliflower', 'eggplant', 'spinach', 'kale', 'quinoa',
+         'carrot', 'beetroot', 'onion', 'tomato', 'seitan', 'peanut']
+DISHES = ['curry', 'stew', 'soup', 'salad', 'bake', 'pie', 'tart', 'burger',
+          'wrap', 'bowl', 'risotto', 'pasta', 'tacos', 'dip', 'cake',
+          'muffins', 'bread', 'pancakes', 'brownies', 'rolls']
+
+
+def invented_word(rng: random.Random) -> str:
+    return ''.join(rng.choice('bcdfghklmnprstvz') + rng.choice('aeiou')
+                   for _ in range(rng.randint(2, 4)))
+
+
+def make_names(count: int, seed: int = 24) -> list[str]:
+    """
+    Generates distinct recipe names from a few hundred common words and
+    thousands of rarer ones, such as family names and places.
+    """
+    rng = random.Random(seed)
+    rare = [invented_word(rng) for _ in range(count // 10)]
+    names = set()
+    while len(names) < count:
+        words = [rng.choice(ADJECTIVES), rng.choice(MAINS), rng.choice(DISHES)]
+        if rng.random() < 0.5:
+            words.insert(1, rng.choice(MAINS))
+        if rng.random() < 0.6:
+            words.insert(0, rng.choice(rare))
+        names.add(' '.join(words))
+    return list(names)
+
+
+def mistype(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i] + name[i] + name[i:]
+    if kind == 2:
+        return name[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def legacy_sanitise(command: str) -> str:
+    """
+    The original sanitise_command.
+    """
+    command = command.lower().strip()
+    command = ''.join([char for char in command if not char.isdigit()])
+    command = ' '.join(command.split())
+    return command
+
+
+def commands_per_second(func, commands: list[str]) -> float:
+    start = time.perf_counter()
+    for command in commands:
+        func(command)
+    return len(commands) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECIPES
+    names = make_names(count)
+    start = time.perf_counter()
+    index = NameIndex(names)
+    print(f"{'index build':>16}: {time.perf_counter() - start:.2f} s "
+          f"for {len(index)} names")
+
+    rng = random.Random(25)
+    intended = rng.sample(names, QUERIES)
+    queries = [mistype(name, rng) for name in intended]
+    latencies = []
+    first = top_five = 0
+    for name, query in zip(intended, queries):
+        start = time.perf_counter()
+        found = index.similar(query)
+        latencies.append(time.perf_counter() - start)
+        found = [suggested for suggested, _ in found]
+        first += bool(found) and found[0] == name
+        top_five += name in found
+    latencies.sort()
+    print(f"{'query latency':>16}: mean "
+          f"{sum(latencies) / QUERIES * 1e3:.3f} ms, "
+          f"p50 {latencies[QUERIES // 2] * 1e3:.3f} ms, "
+          f"p99 {latencies[int(QUERIES * 0.99)] * 1e3:.3f} ms")
+    print(f"{'intended recipe':>16}: first in {first / QUERIES:.1%}, "
+          f"in the first five in {top_five / QUERIES:.1%} of queries")
+
+    commands = [f'add {name} {rng.randint(1, 4)}'
+                for name in rng.choices(names, k=SANITISED)]
+    for label, func in (('original', legacy_sanitise),
+                        ('sanitise_command', shop_mania.sanitise_command)):
+        rate = commands_per_second(func, commands)
+        print(f"{label:>16}: {rate / 1e6:.2f} M commands/s")
+    assert all(shop_mania.sanitise_command(command) == legacy_sanitise(command)
+               for command in commands[:10_000])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark for taking a warehouse pantry off the shopping list of a large
+meal plan. Times a bulk stock update, subtracting the pantry from a
+generated list, showing a meal plan's list with the pantry applied in the
+same pass, and saving and loading the pantry file, against removing each
+item in stock with remove_from_shopping_list as rm -i does.
+
+Run from the repository root:
+    python benchmarks/bench_pantry.py [number of items in stock]
+"""
+
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+from meal_plan import MealPlan
+from pantry import Pantry
+from suite import make_cook_book
+
+DEFAULT_ITEMS = 10_000
+PLAN_SIZE = 20_000
+
+
+def timed(func, repeat: int = 5) -> tuple[float, object]:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ITEMS
+    rng = random.Random(21)
+    cook_book = make_cook_book(PLAN_SIZE)
+    meal_plan = MealPlan(cook_book)
+    shopping_list = meal_plan.shopping_list()
+    stock = [(amount * rng.uniform(0.2, 1.5), measure, name)
+             for amount, measure, name in rng.sample(shopping_list, count)]
+    print(f"{len(shopping_list)} rows on the list, {count} items in stock")
+
+    seconds, pantry = timed(lambda: Pantry(stock))
+    print(f"{'bulk stock update':>28}: {seconds * 1e3:9.2f} ms")
+    seconds, remaining = timed(lambda: pantry.subtract(shopping_list))
+    print(f"{'subtract from list':>28}: {seconds * 1e3:9.2f} ms, "
+          f"{len(remaining)} rows left")
+    seconds, _ = timed(lambda: meal_plan.shopping_list(pantry))
+    print(f"{'meal plan list with pantry':>28}: {seconds * 1e3:9.2f} ms")
+    seconds, _ = timed(meal_plan.shopping_list)
+    print(f"{'meal plan list alone':>28}: {seconds * 1e3:9.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pantry.txt')
+        seconds, _ = timed(lambda: pantry.save(path))
+        print(f"{'save pantry file':>28}: {seconds * 1e3:9.2f} ms")
+        seconds, _ = timed(lambda: Pantry.open(path))
+        print(f"{'load pantry file':>28}: {seconds * 1e3:9.2f} ms")
+
+    # rm -i scans the plain list once per item in stock
+    subset = stock[:1000]
+    start = time.perf_counter()
+    legacy = list(shopping_list)
+    for amount, _, name in subset:
+        shop_mania.remove_from_shopping_list(name, amount, legacy)
+    seconds = (time.perf_counter() - start) * count / len(subset)
+    print(f"{'remove_from_shopping_list':>28}: {seconds * 1e3:9.2f} ms "
+          f"(estimated from {len(subset)} items)")
+
+
+if __name__ == '__main__':
+    main()
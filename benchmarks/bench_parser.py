@@ -0,0 +1,75 @@
+"""
+Microbenchmark for the shared ingredient parser. Times parsing a stream of
+ingredient lines drawn from a realistic vocabulary, where the same lines
+recur across recipes, and a stream where every line is new, against the
+original split and float parser. About one line in ten uses a fraction,
+range, unicode fraction or missing measure, which the original cannot read.
+
+Run from the repository root:
+    python benchmarks/bench_parser.py [number of lines]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingredient_parser import parse
+
+DEFAULT_LINES = 2_000_000
+DISTINCT_LINES = 20_000
+MEASURES = ['g', 'kg', 'tsp', 'tbsp', 'cup', 'ml', 'large', 'pinch']
+NAMES = ['salt', 'olive oil', 'plain flour', 'brown sugar', 'soy milk',
+         'garlic powder', 'red onion', 'baking powder', 'peanut butter',
+         'vanilla extract', 'dark chocolate', 'ground almonds']
+TOLERANT_FORMS = ['1/2 cup {}', '1 1/2 tbsp {}', '2-3 tsp {}', '½ cup {}',
+                  '300g {}', '2 {}']
+
+
+def legacy_parse(raw_ingredient_detail: str) -> tuple[float, str, str]:
+    """
+    The original parse_ingredient.
+    """
+    result = raw_ingredient_detail.split()
+    return (float(result[0]), result[1], ' '.join(result[2:]))
+
+
+def make_line(rng: random.Random, tolerant: bool) -> str:
+    name = f'{rng.choice(NAMES)} {rng.randrange(DISTINCT_LINES)}'
+    if tolerant and rng.random() < 0.1:
+        return rng.choice(TOLERANT_FORMS).format(name)
+    return f'{rng.randrange(1, 500) / 4} {rng.choice(MEASURES)} {name}'
+
+
+def lines_per_second(func, lines: list[str], rounds: int = 5) -> float:
+    # Best of a few rounds, as one round is easily slowed by other work
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES
+    rng = random.Random(16)
+    vocabulary = [make_line(rng, True) for _ in range(DISTINCT_LINES)]
+    recurring = [rng.choice(vocabulary) for _ in range(count)]
+    plain = [make_line(rng, False) for _ in range(count // 4)]
+    tolerant = [make_line(rng, True) for _ in range(count // 4)]
+
+    rate = lines_per_second(legacy_parse, plain)
+    print(f"{'original, new lines':>34}: {rate / 1e6:6.2f} M lines/s")
+    rate = lines_per_second(parse, plain)
+    print(f"{'shared, new plain lines':>34}: {rate / 1e6:6.2f} M lines/s")
+    rate = lines_per_second(parse, tolerant)
+    print(f"{'shared, new lines, 10% tolerant':>34}: {rate / 1e6:6.2f} M lines/s")
+    rate = lines_per_second(parse, recurring)
+    print(f"{'shared, recurring lines':>34}: {rate / 1e6:6.2f} M lines/s")
+
+
+if __name__ == '__main__':
+    main()
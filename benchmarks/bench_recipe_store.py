@@ -0,0 +1,67 @@
+"""
+Benchmark for the on-disk recipe store: builds a store of synthetic
+recipes, then times opening it, looking recipes up by name and recovering
+from an append torn by a crash.
+
+Run from the repository root:
+    python benchmarks/bench_recipe_store.py [number of recipes]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recipe_store import RecipeStore, _encode_record
+
+DEFAULT_SIZE = 1_000_000
+BATCH_SIZE = 10_000
+LOOKUPS = 10_000
+
+
+def make_recipe(i: int) -> tuple[str, str]:
+    return (f'recipe {i}',
+            f'{i % 500 + 1} g flour,{i % 7 + 1} tsp salt,2 tbsp oil')
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cookbook.smr')
+
+        start = time.perf_counter()
+        with RecipeStore(path) as store:
+            for batch_start in range(0, size, BATCH_SIZE):
+                store.add_many(make_recipe(i) for i in
+                               range(batch_start,
+                                     min(batch_start + BATCH_SIZE, size)))
+        print(f"build {size} recipes: {time.perf_counter() - start:.2f} s "
+              f"({os.path.getsize(path) / 1e6:.1f} MB)")
+
+        start = time.perf_counter()
+        store = RecipeStore(path)
+        print(f"open: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        names = [f'recipe {random.randrange(size)}' for _ in range(LOOKUPS)]
+        start = time.perf_counter()
+        for name in names:
+            assert store.find(name) is not None
+        elapsed = time.perf_counter() - start
+        print(f"find: {elapsed / LOOKUPS * 1e6:.1f} us per lookup")
+        store.close()
+
+        # Simulates a crash part way through writing a record
+        with open(path, 'ab') as data_file:
+            data_file.write(_encode_record('torn recipe', '1 g salt')[:-3])
+        start = time.perf_counter()
+        with RecipeStore(path) as store:
+            assert store.find('torn recipe') is None
+            assert len(store) == size
+        print(f"open after torn append: "
+              f"{(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
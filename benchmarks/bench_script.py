@@ -0,0 +1,58 @@
+"""
+Benchmark for the non-interactive script mode: runs a generated script of
+commands through run_script and reports commands per second, for text and
+JSON output.
+
+Run from the repository root:
+    python benchmarks/bench_script.py [number of commands]
+"""
+
+import importlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+
+DEFAULT_SIZE = 50_000
+
+
+def make_script(size: int) -> list[str]:
+    """
+    Builds a script that mostly adds and removes recipes, showing the
+    shopping list every so often.
+    """
+    random.seed(0)
+    names = [recipe[0] for recipe in shop_mania.COOK_BOOK]
+    script = []
+    for i in range(size):
+        if i % 20 == 19:
+            script.append('g')
+        elif i % 20 == 9:
+            script.append('rm -i salt 0.5')
+        elif random.random() < 0.3:
+            script.append(f'rm {random.choice(names)}')
+        else:
+            script.append(f'add {random.choice(names)}')
+    return script
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    script = make_script(size)
+    for json_output in (False, True):
+        out = io.StringIO()
+        start = time.perf_counter()
+        count = shop_mania.run_script(script, json_output=json_output, out=out)
+        elapsed = time.perf_counter() - start
+        mode = 'json' if json_output else 'text'
+        print(f"{mode}: {count} commands in {elapsed:.2f} s, "
+              f"{count / elapsed:,.0f} commands/s, "
+              f"{len(out.getvalue()) / 1e6:.1f} MB output")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Load test for many users sharing one cook book through a SessionManager.
+Hundreds of users each add recipes to their own meal plan, search the cook
+book and show their shopping list, while some of them create new recipes
+with mkrec, all at once from a thread pool and then from asyncio tasks.
+Checks that every user's shopping list matches their own plan and that
+every new recipe reached the shared cook book, and reports throughput,
+command latencies and the memory each session takes.
+
+Run from the repository root:
+    python benchmarks/bench_sessions.py [number of users]
+"""
+
+import asyncio
+import importlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+from cook_book import CookBook
+from session_manager import SessionManager
+from suite import make_cook_book
+
+DEFAULT_USERS = 500
+COOK_BOOK_SIZE = 5000
+RECIPES_PER_USER = 8
+# One user in this many also creates a recipe
+WRITER_EVERY = 10
+THREADS = 32
+
+
+def letter_names(recipes: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Renames synthetic recipes from 'seitan 12' to 'seitan bm', as the add
+    command strips digits from what is typed.
+    """
+    renamed = []
+    for number, (name, ingredients) in enumerate(recipes):
+        code = ''
+        while True:
+            number, digit = divmod(number, 26)
+            code = chr(ord('a') + digit) + code
+            if not number:
+                break
+        renamed.append((f"{name.rsplit(' ', 1)[0]} {code}", ingredients))
+    return renamed
+
+
+def user_script(user: int, cook_book: list[tuple[str, str]]):
+    """
+    Builds one user's commands as (command, lines) pairs, with the servings
+    of each recipe they add.
+    """
+    rng = random.Random(user)
+    commands = []
+    servings = {}
+    for recipe in rng.sample(cook_book, RECIPES_PER_USER):
+        count = rng.choice((1, 1, 2, 3))
+        servings[recipe[0]] = count
+        commands.append((f'add {recipe[0]} {count}', ()))
+        commands.append((f'ls -a {recipe[0][:4]}', ()))
+    if user % WRITER_EVERY == 0:
+        commands.append(('mkrec', (f'house special {user}',
+                                   f'{user + 1} g rice', '1 tsp salt', '')))
+    commands.append(('g', ()))
+    return commands, servings
+
+
+def expected_list(servings: dict, cook_book: dict) -> dict:
+    plan = [cook_book[name] for name, count in servings.items()
+            for _ in range(count)]
+    return {(name, measure): amount for amount, measure, name
+            in shop_mania.generate_shopping_list(plan)}
+
+
+def check(manager: SessionManager, scripts: dict, cook_book: dict) -> None:
+    """
+    Compares each user's shopping list with one generated from scratch.
+    """
+    for user, (commands, servings) in scripts.items():
+        shown = {(name, measure): amount for amount, measure, name
+                 in manager.session(user).meal_plan.shopping_list()}
+        expected = expected_list(servings, cook_book)
+        assert shown.keys() == expected.keys(), user
+        for key, amount in expected.items():
+            assert abs(shown[key] - amount) <= 1e-9 * max(abs(amount), 1.0)
+        for command, lines in commands:
+            if command == 'mkrec':
+                assert manager.cook_book.find(lines[0]) is not None, lines[0]
+
+
+def run_user(manager: SessionManager, user: str, commands) -> list[float]:
+    latencies = []
+    for command, lines in commands:
+        start = time.perf_counter()
+        manager.run(user, command, lines)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_user_async(manager: SessionManager, user: str, commands,
+                         executor) -> list[float]:
+    latencies = []
+    for command, lines in commands:
+        start = time.perf_counter()
+        await manager.run_async(user, command, lines, executor)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label: str, seconds: float, latencies: list[float]) -> None:
+    latencies.sort()
+    count = len(latencies)
+    print(f"{label:>12}: {count} commands in {seconds:.2f} s, "
+          f"{count / seconds:8.0f} commands/s, "
+          f"p50 {latencies[count // 2] * 1e3:.2f} ms, "
+          f"p99 {latencies[int(count * 0.99)] * 1e3:.2f} ms")
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_USERS
+    recipes = letter_names(make_cook_book(COOK_BOOK_SIZE))
+    by_name = {recipe[0]: recipe for recipe in recipes}
+    scripts = {f'user {user}': user_script(user, recipes)
+               for user in range(users)}
+    print(f"{users} users sharing a cook book of {len(recipes)} recipes")
+
+    manager = SessionManager(CookBook(recipes))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for user in scripts:
+        manager.session(user)
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / users
+    tracemalloc.stop()
+    print(f"{'memory':>12}: {per_session / 1024:.1f} KiB per empty session")
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        start = time.perf_counter()
+        futures = [pool.submit(run_user, manager, user, commands)
+                   for user, (commands, _) in scripts.items()]
+        latencies = [latency for future in futures
+                     for latency in future.result()]
+        report('threads', time.perf_counter() - start, latencies)
+    check(manager, scripts, by_name)
+    manager.close_all()
+
+    manager = SessionManager(CookBook(recipes))
+
+    async def run_all() -> list[float]:
+        with ThreadPoolExecutor(THREADS) as pool:
+            results = await asyncio.gather(*[
+                run_user_async(manager, user, commands, pool)
+                for user, (commands, _) in scripts.items()])
+        return [latency for result in results for latency in result]
+
+    start = time.perf_counter()
+    latencies = asyncio.run(run_all())
+    report('asyncio', time.perf_counter() - start, latencies)
+    check(manager, scripts, by_name)
+    print(f"{len(manager)} sessions checked, "
+          f"{len(manager.cook_book) - len(recipes)} recipes added by mkrec")
+    manager.close_all()
+
+
+if __name__ == '__main__':
+    main()
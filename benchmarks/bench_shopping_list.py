@@ -0,0 +1,81 @@
+"""
+Benchmark comparing the name-keyed ShoppingList aggregation used by
+generate_shopping_list against the original linear-scan implementation.
+
+Run from the repository root:
+    python benchmarks/bench_shopping_list.py
+"""
+
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+
+SIZES = [100, 200, 400, 800, 1600, 3200]
+INGREDIENTS_PER_RECIPE = 8
+
+
+def legacy_generate_shopping_list(recipes: list[tuple[str, str]]) -> list[tuple[float, str, str]]:
+    """
+    The original generate_shopping_list, which scans the growing shopping
+    list for every parsed ingredient.
+    """
+    shopping_list = []
+    for recipe in recipes:
+        ingredients = recipe[1].split(',')
+        for ingredient in ingredients:
+            result = ingredient.split()
+            amount = float(result[0])
+            measure = result[1]
+            ingredient_name = ' '.join(result[2:])
+            found = False
+            for i, item_data in enumerate(shopping_list):
+                if ingredient_name == item_data[2]:
+                    shopping_list[i] = (item_data[0] +
+                    amount, item_data[1], item_data[2])
+                    found = True
+                    break
+            if not found:
+                shopping_list.append((amount, measure, ingredient_name))
+    return shopping_list
+
+
+def make_recipes(count: int) -> list[tuple[str, str]]:
+    """
+    Builds a meal plan where the number of distinct ingredients grows with
+    the number of recipes, which is the worst case for a linear scan.
+    """
+    recipes = []
+    for i in range(count):
+        ingredients = [f'{j + 1} g ingredient {(i * 3 + j) % (count * 2)}'
+                       for j in range(INGREDIENTS_PER_RECIPE)]
+        recipes.append((f'recipe {i}', ','.join(ingredients)))
+    return recipes
+
+
+def best_of(func, recipes, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(recipes)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'recipes':>8} | {'legacy (ms)':>12} | {'indexed (ms)':>12} | {'speed-up':>8}")
+    for size in SIZES:
+        recipes = make_recipes(size)
+        assert legacy_generate_shopping_list(recipes) == \
+            shop_mania.generate_shopping_list(recipes)
+        legacy = best_of(legacy_generate_shopping_list, recipes)
+        indexed = best_of(shop_mania.generate_shopping_list, recipes)
+        print(f"{size:>8} | {legacy * 1000:>12.2f} | {indexed * 1000:>12.2f} | "
+              f"{legacy / indexed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
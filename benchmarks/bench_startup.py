@@ -0,0 +1,86 @@
+"""
+Benchmark for the time from starting the program to its first prompt, with
+the built-in cook book and with a large recipe store, against a budget.
+Each run starts a fresh interpreter that quits at the first prompt, and the
+time a bare interpreter takes to start and exit is subtracted. Also times
+the first listing of recipe names and ingredient query on the store, with
+and without a fresh snapshot of the parsed cook book.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py [number of recipes in the store]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from recipe_store import RecipeStore
+from suite import make_cook_book
+
+DEFAULT_RECIPES = 20_000
+REPEAT = 7
+# Milliseconds allowed from starting the program to its first prompt
+BUDGET_MS = 50.0
+
+
+def best_run(command: list[str], stdin: str = '') -> float:
+    """
+    Returns the fastest of several runs of a command, in seconds.
+    """
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(command, input=stdin, text=True, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def first_access(path: str, snapshot: bool) -> tuple[float, float]:
+    """
+    Times listing the recipe names and querying an ingredient on a freshly
+    opened store, after removing its snapshot unless asked to keep it.
+    """
+    if not snapshot and os.path.exists(path + '.snap'):
+        os.remove(path + '.snap')
+    with RecipeStore(path) as store:
+        start = time.perf_counter()
+        store.names_with_prefix('choc')
+        names = time.perf_counter() - start
+        start = time.perf_counter()
+        store.recipes_using('salt', limit=10)
+        query = time.perf_counter() - start
+    return names, query
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECIPES
+    program = [sys.executable, os.path.join(ROOT, 'shop-mania.py')]
+    baseline = best_run([sys.executable, '-c', 'pass'])
+    print(f"{'bare interpreter':>28}: {baseline * 1e3:9.2f} ms")
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cookbook.smr')
+        with RecipeStore(path) as store:
+            store.add_many(make_cook_book(count))
+        for label, command in (('built-in cook book', program),
+                               (f'store of {count} recipes',
+                                program + [path])):
+            seconds = best_run(command, 'q\n') - baseline
+            over = seconds * 1e3 > BUDGET_MS
+            failed = failed or over
+            print(f"{label:>28}: {seconds * 1e3:9.2f} ms to first prompt"
+                  f"{'  over budget' if over else ''}")
+        for label, snapshot in (('cold', False), ('snapshot', True)):
+            names, query = first_access(path, snapshot)
+            print(f"{'first names, ' + label:>28}: {names * 1e3:9.2f} ms")
+            print(f"{'first ingredient query':>28}: {query * 1e3:9.2f} ms")
+    print(f"budget {BUDGET_MS:g} ms: {'missed' if failed else 'met'}")
+
+
+if __name__ == '__main__':
+    main()
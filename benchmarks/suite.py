@@ -0,0 +1,231 @@
+"""
+Benchmark suite covering the core operations of the program at several
+sizes. Synthetic cook books and meal plans are generated from the recipes
+in constants.py, each copy renamed and with its amounts and some of its
+ingredient names varied, so larger cook books also have more distinct
+ingredients. Results are written as JSON so runs from different commits
+can be compared.
+
+Run from the repository root:
+    python benchmarks/suite.py [--sizes 100 1000 10000] [--repeat 5]
+                               [--output results.json]
+                               [--compare earlier.json]
+"""
+
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+shop_mania = importlib.import_module('shop-mania')
+from aggregate import combine_servings
+from constants import COOK_BOOK
+from cook_book import CookBook
+from shopping_list import ShoppingList
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_REPEAT = 5
+# Calls timed per repeat for operations on a single item
+CALLS = 1000
+# Share of ingredient names made distinct to their copy of a template
+DISTINCT_INGREDIENTS = 0.25
+COMMANDS = ['add chocolate Brownies 5', '  ADD   c4hocolate   brownies ',
+            'rm -i salt 0.5', 'ls -a pea', 'ls -s', 'add seitan']
+
+
+def make_cook_book(size: int, seed: int = 17) -> list[tuple[str, str]]:
+    """
+    Builds a cook book of synthetic recipes from the templates in
+    constants.py.
+
+    Parameters: Number of recipes and a random seed.
+
+    Return: List of recipes as tuples containing two strings.
+    """
+    rng = random.Random(seed)
+    recipes = []
+    for i in range(size):
+        name, ingredients = COOK_BOOK[i % len(COOK_BOOK)]
+        varied = []
+        for raw in ingredients.split(','):
+            amount, measure, ingredient = shop_mania.parse_ingredient(raw)
+            if rng.random() < DISTINCT_INGREDIENTS:
+                ingredient = f'{ingredient} {i}'
+            amount = round(amount * rng.uniform(0.5, 2.0), 2)
+            varied.append(f'{amount} {measure} {ingredient}')
+        recipes.append((f'{name} {i}', ','.join(varied)))
+    return recipes
+
+
+def make_plan(cook_book: list[tuple[str, str]], size: int,
+              seed: int = 18) -> list[tuple[str, str]]:
+    """
+    Picks a meal plan from a cook book, repeating recipes as real plans do.
+    """
+    rng = random.Random(seed)
+    return [rng.choice(cook_book) for _ in range(size)]
+
+
+def best_of(func, repeat: int, setup=None) -> float:
+    """
+    Returns the fastest of several timed runs, in seconds. The setup runs
+    untimed before each run and its result is passed to func.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def operations(size: int):
+    """
+    Builds the benchmarks for one size.
+
+    Return: List of (operation, variant, calls, func, setup) tuples, where
+    calls is the number of operations each timed run performs.
+    """
+    cook_book = make_cook_book(size)
+    indexed = CookBook(cook_book)
+    plan = make_plan(cook_book, size)
+    # The same plan with each recipe once, scaled by its servings
+    scaled_plan = combine_servings(plan)
+    shopping_list = shop_mania.generate_shopping_list(plan)
+    names = [recipe[0] for recipe in make_plan(cook_book, CALLS, seed=19)]
+    items = make_plan(shopping_list, CALLS, seed=20)
+
+    def add_items(target):
+        for item in items:
+            shop_mania.add_to_shopping_list(item, target)
+
+    def remove_items(target):
+        for _, _, name in items:
+            shop_mania.remove_from_shopping_list(name, 0.001, target)
+
+    def indexed_list():
+        indexed_list = ShoppingList()
+        for item in shopping_list:
+            indexed_list.add(item)
+        return indexed_list
+
+    def remove_recipes(target):
+        for name in names[:100]:
+            shop_mania.remove_recipe(name, target)
+
+    return [
+        ('generate_shopping_list', 'serial', 1,
+         lambda _: shop_mania.generate_shopping_list(plan), None),
+        ('generate_shopping_list', 'batch', 1,
+         lambda _: shop_mania.generate_shopping_list(plan, batch=True), None),
+        ('generate_shopping_list', 'scaled', 1,
+         lambda _: shop_mania.generate_shopping_list(scaled_plan), None),
+        ('find_recipe', 'list', CALLS,
+         lambda _: [shop_mania.find_recipe(name, cook_book)
+                    for name in names], None),
+        ('find_recipe', 'cook book', CALLS,
+         lambda _: [shop_mania.find_recipe(name, indexed)
+                    for name in names], None),
+        ('remove_recipe', 'list', 100, remove_recipes,
+         lambda: list(cook_book)),
+        ('remove_recipe', 'cook book', 100, remove_recipes,
+         lambda: CookBook(cook_book)),
+        ('add_to_shopping_list', 'list', CALLS, add_items,
+         lambda: list(shopping_list)),
+        ('add_to_shopping_list', 'shopping list', CALLS, add_items,
+         indexed_list),
+        ('remove_from_shopping_list', 'list', CALLS, remove_items,
+         lambda: list(shopping_list)),
+        ('remove_from_shopping_list', 'shopping list', CALLS, remove_items,
+         indexed_list),
+        ('display_ingredients', 'table', 1,
+         lambda _: shop_mania.display_ingredients(shopping_list,
+                                                  io.StringIO()), None),
+        *[('display_ingredients', output_format, 1,
+           lambda _, output_format=output_format:
+           shop_mania.display_ingredients(shopping_list, io.StringIO(),
+                                          output_format), None)
+          for output_format in ('tsv', 'json', 'markdown')],
+        ('sanitise_command', 'commands', CALLS,
+         lambda _: [shop_mania.sanitise_command(command)
+                    for command in COMMANDS * (CALLS // len(COMMANDS))],
+         None),
+    ]
+
+
+def run(sizes: list[int], repeat: int, log=sys.stderr) -> dict:
+    """
+    Runs every benchmark at every size.
+
+    Return: The results as a JSON-serialisable dict.
+    """
+    results = []
+    for size in sizes:
+        for operation, variant, calls, func, setup in operations(size):
+            seconds = best_of(func, repeat, setup)
+            results.append({'operation': operation, 'variant': variant,
+                            'size': size, 'calls': calls,
+                            'seconds': seconds,
+                            'us_per_call': seconds / calls * 1e6})
+            print(f"{operation:>26} {variant:>14} {size:>8}: "
+                  f"{seconds / calls * 1e6:12.2f} us", file=log)
+    return {'commit': _commit(), 'python': platform.python_version(),
+            'machine': platform.machine(), 'repeat': repeat,
+            'results': results}
+
+
+def compare(earlier: dict, later: dict, out=sys.stdout) -> None:
+    """
+    Prints how much each benchmark sped up or slowed down between two runs.
+    """
+    before = {(result['operation'], result['variant'], result['size']):
+              result['us_per_call'] for result in earlier['results']}
+    print(f"{earlier['commit']} -> {later['commit']}", file=out)
+    for result in later['results']:
+        key = (result['operation'], result['variant'], result['size'])
+        if key in before:
+            ratio = before[key] / result['us_per_call']
+            print(f"{key[0]:>26} {key[1]:>14} {key[2]:>8}: {ratio:6.2f}x"
+                  f"{'  slower' if ratio < 0.9 else ''}", file=out)
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the core "
+                                     "operations of ShopMania.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="cook book and meal plan sizes to run")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="timed runs per benchmark, the best is kept")
+    parser.add_argument('--output', help="file to write the JSON results to, "
+                        "standard output by default")
+    parser.add_argument('--compare', help="JSON results of an earlier run "
+                        "to compare against")
+    args = parser.parse_args()
+    report = run(args.sizes, args.repeat)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as earlier:
+            compare(json.load(earlier), report, sys.stderr)
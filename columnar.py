@@ -0,0 +1,404 @@
+"""
+Columnar shopping lists and meal plans. A shopping list is held as a
+float64 array of amounts and two arrays of codes into dictionaries of the
+measures and ingredient names, which takes a few bytes per row instead of a
+tuple of three objects. Codes use the narrowest unsigned type that fits the
+dictionary.
+
+Columns are saved to a compact binary file that other programs can read
+without parsing the displayed table:
+    magic (8 bytes), row count (u64), column count (u32), padding (u32)
+then for each column
+    name length (u16), UTF-8 name, type code (1 byte, 'd' for float64 or
+    'B', 'H', 'I' for codes), dictionary size (u32)
+then for each dictionary the byte length of each entry (u32 each) followed
+by the UTF-8 entries, and finally the column data, each column starting at
+a multiple of eight bytes. Numbers are little-endian. Column data is
+written straight from the arrays and loaded as views of the memory-mapped
+file, so neither direction copies it; a loaded list copies its columns only
+when it is first changed.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from recipe import ScaledRecipe, compile_recipe, servings_of
+
+LIST_MAGIC = b'SMLIST01'
+PLAN_MAGIC = b'SMPLAN01'
+
+_HEADER = struct.Struct('<8sQII')
+_COLUMN = struct.Struct('<cI')
+_NAME_LENGTH = struct.Struct('<H')
+_ALIGNMENT = 8
+# Unsigned code types from narrowest to widest, with how many codes fit
+_CODE_TYPES = (('B', 1 << 8), ('H', 1 << 16), ('I', 1 << 32))
+_TYPECODES = frozenset(['d'] + [typecode for typecode, _ in _CODE_TYPES])
+_SWAP = sys.byteorder == 'big'
+
+
+def _code_type(size: int) -> str:
+    # The narrowest code type for a dictionary of size entries
+    for typecode, capacity in _CODE_TYPES:
+        if size <= capacity:
+            return typecode
+    raise ValueError("too many distinct values to encode")
+
+
+def _padding(offset: int) -> bytes:
+    return bytes(-offset % _ALIGNMENT)
+
+
+def _write_columns(path: str, magic: bytes, count: int, columns) -> None:
+    """
+    Writes columns to a file, replacing it atomically.
+
+    Parameters: Path of the file, the magic naming its kind, the number of
+    rows and a list of (name, array, dictionary) columns, where the
+    dictionary is a list of strings for code columns and None otherwise.
+    """
+    header = [_HEADER.pack(magic, count, len(columns), 0)]
+    dictionaries = []
+    data = []
+    for name, values, dictionary in columns:
+        encoded = name.encode('utf-8')
+        header.append(_NAME_LENGTH.pack(len(encoded)) + encoded)
+        header.append(_COLUMN.pack(values.typecode.encode('ascii'),
+                                   0 if dictionary is None
+                                   else len(dictionary)))
+        if dictionary is not None:
+            entries = [entry.encode('utf-8') for entry in dictionary]
+            lengths = array('I', map(len, entries))
+            if _SWAP:
+                lengths.byteswap()
+            dictionaries.append(lengths.tobytes())
+            dictionaries.append(b''.join(entries))
+        if _SWAP:
+            values = array(values.typecode, values)
+            values.byteswap()
+        data.append(values)
+    prefix = b''.join(header + dictionaries)
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as columns_file:
+        columns_file.write(prefix + _padding(len(prefix)))
+        for values in data:
+            # Written from the array's own buffer
+            view = memoryview(values).cast('B')
+            columns_file.write(view)
+            columns_file.write(_padding(len(view)))
+    os.replace(temporary_path, path)
+
+
+def _read_columns(path: str, magic: bytes) -> tuple[int, dict]:
+    """
+    Maps a file written by _write_columns.
+
+    Parameters: Path of the file and the magic of the kind expected.
+
+    Return: Tuple of the number of rows and a dict mapping each column name
+    to its (values, dictionary) pair, where values is a read-only view of
+    the file. Raises ValueError if the file is not of the kind expected, has
+    a corrupt header or is cut short.
+    """
+    with open(path, 'rb') as columns_file:
+        try:
+            mapped = mmap.mmap(columns_file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be mapped
+            raise ValueError(f"{path} is not a columnar file") from None
+    view = memoryview(mapped)
+    try:
+        found, count, column_count, _ = _HEADER.unpack_from(view)
+        if found != magic:
+            raise ValueError(f"{path} is not a columnar file of this kind")
+        offset = _HEADER.size
+        layout = []
+        for _ in range(column_count):
+            (length,) = _NAME_LENGTH.unpack_from(view, offset)
+            offset += _NAME_LENGTH.size
+            name = str(view[offset:offset + length], 'utf-8')
+            offset += length
+            typecode, size = _COLUMN.unpack_from(view, offset)
+            offset += _COLUMN.size
+            typecode = typecode.decode('latin-1')
+            # Amounts have no dictionary and codes always have one, unless
+            # the list is empty
+            if typecode not in _TYPECODES or (typecode == 'd' and size) \
+                    or (typecode != 'd' and count and not size):
+                raise ValueError(f"{path} is not a columnar file")
+            layout.append((name, typecode, size))
+        dictionaries = []
+        for _, _, size in layout:
+            if offset + 4 * size > len(view):
+                raise ValueError(f"{path} is cut short")
+            lengths = array('I')
+            lengths.frombytes(view[offset:offset + 4 * size])
+            if _SWAP:
+                lengths.byteswap()
+            offset += 4 * size
+            dictionary = []
+            for length in lengths:
+                if offset + length > len(view):
+                    raise ValueError(f"{path} is cut short")
+                dictionary.append(str(view[offset:offset + length], 'utf-8'))
+                offset += length
+            dictionaries.append(dictionary)
+        columns = {}
+        for (name, typecode, size), dictionary in zip(layout, dictionaries):
+            offset += -offset % _ALIGNMENT
+            end = offset + count * array(typecode).itemsize
+            if end > len(view):
+                raise ValueError(f"{path} is cut short")
+            values = view[offset:end].cast(typecode)
+            if _SWAP:
+                values = array(typecode, values)
+                values.byteswap()
+            # Codes are checked once here rather than failing on some later
+            # read; a scan of the view, not a copy
+            if size and count and max(values) >= size:
+                raise ValueError(f"{path} has a code outside its dictionary")
+            columns[name] = (values, dictionary if size else None)
+            offset = end
+    except struct.error:
+        raise ValueError(f"{path} is cut short") from None
+    except UnicodeDecodeError:
+        raise ValueError(f"{path} is not a columnar file") from None
+    return count, columns
+
+
+class ColumnarShoppingList:
+    """
+    A shopping list stored by column: amounts in a float64 array, and
+    measures and ingredient names as codes into dictionaries of the distinct
+    values. Rows read back as the (amount, measure, name) tuples used
+    elsewhere in the program, in the order they were appended.
+
+    Parameters: Optional iterable of rows as tuples of amount, measure and
+    ingredient name.
+
+    Example:
+    >>> shopping_list = ColumnarShoppingList([(300.0, 'g', 'peanuts'),
+    ...                                       (0.5, 'tsp', 'salt')])
+    >>> shopping_list.save('list.smcol')
+    >>> ColumnarShoppingList.load('list.smcol').to_list()
+    [(300.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt')]
+    >>> shopping_list.names, list(shopping_list.name_codes)
+    (['peanuts', 'salt'], [0, 1])
+    """
+
+    __slots__ = ('amounts', 'measure_codes', 'name_codes', 'measures',
+                 'names', '_measure_index', '_name_index')
+
+    def __init__(self, rows=()) -> None:
+        self.amounts = array('d')
+        self.measure_codes = array('B')
+        self.name_codes = array('B')
+        # Dictionaries of the distinct measures and names, by code
+        self.measures = []
+        self.names = []
+        # Maps a measure or name to its code
+        self._measure_index = {}
+        self._name_index = {}
+        self.extend(rows)
+
+    def append(self, row: tuple[float, str, str]) -> None:
+        """
+        Adds a row to the end of the list.
+
+        Parameters: Row as a tuple of amount, measure and ingredient name.
+
+        Return: Returns None.
+        """
+        self.extend((row,))
+        return None
+
+    def extend(self, rows) -> None:
+        """
+        Adds rows to the end of the list.
+
+        Parameters: Iterable of rows as tuples of amount, measure and
+        ingredient name.
+
+        Return: Returns None.
+        """
+        self._own()
+        amounts = []
+        measure_codes = []
+        name_codes = []
+        measure_index = self._measure_index
+        name_index = self._name_index
+        for amount, measure, name in rows:
+            amounts.append(amount)
+            code = measure_index.get(measure)
+            if code is None:
+                code = measure_index[measure] = len(self.measures)
+                self.measures.append(measure)
+            measure_codes.append(code)
+            code = name_index.get(name)
+            if code is None:
+                code = name_index[name] = len(self.names)
+                self.names.append(name)
+            name_codes.append(code)
+        self.amounts.extend(amounts)
+        # Codes are widened once a dictionary outgrows their type
+        self.measure_codes = self._widened(self.measure_codes, self.measures)
+        self.measure_codes.extend(measure_codes)
+        self.name_codes = self._widened(self.name_codes, self.names)
+        self.name_codes.extend(name_codes)
+        return None
+
+    @staticmethod
+    def _widened(codes: array, dictionary: list[str]) -> array:
+        typecode = _code_type(len(dictionary))
+        if array(typecode).itemsize <= codes.itemsize:
+            return codes
+        return array(typecode, codes)
+
+    def _own(self) -> None:
+        # Columns loaded from a file are views of it; they are copied into
+        # arrays before the first change
+        if isinstance(self.amounts, array):
+            return None
+        for attribute in ('amounts', 'measure_codes', 'name_codes'):
+            view = getattr(self, attribute)
+            values = array(view.format)
+            values.frombytes(view.cast('B'))
+            setattr(self, attribute, values)
+        return None
+
+    def save(self, path: str) -> None:
+        """
+        Writes the list to a columnar file, replacing it atomically.
+
+        Parameters: Path of the file.
+
+        Return: Returns None.
+        """
+        _write_columns(path, LIST_MAGIC, len(self), [
+            ('amount', self.amounts, None),
+            ('measure', self.measure_codes, self.measures),
+            ('name', self.name_codes, self.names)])
+        return None
+
+    @classmethod
+    def load(cls, path: str) -> 'ColumnarShoppingList':
+        """
+        Loads a list saved with save. Its columns are views of the file
+        until the list is changed.
+
+        Parameters: Path of the file.
+
+        Return: The ColumnarShoppingList. Raises ValueError if the file is
+        not a saved shopping list.
+        """
+        count, columns = _read_columns(path, LIST_MAGIC)
+        try:
+            amounts, _ = columns['amount']
+            measure_codes, measures = columns['measure']
+            name_codes, names = columns['name']
+        except KeyError:
+            raise ValueError(f"{path} is missing a column") from None
+        shopping_list = cls()
+        shopping_list.amounts = amounts
+        shopping_list.measure_codes = measure_codes
+        shopping_list.name_codes = name_codes
+        shopping_list.measures = measures or []
+        shopping_list.names = names or []
+        shopping_list._measure_index = {measure: code for code, measure
+                                        in enumerate(shopping_list.measures)}
+        shopping_list._name_index = {name: code for code, name
+                                     in enumerate(shopping_list.names)}
+        return shopping_list
+
+    def to_list(self) -> list[tuple[float, str, str]]:
+        """
+        Returns the rows as a list of (amount, measure, name) tuples.
+        """
+        return list(self)
+
+    def __getitem__(self, index: int) -> tuple[float, str, str]:
+        return (self.amounts[index], self.measures[self.measure_codes[index]],
+                self.names[self.name_codes[index]])
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __iter__(self):
+        measures = self.measures
+        names = self.names
+        for amount, measure, name in zip(self.amounts, self.measure_codes,
+                                         self.name_codes):
+            yield (amount, measures[measure], names[name])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ColumnarShoppingList):
+            return self.to_list() == other.to_list()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ColumnarShoppingList({self.to_list()!r})"
+
+
+def save_plan(meal_plan, path: str) -> None:
+    """
+    Writes the recipes of a meal plan and the servings of each to a
+    columnar file, replacing it atomically. Amounts removed by hand with
+    rm -i are not saved.
+
+    Parameters: The meal plan, such as a MealPlan or SQLitePlan, and the
+    path of the file.
+
+    Return: Returns None.
+    """
+    servings = array('d')
+    recipes = []
+    for entry in meal_plan:
+        recipe, count = servings_of(entry)
+        recipes.append(recipe)
+        servings.append(count)
+    # Each recipe has one entry, so names need no codes of their own beyond
+    # their position; identical ingredient lists share a dictionary entry
+    ingredients = {}
+    ingredient_codes = [ingredients.setdefault(recipe.raw_ingredients,
+                                               len(ingredients))
+                        for recipe in recipes]
+    _write_columns(path, PLAN_MAGIC, len(recipes), [
+        ('servings', servings, None),
+        ('name', array(_code_type(len(recipes)), range(len(recipes))),
+         [recipe.name for recipe in recipes]),
+        ('ingredients', array(_code_type(len(ingredients)), ingredient_codes),
+         list(ingredients))])
+    return None
+
+
+def load_plan(path: str) -> list[ScaledRecipe]:
+    """
+    Loads the entries of a meal plan saved with save_plan.
+
+    Parameters: Path of the file.
+
+    Return: List of ScaledRecipe entries in plan order, which MealPlan and
+    add_recipe accept. Raises ValueError if the file is not a saved plan.
+
+    Example:
+    >>> save_plan(MealPlan([ScaledRecipe(PEANUT_BUTTER, 2)]), 'plan.smcol')
+    >>> MealPlan(load_plan('plan.smcol'))
+    [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil') x 2]
+    """
+    _, columns = _read_columns(path, PLAN_MAGIC)
+    try:
+        servings, _ = columns['servings']
+        name_codes, names = columns['name']
+        ingredient_codes, ingredients = columns['ingredients']
+    except KeyError:
+        raise ValueError(f"{path} is missing a column") from None
+    return [ScaledRecipe(compile_recipe((names[name], ingredients[code])),
+                         count)
+            for count, name, code in zip(servings, name_codes,
+                                         ingredient_codes)]
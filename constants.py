@@ -1,12 +1,24 @@
 HELP_TEXT = """    H or h: Help
     mkrec: creates a recipe, add to cook book.
-    add {recipe}: adds a recipe to the collection.
+    add {recipe} {servings}: adds a recipe to the collection, optionally
+    made several times.
     rm {recipe}: removes a recipe from the collection.
     rm -i {ingredient_name} {amount}: removes ingredient from shopping list.
     ls: list all recipes in shopping cart.
     ls -a: list all available recipes in cook book.
+    ls -a {prefix}: list recipes in cook book starting with prefix.
+    ls -i {ingredient}: list recipes in cook book using an ingredient.
     ls -s: display shopping list.
+    stock {amount} {measure} {ingredient}: adds stock to the pantry, which
+    is taken off the shopping list. A negative amount uses stock up.
+    rm -p {ingredient}: removes an ingredient from the pantry.
+    ls -p: list the ingredients in the pantry.
+    save {path}: saves the shopping list to a compact binary file.
+    save -p {path}: saves the recipes in the collection to a file.
+    load -p {path}: adds the recipes saved in a file to the collection.
     g or G: generates a shopping list.
+    stats: show how long commands took (start with --metrics).
+    profile {command}: run a command under the profiler.
     Q or q: Quit."""
 
 CHOCOLATE_PEANUT_BUTTER_SHAKE = ('chocolate peanut butter banana shake', 
@@ -19,4 +31,14 @@ CINNAMON_ROLLS = ('cinnamon rolls',
     '480 ml almond milk,115 g Nuttelex,50 g sugar,7 g active dry yeast,5.5 cup flour,1 tsp salt,170 g Nuttelex,165 g brown sugar,2 tbsp cinnamon,160 g powdered sugar,30 ml almond milk,0.5 tsp vanilla extract')
 PEANUT_BUTTER = ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')
 MUNG_BEAN_OMELETTE = ('omelette',
-    '1 cup mung bean,0.5 tsp salt,0.75 tsp pink salt,0.25 tsp garlic powder,0.25 tsp onion powder,0.125 tsp pepper,0.25 tsp turmeric,1 tsp oil,1 cup soy milk')
\ No newline at end of file
+    '1 cup mung bean,0.5 tsp salt,0.75 tsp pink salt,0.25 tsp garlic powder,0.25 tsp onion powder,0.125 tsp pepper,0.25 tsp turmeric,1 tsp oil,1 cup soy milk')
+
+# Recipes the cook book starts with
+COOK_BOOK = (
+    CHOCOLATE_PEANUT_BUTTER_SHAKE,
+    BROWNIE,
+    SEITAN,
+    CINNAMON_ROLLS,
+    PEANUT_BUTTER,
+    MUNG_BEAN_OMELETTE,
+)
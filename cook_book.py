@@ -0,0 +1,198 @@
+"""
+Cook book index. Recipes are held in a case-folded hash index for exact
+lookups, a prefix trie for listing and tab-completion by prefix, and an
+ingredient index for finding the recipes that use an ingredient. An index of
+names for suggesting recipes close to a mistyped name is built on first use.
+"""
+
+from ingredient_index import IngredientIndex
+from name_index import NameIndex, fold
+from recipe import Recipe, compile_recipe
+
+
+class _TrieNode:
+    __slots__ = ('children', 'key')
+
+    def __init__(self) -> None:
+        self.children = {}
+        # Case-folded recipe name ending at this node, if any
+        self.key = None
+
+
+class CookBook:
+    """
+    A collection of recipes indexed by case-folded name. Adding, finding and
+    removing a recipe are constant time in the size of the cook book, and
+    iteration follows the order recipes were added.
+
+    Parameters: Optional iterable of recipes, as Recipe objects or tuples
+    containing two strings.
+
+    Example:
+    >>> cook_book = CookBook([PEANUT_BUTTER, SEITAN])
+    >>> cook_book.find('Peanut Butter')
+    ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')
+    >>> cook_book.names_with_prefix('pea')
+    ['peanut butter']
+    >>> cook_book.recipes_using('salt')
+    [('peanut butter', 0.5, 'tsp', 'salt')]
+    >>> cook_book.similar_names('peanut buter')
+    ['peanut butter']
+    """
+
+    __slots__ = ('_recipes', '_order', '_next_order', '_trie', '_ingredients',
+                 '_names')
+
+    def __init__(self, recipes=()) -> None:
+        # Maps case-folded name to the compiled recipe, in insertion order
+        self._recipes = {}
+        # Maps case-folded name to its insertion position for prefix listing
+        self._order = {}
+        self._next_order = 0
+        self._trie = _TrieNode()
+        self._ingredients = IngredientIndex()
+        # NameIndex of the recipe names, None until similar_names needs it
+        self._names = None
+        for recipe in recipes:
+            self.add(recipe)
+
+    # Returns the case-folded, whitespace-normalised key for a recipe name
+    fold = staticmethod(fold)
+
+    def add(self, recipe: Recipe | tuple[str, str]) -> Recipe:
+        """
+        Adds a recipe to the cook book. A recipe with the same name replaces
+        the existing one and keeps its position.
+
+        Parameters: Recipe as a Recipe or a tuple containing two strings.
+
+        Return: The compiled recipe that was stored.
+        """
+        recipe = compile_recipe(recipe)
+        key = self.fold(recipe.name)
+        if key not in self._recipes:
+            self._order[key] = self._next_order
+            self._next_order += 1
+            node = self._trie
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+            node.key = key
+        self._recipes[key] = recipe
+        self._ingredients.add(recipe)
+        if self._names is not None:
+            self._names.add(recipe.name)
+        return recipe
+
+    def add_many(self, recipes) -> int:
+        """
+        Adds several recipes, as add does for each.
+
+        Parameters: Iterable of recipes, as Recipe objects or tuples
+        containing two strings.
+
+        Return: Number of recipes added.
+        """
+        count = 0
+        for recipe in recipes:
+            self.add(recipe)
+            count += 1
+        return count
+
+    def find(self, name: str) -> Recipe | None:
+        """
+        Finds a recipe by name, ignoring case.
+
+        Parameters: Recipe name as a string.
+
+        Return: The recipe, or None if it is not in the cook book.
+        """
+        return self._recipes.get(self.fold(name))
+
+    def remove(self, name: str) -> Recipe | None:
+        """
+        Removes a recipe by name, ignoring case.
+
+        Parameters: Recipe name as a string.
+
+        Return: The removed recipe, or None if it was not in the cook book.
+        """
+        key = self.fold(name)
+        recipe = self._recipes.pop(key, None)
+        if recipe is None:
+            return None
+        del self._order[key]
+        self._ingredients.remove(recipe.name)
+        if self._names is not None:
+            self._names.remove(key)
+        # Walk down to the name's node, then prune branches left empty
+        path = [self._trie]
+        for char in key:
+            path.append(path[-1].children[char])
+        path[-1].key = None
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.children or node.key is not None:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+        return recipe
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        """
+        Lists the names of recipes starting with a prefix, ignoring case, in
+        the order they were added.
+
+        Parameters: Prefix as a string.
+
+        Return: List of recipe names.
+        """
+        node = self._trie
+        for char in self.fold(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        keys = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.key is not None:
+                keys.append(node.key)
+            stack.extend(node.children.values())
+        keys.sort(key=self._order.__getitem__)
+        return [self._recipes[key].name for key in keys]
+
+    def recipes_using(self, ingredient: str, prefix: bool = False,
+                      limit: int | None = None) -> list[tuple[str, float, str, str]]:
+        """
+        Lists the recipes using an ingredient, matching ingredient names that
+        contain it, or with prefix, that have a word starting with it.
+
+        Parameters: Ingredient name or part of one as a string, whether to
+        match word prefixes and an optional limit on the number of results.
+
+        Return: List of (recipe name, amount, measure, ingredient name)
+        tuples, in the order recipes were added.
+        """
+        return self._ingredients.recipes_using(ingredient, prefix, limit)
+
+    def similar_names(self, name: str, limit: int = 5) -> list[str]:
+        """
+        Lists the names of recipes most similar to a possibly mistyped name,
+        as suggestions when it is not found.
+
+        Parameters: Recipe name as a string and the largest number of names
+        to return.
+
+        Return: List of recipe names, most similar first.
+        """
+        if self._names is None:
+            self._names = NameIndex(recipe.name for recipe in self)
+        return [found for found, _ in self._names.similar(name, limit)]
+
+    def __contains__(self, name: str) -> bool:
+        return self.fold(name) in self._recipes
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    def __iter__(self):
+        return iter(self._recipes.values())
@@ -0,0 +1,237 @@
+"""
+Bulk import of recipes from CSV and JSON-lines dumps. Files are read one
+line at a time, every ingredient is checked the way parse_ingredient reads
+it, malformed lines are reported by line number and skipped, and valid
+recipes reach the cook book in batches. Only one batch is held at a time.
+
+CSV rows hold the recipe name followed by its ingredients, either as one
+comma separated field or as one field per ingredient:
+
+    peanut butter,"300 g peanuts,0.5 tsp salt,2 tsp oil"
+    peanut butter,300 g peanuts,0.5 tsp salt,2 tsp oil
+
+An optional first row of "name,ingredients" is skipped. JSON lines hold an
+object with a name and ingredients, the latter as a string or a list:
+
+    {"name": "peanut butter", "ingredients": ["300 g peanuts", "2 tsp oil"]}
+"""
+
+import csv
+import json
+
+import plan_cache
+from ingredient_parser import parse
+
+# Recipes handed to the cook book at a time
+DEFAULT_BATCH_SIZE = 10000
+# Malformed lines kept for the report; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+CSV_EXTENSIONS = ('.csv',)
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson', '.json')
+
+
+class ImportReport:
+    """
+    Outcome of an import: how many recipes were imported, how many lines were
+    rejected and why.
+
+    Parameters: Maximum number of malformed lines to keep.
+    """
+
+    def __init__(self, max_errors: int = MAX_REPORTED_ERRORS) -> None:
+        self.imported = 0
+        self.rejected = 0
+        self.max_errors = max_errors
+        # (line number, message) of the first malformed lines
+        self.errors = []
+
+    def reject(self, line_number: int, message: str) -> None:
+        """
+        Records a malformed line.
+        """
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, message))
+
+    def __repr__(self) -> str:
+        return (f"ImportReport(imported={self.imported}, "
+                f"rejected={self.rejected})")
+
+
+def validate_recipe(name, ingredients) -> tuple[str, str]:
+    """
+    Checks that every ingredient of a recipe can be read the way
+    parse_ingredient reads it, with an amount that is a finite number
+    and not negative.
+
+    Parameters: Recipe name as a string and ingredients as a comma separated
+    string or a list of strings.
+
+    Return: The recipe as a tuple containing two strings. Raises ValueError
+    naming the problem if the recipe is malformed.
+
+    Example:
+    >>> validate_recipe('toast', ['2 each bread', 'lots of butter'])
+    Traceback (most recent call last):
+    ...
+    ValueError: ingredient 2 'lots of butter': amount is not a number
+    """
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("recipe name is missing")
+    if isinstance(ingredients, list):
+        if not all(isinstance(ingredient, str) for ingredient in ingredients):
+            raise ValueError("ingredients must be strings")
+        ingredients = ','.join(ingredients)
+    elif not isinstance(ingredients, str):
+        raise ValueError("ingredients are missing")
+    for position, raw in enumerate(ingredients.split(','), 1):
+        if not raw.strip():
+            raise ValueError(f"ingredient {position} is empty")
+        try:
+            parse(raw)
+        except ValueError as error:
+            raise ValueError(f"ingredient {position} {raw.strip()!r}: "
+                             f"{error}") from None
+    return (name.strip(), ingredients)
+
+
+def read_csv(lines, report: ImportReport):
+    """
+    Reads recipes from CSV lines, reporting malformed rows.
+
+    Parameters: Iterable of lines, such as an open file, and the report to
+    record malformed rows in.
+
+    Return: Generator of recipes as tuples containing two strings.
+    """
+    reader = csv.reader(lines)
+    first = True
+    line_number = 1
+    for row in reader:
+        # A quoted field may span lines; rows are reported by their first
+        start, line_number = line_number, reader.line_num + 1
+        if first:
+            first = False
+            if [field.strip().lower() for field in row] == ['name',
+                                                           'ingredients']:
+                continue
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) < 2:
+            report.reject(start, "expected a name and ingredients")
+            continue
+        try:
+            yield validate_recipe(row[0], row[1:])
+        except ValueError as error:
+            report.reject(start, str(error))
+
+
+def read_json_lines(lines, report: ImportReport):
+    """
+    Reads recipes from JSON lines, reporting malformed lines.
+
+    Parameters: Iterable of lines, such as an open file, and the report to
+    record malformed lines in.
+
+    Return: Generator of recipes as tuples containing two strings.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            report.reject(line_number, "line is not valid JSON")
+            continue
+        if not isinstance(data, dict):
+            report.reject(line_number, "expected an object with a name and "
+                          "ingredients")
+            continue
+        try:
+            yield validate_recipe(data.get('name'), data.get('ingredients'))
+        except ValueError as error:
+            report.reject(line_number, str(error))
+
+
+def write_batch(batch: list[tuple[str, str]], cook_book) -> None:
+    """
+    Adds a batch of recipes to a cook book with a single write where the
+    cook book supports it.
+
+    Parameters: List of recipes and the cook book, a CookBook, RecipeStore,
+    SQLiteCookBook or list of recipes.
+
+    Return: Returns None.
+    """
+    if isinstance(cook_book, list):
+        cook_book.extend(batch)
+        return None
+    cook_book.add_many(batch)
+    # Cached shopping lists may hold older versions of these recipes
+    for name, _ in batch:
+        plan_cache.invalidate(name)
+    return None
+
+
+def import_recipes(lines, cook_book, file_format: str = 'csv',
+                   batch_size: int = DEFAULT_BATCH_SIZE,
+                   report: ImportReport | None = None) -> ImportReport:
+    """
+    Imports recipes from CSV or JSON lines into a cook book in batches.
+    Recipes with the same name replace earlier ones.
+
+    Parameters: Iterable of lines, the cook book, the format ('csv' or
+    'jsonl'), the number of recipes per batch and optionally a report to
+    add to.
+
+    Return: The ImportReport.
+
+    Example:
+    >>> cook_book = CookBook()
+    >>> import_recipes(['toast,2 each bread,20 g butter', 'jam,sugar'],
+    ...                cook_book)
+    ImportReport(imported=1, rejected=1)
+    """
+    if report is None:
+        report = ImportReport()
+    if file_format == 'csv':
+        recipes = read_csv(lines, report)
+    elif file_format == 'jsonl':
+        recipes = read_json_lines(lines, report)
+    else:
+        raise ValueError(f"unknown import format {file_format!r}")
+    batch = []
+    for recipe in recipes:
+        batch.append(recipe)
+        if len(batch) >= batch_size:
+            write_batch(batch, cook_book)
+            report.imported += len(batch)
+            batch = []
+    if batch:
+        write_batch(batch, cook_book)
+        report.imported += len(batch)
+    return report
+
+
+def import_file(path: str, cook_book, file_format: str | None = None,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> ImportReport:
+    """
+    Imports a CSV or JSON-lines file into a cook book.
+
+    Parameters: Path of the file, the cook book, optionally the format
+    ('csv' or 'jsonl', worked out from the file extension by default) and
+    the number of recipes per batch.
+
+    Return: The ImportReport.
+    """
+    if file_format is None:
+        if path.lower().endswith(CSV_EXTENSIONS):
+            file_format = 'csv'
+        elif path.lower().endswith(JSON_LINES_EXTENSIONS):
+            file_format = 'jsonl'
+        else:
+            raise ValueError(f"cannot tell the format of {path}, expected "
+                             f"a .csv or .jsonl file")
+    with open(path, newline='', encoding='utf-8') as lines:
+        return import_recipes(lines, cook_book, file_format, batch_size)
@@ -0,0 +1,252 @@
+"""
+Inverted index from ingredients to the recipes that use them, answering
+questions such as "which recipes use peanuts". Ingredient names are
+folded like recipe names, substring queries are narrowed down with a
+trigram index and prefix queries use a sorted list of the words ingredient
+names are made of.
+"""
+
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from operator import itemgetter
+
+from name_index import fold
+from recipe import Recipe, compile_recipe
+
+
+def matches(name: str, query: str, prefix: bool = False) -> bool:
+    """
+    Checks whether an ingredient name matches a query the way the index
+    does.
+
+    Parameters: Ingredient name and query as strings, and whether the query
+    must start one of the name's words rather than appear anywhere in it.
+
+    Return: Boolean.
+
+    Example:
+    >>> matches('Peanut Butter', 'butt', prefix=True)
+    True
+    """
+    name = fold(name)
+    query = fold(query)
+    if prefix:
+        return name.startswith(query) or f' {query}' in name
+    return query in name
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class IngredientIndex:
+    """
+    Postings of (recipe, amount, measure) for every ingredient name, kept up
+    to date as recipes are added and removed.
+
+    Example:
+    >>> index = IngredientIndex([PEANUT_BUTTER, CHOCOLATE_PEANUT_BUTTER_SHAKE])
+    >>> index.recipes_using('peanut')
+    [('peanut butter', 300.0, 'g', 'peanuts'),
+    ('chocolate peanut butter banana shake', 2.0, 'tbsp', 'peanut butter')]
+    >>> index.recipes_using('butt', prefix=True)
+    [('chocolate peanut butter banana shake', 2.0, 'tbsp', 'peanut butter')]
+    """
+
+    __slots__ = ('_recipes', '_order', '_next_order', '_postings',
+                 '_trigrams', '_words', '_sorted_words')
+
+    def __init__(self, recipes=()) -> None:
+        # Maps folded recipe name to the compiled recipe, or to its
+        # (name, ingredients) tuple when restored by from_tuple
+        self._recipes = {}
+        # Maps folded recipe name to the position it was first added at
+        self._order = {}
+        self._next_order = 0
+        # Maps folded ingredient name to {recipe key: [(position in the
+        # recipe, amount, measure, ingredient name), ...]}
+        self._postings = {}
+        # Maps a trigram to the ingredient names containing it
+        self._trigrams = {}
+        # Maps a word to the ingredient names containing it, and the same
+        # words sorted for prefix ranges
+        self._words = {}
+        self._sorted_words = []
+        for recipe in recipes:
+            self.add(recipe)
+
+    def add(self, recipe: Recipe | tuple[str, str]) -> None:
+        """
+        Indexes a recipe's ingredients, replacing any recipe with the same
+        name.
+
+        Parameters: Recipe as a Recipe or a tuple containing two strings.
+
+        Return: Returns None.
+        """
+        recipe = compile_recipe(recipe)
+        key = fold(recipe.name)
+        # A replaced recipe keeps its position
+        position = self._order.get(key)
+        if position is None:
+            position = self._next_order
+            self._next_order += 1
+        else:
+            self.remove(recipe.name)
+        self._recipes[key] = recipe
+        self._order[key] = position
+        for index, ingredient in enumerate(recipe.ingredients):
+            name = ingredient.folded_name
+            postings = self._postings.get(name)
+            if postings is None:
+                postings = self._postings[name] = {}
+                self._add_name(name)
+            postings.setdefault(key, []).append(
+                (index, ingredient.amount, ingredient.measure, ingredient.name))
+        return None
+
+    def remove(self, recipe_name: str) -> None:
+        """
+        Removes a recipe's ingredients from the index.
+
+        Parameters: Recipe name as a string, compared ignoring case.
+
+        Return: Returns None.
+        """
+        key = fold(recipe_name)
+        recipe = self._recipes.pop(key, None)
+        if recipe is None:
+            return None
+        del self._order[key]
+        for ingredient in compile_recipe(recipe).ingredients:
+            name = ingredient.folded_name
+            postings = self._postings.get(name)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[name]
+                self._remove_name(name)
+        return None
+
+    def _add_name(self, name: str) -> None:
+        for trigram in _trigrams(name):
+            self._trigrams.setdefault(trigram, set()).add(name)
+        for word in set(name.split()):
+            names = self._words.get(word)
+            if names is None:
+                names = self._words[word] = set()
+                insort(self._sorted_words, word)
+            names.add(name)
+
+    def _remove_name(self, name: str) -> None:
+        for trigram in _trigrams(name):
+            names = self._trigrams[trigram]
+            names.discard(name)
+            if not names:
+                del self._trigrams[trigram]
+        for word in set(name.split()):
+            names = self._words[word]
+            names.discard(name)
+            if not names:
+                del self._words[word]
+                del self._sorted_words[bisect_left(self._sorted_words, word)]
+
+    def matching_names(self, query: str, prefix: bool = False) -> list[str]:
+        """
+        Finds the ingredient names matching a query.
+
+        Parameters: Query as a string. With prefix, names match when one of
+        their words starts with the query; otherwise when they contain it.
+
+        Return: List of folded ingredient names, sorted.
+        """
+        query = fold(query)
+        if prefix:
+            first, space, _ = query.partition(' ')
+            if space:
+                # The query's first word is complete, so only names with
+                # that word can match
+                return sorted(name for name in self._words.get(first, ())
+                              if matches(name, query, prefix=True))
+            names = set()
+            position = bisect_left(self._sorted_words, query)
+            while position < len(self._sorted_words) and \
+                    self._sorted_words[position].startswith(query):
+                names |= self._words[self._sorted_words[position]]
+                position += 1
+            return sorted(names)
+        if len(query) < 3:
+            # Too short for trigrams, the vocabulary is scanned instead
+            return sorted(name for name in self._postings if query in name)
+        candidates = None
+        for trigram in sorted(_trigrams(query),
+                              key=lambda gram: len(self._trigrams.get(gram, ()))):
+            names = self._trigrams.get(trigram)
+            if not names:
+                return []
+            candidates = set(names) if candidates is None \
+                else candidates & names
+            if not candidates:
+                return []
+        return sorted(name for name in candidates if query in name)
+
+    def recipes_using(self, query: str, prefix: bool = False,
+                      limit: int | None = None) -> list[tuple[str, float, str, str]]:
+        """
+        Lists the recipes using ingredients that match a query, with the
+        amount each uses.
+
+        Parameters: Query as a string, whether to match word prefixes
+        instead of substrings and an optional limit on the number of
+        results.
+
+        Return: List of (recipe name, amount, measure, ingredient name)
+        tuples, in the order recipes were added.
+        """
+        results = []
+        for name in self.matching_names(query, prefix):
+            for key, uses in self._postings[name].items():
+                position = self._order[key]
+                recipe_name = self._recipes[key][0]
+                for index, amount, measure, ingredient_name in uses:
+                    results.append((position, index, recipe_name, amount,
+                                    measure, ingredient_name))
+        # Recipes in the order they were added, each recipe's ingredients in
+        # the order they are listed
+        if limit is None:
+            results.sort(key=itemgetter(0, 1))
+        else:
+            results = nsmallest(limit, results, key=itemgetter(0, 1))
+        return [result[2:] for result in results]
+
+    def as_tuple(self) -> tuple:
+        """
+        Returns the index without its recipes as nested tuples, lists, sets
+        and dictionaries of strings and numbers, which marshal can save.
+        """
+        return (self._order, self._next_order, self._postings, self._trigrams,
+                self._words, self._sorted_words)
+
+    @classmethod
+    def from_tuple(cls, state: tuple, recipes) -> 'IngredientIndex':
+        """
+        Restores an index saved with as_tuple, without parsing its recipes
+        again. They are only compiled when they are removed.
+
+        Parameters: Tuple returned by as_tuple and the iterable of recipes
+        the index held, as Recipe objects or tuples containing two strings.
+
+        Return: The IngredientIndex.
+        """
+        index = cls()
+        index._recipes = {fold(recipe[0]): recipe for recipe in recipes}
+        (index._order, index._next_order, index._postings, index._trigrams,
+         index._words, index._sorted_words) = state
+        return index
+
+    def __contains__(self, recipe_name: str) -> bool:
+        return fold(recipe_name) in self._recipes
+
+    def __len__(self) -> int:
+        return len(self._postings)
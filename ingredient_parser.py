@@ -0,0 +1,141 @@
+"""
+The one parser for ingredients written as amount, measure and name, shared
+by every part of the program that reads recipes. Plain lines such as
+"0.5 tsp salt" take a fast path; anything else goes through a compiled
+grammar that understands
+
+    fractions          1/2 cup flour, 1 1/2 cup flour
+    unicode fractions  ½ cup flour, 1½ cup flour
+    ranges             2-3 tbsp oil, 2 to 3 tbsp oil (the larger amount)
+    glued measures     300g peanuts
+    missing measures   2 eggs (counted as 'each')
+    signed amounts     -2 eggs, as when stock is used up
+
+Amounts must be finite numbers, so 'nan', 'inf' and '1e400' are rejected,
+and only stock adjustments may be negative.
+
+Lines are not cached: recipes are compiled once each, and a cache lookup
+and store on every new line cost more than splitting it again.
+"""
+
+import re
+import unicodedata
+from math import isfinite
+
+# Measure given to ingredients written without one
+DEFAULT_MEASURE = 'each'
+
+# Vulgar fraction characters and their values
+UNICODE_FRACTIONS = {char: unicodedata.numeric(char)
+                     for char in '½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅐⅛⅜⅝⅞⅑⅒'}
+
+_FRACTION_CHARS = ''.join(UNICODE_FRACTIONS)
+_QUANTITY = (rf'(?:\d+(?:\.\d+)?\s+\d+\s*[/⁄]\s*\d+'
+             rf'|\d+\s*[/⁄]\s*\d+'
+             rf'|\d*\.?\d+\s*[{_FRACTION_CHARS}]'
+             rf'|[{_FRACTION_CHARS}]'
+             rf'|\d*\.?\d+(?:[eE][-+]?\d+)?)')
+INGREDIENT_PATTERN = re.compile(
+    rf'\s*(?P<sign>[-+])?(?P<low>{_QUANTITY})'
+    rf'(?:\s*(?:-|–|—|\bto\b)\s*(?P<high>{_QUANTITY}))?'
+    rf'\s*(?P<rest>.*)', re.DOTALL)
+_FRACTION = re.compile(r'(?:(\d+(?:\.\d+)?)\s+)?(\d+)\s*[/⁄]\s*(\d+)$')
+
+_INF = float('inf')
+
+
+def quantity_value(text: str) -> float:
+    """
+    Returns the value of a single quantity matched by the grammar.
+
+    Parameters: Quantity as a string, such as '1 1/2', '½' or '0.25'.
+
+    Return: The value as a float.
+
+    Example:
+    >>> quantity_value('1 1/2')
+    1.5
+    >>> quantity_value('1½')
+    1.5
+    """
+    fraction = _FRACTION.match(text)
+    if fraction is not None:
+        whole, numerator, denominator = fraction.groups()
+        if int(denominator) == 0:
+            raise ValueError("amount divides by zero")
+        return float(whole or 0) + int(numerator) / int(denominator)
+    if text[-1] in UNICODE_FRACTIONS:
+        whole = text[:-1].strip()
+        return float(whole or 0) + UNICODE_FRACTIONS[text[-1]]
+    return float(text)
+
+
+def parse(raw_ingredient_detail: str, signed: bool = False) -> tuple[float, str, str]:
+    """
+    Parses an ingredient written as amount, measure and name.
+
+    Parameters: The raw ingredient as a string. Optionally whether the
+    amount may be negative, as for stock taken out of the pantry.
+
+    Return: Tuple of the amount as a float and the measure and name as
+    strings. Raises ValueError if there is no amount, the amount is not
+    finite or is negative when not signed, or there is no name.
+
+    Example:
+    >>> parse('0.5 tsp coffee granules')
+    (0.5, 'tsp', 'coffee granules')
+    >>> parse('1 1/2 cup flour')
+    (1.5, 'cup', 'flour')
+    >>> parse('2-3 tbsp oil')
+    (3.0, 'tbsp', 'oil')
+    >>> parse('2 eggs')
+    (2.0, 'each', 'eggs')
+    >>> parse('-2 eggs', signed=True)
+    (-2.0, 'each', 'eggs')
+    """
+    # Fast path for the plain amount, measure and name form, with the name
+    # rejoined only when it is not already single spaced
+    try:
+        amount, measure, name = raw_ingredient_detail.split(None, 2)
+        amount = float(amount)
+    except ValueError:
+        return _parse_tolerant(raw_ingredient_detail, signed)
+    # A second word of anything but letters may continue the amount, as in
+    # '1 1/2 cup' or '2 - 3 tbsp', and the grammar reads it
+    if not measure.isalpha() or measure == 'to':
+        return _parse_tolerant(raw_ingredient_detail, signed)
+    if not 0.0 <= amount < _INF:
+        _check_amount(amount, signed)
+    if '  ' in name or name[-1] == ' ' or not name.isprintable():
+        name = ' '.join(name.split())
+    return (amount, measure, name)
+
+
+def _check_amount(amount: float, signed: bool) -> None:
+    # Called for amounts outside [0, inf), which signed lines allow below 0
+    if not isfinite(amount):
+        raise ValueError("amount is not finite")
+    if not signed:
+        raise ValueError("amount is negative")
+
+
+def _parse_tolerant(raw_ingredient_detail: str,
+                    signed: bool) -> tuple[float, str, str]:
+    result = raw_ingredient_detail.split()
+    if not result:
+        raise ValueError("ingredient is empty")
+    match = INGREDIENT_PATTERN.match(raw_ingredient_detail)
+    if match is None:
+        raise ValueError("amount is not a number")
+    # A range buys enough for its larger amount
+    amount = quantity_value(match['high'] or match['low'])
+    if match['sign'] == '-':
+        amount = -amount
+    if not 0.0 <= amount < _INF:
+        _check_amount(amount, signed)
+    rest = match['rest'].split()
+    if not rest:
+        raise ValueError("ingredient name is missing")
+    if len(rest) == 1:
+        return (amount, DEFAULT_MEASURE, rest[0])
+    return (amount, rest[0], ' '.join(rest[1:]))
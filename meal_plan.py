@@ -0,0 +1,233 @@
+"""
+Meal plan that keeps its shopping list up to date as recipes are added and
+removed, so the list never has to be regenerated from scratch.
+"""
+
+from pantry import Pantry
+from recipe import Recipe, ScaledRecipe, servings_of
+from shopping_list import ShoppingList
+from units import from_base, unit_info
+
+# Relative tolerance below which an adjusted amount counts as used up
+_EPSILON = 1e-9
+
+
+class MealPlan:
+    """
+    The recipes chosen for a meal plan together with their running shopping
+    list. Each recipe has one entry holding the number of times it is made,
+    so adding a recipe again scales its contribution instead of repeating
+    it. Adding or removing a recipe applies only that recipe's
+    ingredients, so showing the list costs one step per distinct ingredient.
+    Amounts removed by hand with rm -i are kept as an overlay on top of the
+    totals and survive later changes to the plan, until no recipe in the
+    plan uses the ingredient any more. When the recipe that first used an
+    ingredient leaves, the ingredient's row takes the measure and position
+    the next recipe using it gives, as a list generated afresh would.
+
+    The plan supports the list methods the shopping list functions use, so
+    it can be passed to add_recipe, remove_recipe and generate_shopping_list.
+
+    Parameters: Optional iterable of recipes, as Recipe objects, ScaledRecipe
+    entries or tuples containing two strings.
+
+    Example:
+    >>> meal_plan = MealPlan([PEANUT_BUTTER])
+    >>> meal_plan.append(ScaledRecipe(PEANUT_BUTTER, 2))
+    >>> meal_plan.adjust('peanuts', 100.0)
+    >>> meal_plan.shopping_list()
+    [(800.0, 'g', 'peanuts'), (1.5, 'tsp', 'salt'), (6.0, 'tsp', 'oil')]
+    >>> list(meal_plan)
+    [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil') x 3]
+    """
+
+    __slots__ = ('_servings', '_order', '_next_order', '_users', '_totals',
+                 '_adjustments')
+
+    def __init__(self, recipes=()) -> None:
+        # Maps each recipe to the number of times it is made, in the order
+        # recipes were first added
+        self._servings = {}
+        # Maps each recipe in the plan to the position it was added at
+        self._order = {}
+        self._next_order = 0
+        # Maps (name, dimension) to the recipes using it, in plan order
+        self._users = {}
+        # Shopping list of the whole plan before manual adjustments
+        self._totals = ShoppingList()
+        # Maps (name, dimension) to the base amount removed by hand
+        self._adjustments = {}
+        for recipe in recipes:
+            self.append(recipe)
+
+    def append(self, recipe: Recipe | ScaledRecipe | tuple[str, str]) -> None:
+        """
+        Adds a recipe to the plan and its ingredients to the shopping list.
+        A recipe already in the plan is made more times.
+
+        Parameters: Recipe as a Recipe, a ScaledRecipe giving the number of
+        servings, or a tuple containing two strings.
+
+        Return: Returns None.
+        """
+        recipe, servings = servings_of(recipe)
+        current = self._servings.get(recipe)
+        self._servings[recipe] = servings if current is None \
+            else current + servings
+        if current is None:
+            self._order[recipe] = self._next_order
+            self._next_order += 1
+            for ingredient in recipe.ingredients:
+                self._users.setdefault(
+                    (ingredient.name, ingredient.dimension), {})[recipe] = None
+        for ingredient in recipe.ingredients:
+            base_amount = ingredient.base_amount * servings
+            if current is None:
+                self._totals.merge_base(base_amount, ingredient.dimension,
+                                        ingredient.measure, ingredient.name)
+            else:
+                # The recipe's rows already count it, so only amounts grow
+                self._totals.shift_base(base_amount, ingredient.dimension,
+                                        ingredient.name)
+        return None
+
+    def remove(self, recipe: Recipe | ScaledRecipe | tuple[str, str]) -> None:
+        """
+        Takes servings of a recipe off the plan, one for plain recipes, and
+        their ingredients off the shopping list. The recipe leaves the plan
+        once no servings are left.
+
+        Parameters: Recipe as a Recipe, a ScaledRecipe giving the number of
+        servings, or a tuple containing two strings.
+
+        Return: Returns None. Raises ValueError if the recipe is not in the
+        plan, like list.remove.
+        """
+        recipe, servings = servings_of(recipe)
+        current = self._servings.get(recipe)
+        if current is None:
+            raise ValueError("recipe is not in the meal plan")
+        if current - servings > _EPSILON * current:
+            self._servings[recipe] = current - servings
+            for ingredient in recipe.ingredients:
+                self._totals.shift_base(-ingredient.base_amount * servings,
+                                        ingredient.dimension, ingredient.name)
+            return None
+        del self._servings[recipe]
+        del self._order[recipe]
+        # Rows the recipe was the first to use, that other recipes still use
+        moved = {}
+        for ingredient in recipe.ingredients:
+            self._totals.withdraw_base(ingredient.base_amount * current,
+                                       ingredient.dimension, ingredient.name)
+            key = (ingredient.name, ingredient.dimension)
+            users = self._users.get(key)
+            if users is not None and recipe in users:
+                first = next(iter(users)) == recipe
+                del users[recipe]
+                if not users:
+                    del self._users[key]
+                elif first:
+                    moved[key] = next(iter(users))
+            # Adjustments go with the row once nothing in the plan needs it
+            if key in self._adjustments and \
+                    self._totals.base_row(key) is None:
+                del self._adjustments[key]
+        if moved:
+            self._restate(moved)
+        return None
+
+    def _restate(self, moved: dict) -> None:
+        # Gives the moved rows the measure their new first recipe uses and
+        # puts every row where the first recipe using it puts it
+        positions = {}
+
+        def first_use(user, key):
+            found = positions.get(user)
+            if found is None:
+                found = positions[user] = {}
+                for index, ingredient in enumerate(user.ingredients):
+                    found.setdefault((ingredient.name, ingredient.dimension),
+                                     (index, ingredient.measure))
+            return found[key]
+
+        self._totals.reorder(
+            lambda key: (self._order[next(iter(self._users[key]))],
+                         first_use(next(iter(self._users[key])), key)[0]),
+            {key: first_use(user, key)[1] for key, user in moved.items()})
+
+    def adjust(self, ingredient_name: str, amount: float) -> None:
+        """
+        Removes an amount of an ingredient from the shopping list, in the
+        measure it is shown in. The adjustment is remembered and applied
+        however the plan changes afterwards.
+
+        Parameters: Ingredient name as a string and amount as a float.
+
+        Return: Returns None.
+        """
+        key = self._totals.key_of(ingredient_name)
+        if key is None:
+            return None
+        base_amount, measure = self._totals.base_row(key)
+        remaining = base_amount - self._adjustments.get(key, 0.0)
+        if remaining <= 0.0:
+            return None
+        removed = amount * unit_info(measure)[1]
+        # Never remove more than is currently on the list
+        self._adjustments[key] = self._adjustments.get(key, 0.0) + \
+            min(removed, remaining)
+        return None
+
+    def shopping_list(self, pantry: Pantry | None = None) -> list[tuple[float, str, str]]:
+        """
+        Returns the shopping list of the plan with manual adjustments
+        applied.
+
+        Parameters: Optionally a Pantry whose stock is taken off the list in
+        the same pass.
+
+        Return: List of tuples containing float of amount, and strings of
+        measure and ingredient name.
+        """
+        shopping_list = []
+        adjustments = self._adjustments
+        stock = {} if pantry is None else pantry.base_amounts
+        for name, dimension, base_amount, measure in self._totals.base_rows():
+            if adjustments or stock:
+                key = (name, dimension)
+                base_amount -= adjustments.get(key, 0.0) + stock.get(key, 0.0)
+                if base_amount <= _EPSILON * max(abs(base_amount), 1.0):
+                    continue
+            shopping_list.append((from_base(base_amount, measure), measure,
+                                  name))
+        return shopping_list
+
+    def column_widths(self) -> tuple[int, int] | None:
+        """
+        Returns the widths of the widest measure and ingredient name on the
+        shopping list, or None when manual adjustments may have removed
+        rows and the widths must be measured from the list instead.
+        """
+        if self._adjustments:
+            return None
+        return self._totals.column_widths()
+
+    def servings(self, recipe: Recipe | tuple[str, str]) -> float:
+        """
+        Returns the number of times a recipe is made in the plan, zero if
+        it is not in the plan.
+        """
+        return self._servings.get(servings_of(recipe)[0], 0.0)
+
+    def __len__(self) -> int:
+        return len(self._servings)
+
+    def __iter__(self):
+        # Recipes made once are given as they are
+        for recipe, servings in self._servings.items():
+            yield recipe if servings == 1.0 else ScaledRecipe(recipe,
+                                                               servings)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
@@ -0,0 +1,232 @@
+"""
+Opt-in instrumentation. While a Metrics registry is active, commands and
+the parsing, aggregation and rendering phases they run record their latency
+into histograms. While none is active, instrumented functions only check a
+module global before running as normal.
+
+A single command can also be profiled with cProfile and tracemalloc.
+"""
+
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# The registry recording measurements, if any
+active = None
+
+# Histogram buckets are powers of two in microseconds, up to about 1 hour
+BUCKETS = 32
+
+_NULL_CONTEXT = nullcontext()
+
+
+class Histogram:
+    """
+    Latencies of one operation in power-of-two microsecond buckets, with
+    the call count, total, minimum and maximum.
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'buckets')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+        # Bucket i holds latencies below 2 ** i microseconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns an upper bound on the given percentile, in seconds, from the
+        buckets. The maximum is exact.
+
+        Parameters: Percentile as a fraction, such as 0.95.
+        """
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(2 ** index / 1e6, self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'total': self.total,
+                'mean': self.total / self.count if self.count else 0.0,
+                'min': self.minimum if self.count else 0.0,
+                'max': self.maximum,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95),
+                'p99': self.percentile(0.99),
+                'buckets_us': {str(2 ** index): count for index, count
+                               in enumerate(self.buckets) if count}}
+
+
+class Metrics:
+    """
+    A registry of latency histograms keyed by operation name, such as
+    'command.g' or 'aggregate'.
+
+    Example:
+    >>> registry = Metrics().enable()
+    >>> with registry.timer('command.g'):
+    ...     generate_shopping_list(COOK_BOOK)
+    >>> registry.to_dict()['command.g']['count']
+    1
+    """
+
+    def __init__(self) -> None:
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> 'Metrics':
+        """
+        Makes this the active registry, so instrumented functions record
+        into it.
+
+        Return: The registry itself.
+        """
+        global active
+        active = self
+        return self
+
+    def disable(self) -> None:
+        """
+        Stops recording, if this is the active registry.
+        """
+        global active
+        if active is self:
+            active = None
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Records one latency.
+
+        Parameters: Operation name and its latency in seconds.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Records the latency of a with block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def to_dict(self) -> dict[str, dict]:
+        """
+        Returns every histogram as JSON-serialisable data, keyed by name.
+        """
+        with self._lock:
+            return {name: histogram.to_dict()
+                    for name, histogram in sorted(self.histograms.items())}
+
+    def export(self, path: str) -> None:
+        """
+        Writes every histogram to a JSON file.
+        """
+        with open(path, 'w') as export_file:
+            json.dump(self.to_dict(), export_file, indent=2)
+
+    def format_table(self) -> str:
+        """
+        Returns the histograms as a text table with times in milliseconds.
+        """
+        lines = [f"{'operation (ms)':<24} {'count':>7} {'mean':>9} "
+                 f"{'p50':>9} {'p95':>9} {'max':>9}"]
+        for name, data in self.to_dict().items():
+            lines.append(f"{name:<24} {data['count']:>7} "
+                         f"{data['mean'] * 1e3:>9.3f} "
+                         f"{data['p50'] * 1e3:>9.3f} "
+                         f"{data['p95'] * 1e3:>9.3f} "
+                         f"{data['max'] * 1e3:>9.3f}")
+        return '\n'.join(lines)
+
+
+def span(name: str):
+    """
+    Returns a context manager timing a block into the active registry, or a
+    shared no-op one when metrics are off.
+
+    Example:
+    >>> with span('render'):
+    ...     display_ingredients(shopping_list)
+    """
+    if active is None:
+        return _NULL_CONTEXT
+    return active.timer(name)
+
+
+def measured(name: str):
+    """
+    Decorates a function so each call is timed into the active registry
+    under a name. With metrics off the only cost is one global check.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            registry = active
+            if registry is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def profile(func, *args, limit: int = 15) -> tuple[object, str]:
+    """
+    Runs a function once under cProfile and tracemalloc.
+
+    Parameters: The function, its arguments and the number of functions to
+    list.
+
+    Return: Tuple of the function's return value and a report of the
+    functions with the most cumulative time and the peak memory allocated.
+    """
+    # The profilers are slow to import, so only commands run under profile
+    # pay for them
+    import cProfile
+    import pstats
+    import tracemalloc
+    profiler = cProfile.Profile()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = profiler.runcall(func, *args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(limit)
+    report.write(f"Peak memory allocated: {peak / 1024:.1f} KiB\n")
+    return result, report.getvalue()
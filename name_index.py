@@ -0,0 +1,254 @@
+"""
+Index of recipe names for finding the ones closest to a mistyped name.
+Similarity is measured on trigrams, the three character pieces of a name
+padded with spaces. Scoring every name against a query would be far too
+slow for a large cook book, so names are indexed by the words they are made
+of, and each word of the query is first matched against the much smaller
+vocabulary of words. A word one typo away from a word of the vocabulary is
+found by deleting single characters from both, as a missing, extra, wrong
+or swapped letter leaves the two with a deletion in common; words further
+off are matched by trigram similarity. Only the names containing the most
+of the query's words are then scored.
+"""
+
+import heapq
+from math import ceil
+
+# Smallest similarity, from 0 to 1, for a name to be suggested
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_LIMIT = 5
+# Smallest similarity for a word of the vocabulary to stand in for a
+# mistyped word of the query, and how many may stand in for one word
+WORD_THRESHOLD = 0.4
+WORD_CORRECTIONS = 3
+# Most names scored for one query, those closest in length to it first
+MAX_SCORED = 200
+
+
+def fold(name: str) -> str:
+    """
+    Returns the case-folded, whitespace-normalised form of a name. It is
+    also CookBook.fold and folds ingredient names, so recipe and ingredient
+    names are compared the same way everywhere.
+
+    Example:
+    >>> fold('  Peanut   BUTTER ')
+    'peanut butter'
+    """
+    return ' '.join(name.casefold().split())
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """
+    Returns the trigrams of a folded name or word. The text is padded with
+    spaces, so its start and end count for more than its middle.
+
+    Example:
+    >>> sorted(trigrams('dip'))
+    ['  d', ' di', 'dip', 'ip ']
+    """
+    padded = f'  {text} '
+    return frozenset([padded[i:i + 3] for i in range(len(padded) - 2)])
+
+
+def similarity(first: str, second: str) -> float:
+    """
+    Returns the trigram similarity of two names ignoring case, from 0 for
+    nothing in common to 1 for the same name.
+
+    Example:
+    >>> round(similarity('chocolate brownies', 'choclate brownie'), 2)
+    0.64
+    """
+    return _jaccard(trigrams(fold(first)), trigrams(fold(second)))
+
+
+def _jaccard(first: frozenset[str], second: frozenset[str]) -> float:
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def _deletions(word: str) -> set[str]:
+    # The word and every string made by deleting one of its characters
+    return {word, *(word[:i] + word[i + 1:] for i in range(len(word)))}
+
+
+class NameIndex:
+    """
+    The words and trigrams of every recipe name, kept up to date as names
+    are added and removed.
+
+    Parameters: Optional iterable of names.
+
+    Example:
+    >>> index = NameIndex(['chocolate brownies', 'cinnamon rolls',
+    ...                    '7 layer dip'])
+    >>> index.similar('choclate browny')
+    [('chocolate brownies', 0.52)]
+    >>> index.similar('7 layr dip')
+    [('7 layer dip', 0.64)]
+    """
+
+    __slots__ = ('_names', '_order', '_next_order', '_words', '_deletions',
+                 '_word_grams')
+
+    def __init__(self, names=()) -> None:
+        # Maps folded name to the name as written
+        self._names = {}
+        # Maps folded name to the position it was first added at
+        self._order = {}
+        self._next_order = 0
+        # Maps a word to the folded names containing it
+        self._words = {}
+        # Maps each word of the vocabulary, and each way of deleting one of
+        # its characters, to the words it came from
+        self._deletions = {}
+        # Maps a trigram to the words of the vocabulary containing it
+        self._word_grams = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        """
+        Indexes a name. A name already indexed, ignoring case, keeps its
+        position and takes the new spelling.
+
+        Parameters: Name as a string.
+
+        Return: Returns None.
+        """
+        key = fold(name)
+        if key in self._names:
+            self._names[key] = name
+            return None
+        self._names[key] = name
+        self._order[key] = self._next_order
+        self._next_order += 1
+        for word in set(key.split()):
+            keys = self._words.get(word)
+            if keys is None:
+                keys = self._words[word] = set()
+                for deletion in _deletions(word):
+                    self._deletions.setdefault(deletion, set()).add(word)
+                for gram in trigrams(word):
+                    self._word_grams.setdefault(gram, set()).add(word)
+            keys.add(key)
+        return None
+
+    def remove(self, name: str) -> None:
+        """
+        Removes a name from the index, ignoring case.
+
+        Parameters: Name as a string.
+
+        Return: Returns None.
+        """
+        key = fold(name)
+        if self._names.pop(key, None) is None:
+            return None
+        del self._order[key]
+        for word in set(key.split()):
+            keys = self._words[word]
+            keys.discard(key)
+            if keys:
+                continue
+            # The last name with the word went, so the word leaves the
+            # vocabulary
+            del self._words[word]
+            for deletion in _deletions(word):
+                words = self._deletions[deletion]
+                words.discard(word)
+                if not words:
+                    del self._deletions[deletion]
+            for gram in trigrams(word):
+                words = self._word_grams[gram]
+                words.discard(word)
+                if not words:
+                    del self._word_grams[gram]
+        return None
+
+    def similar(self, query: str, limit: int = DEFAULT_LIMIT,
+                threshold: float = DEFAULT_THRESHOLD) -> list[tuple[str, float]]:
+        """
+        Finds the names most similar to a query.
+
+        Parameters: Query as a string, the largest number of names to return
+        and the smallest similarity, from 0 to 1, a name must have.
+
+        Return: List of (name, similarity) tuples, most similar first and
+        names equally similar in the order they were added. Similarities
+        are rounded to two places.
+        """
+        query = fold(query)
+        # The names containing each word of the query, or a correction of it
+        matched = [keys for keys in map(self._names_with_word,
+                                        set(query.split())) if keys]
+        if not matched:
+            return []
+        candidates = self._most_matched(matched)
+        if len(candidates) > MAX_SCORED:
+            length = len(query)
+            candidates = heapq.nsmallest(
+                MAX_SCORED, candidates, key=lambda key: abs(len(key) - length))
+        grams = trigrams(query)
+        scored = []
+        for key in candidates:
+            score = _jaccard(grams, trigrams(key))
+            if score >= threshold:
+                scored.append((-score, self._order[key], key))
+        scored.sort()
+        return [(self._names[key], round(-score, 2))
+                for score, _, key in scored[:limit]]
+
+    def _names_with_word(self, word: str) -> set[str]:
+        keys = self._words.get(word)
+        if keys is not None:
+            return keys
+        found = set()
+        for correction in self._corrections(word):
+            found |= self._words[correction]
+        return found
+
+    def _corrections(self, word: str) -> list[str]:
+        # The closest words of the vocabulary, one typo away if any are
+        grams = trigrams(word)
+        candidates = set()
+        for deletion in _deletions(word):
+            candidates.update(self._deletions.get(deletion, ()))
+        if candidates:
+            return sorted(candidates,
+                          key=lambda candidate: -_jaccard(
+                              grams, trigrams(candidate)))[:WORD_CORRECTIONS]
+        # A word reaching the threshold shares at least needed trigrams with
+        # the mistyped one, so it is listed under one of its rarest trigrams
+        needed = max(1, ceil(WORD_THRESHOLD * len(grams) - 1e-9))
+        postings = self._word_grams
+        rarest = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - needed + 1]:
+            candidates.update(postings.get(gram, ()))
+        scored = []
+        for candidate in candidates:
+            score = _jaccard(grams, trigrams(candidate))
+            if score >= WORD_THRESHOLD:
+                scored.append((-score, candidate))
+        scored.sort()
+        return [candidate for _, candidate in scored[:WORD_CORRECTIONS]]
+
+    @staticmethod
+    def _most_matched(matched: list[set[str]]) -> set[str]:
+        # Intersects the rarest sets first, leaving out any word that would
+        # empty the result, such as one the name does not have
+        matched.sort(key=len)
+        candidates = matched[0]
+        for keys in matched[1:]:
+            narrowed = candidates & keys
+            if narrowed:
+                candidates = narrowed
+        return candidates
+
+    def __contains__(self, name: str) -> bool:
+        return fold(name) in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
@@ -0,0 +1,241 @@
+"""
+Pantry of ingredients already in stock, subtracted from shopping lists after
+aggregation. Stock is indexed by ingredient name and unit dimension and held
+in base units, like the shopping list, so '1 kg' of flour in stock covers
+'500 g' on the list. A pantry can be kept in a file of ingredient lines,
+
+    2.0 kg flour
+    12.0 each eggs
+
+which is read with the shared ingredient parser, so any such file can also
+be used for bulk stock updates.
+"""
+
+import os
+
+from ingredient_parser import parse
+from units import from_base, unit_info
+
+# Relative tolerance below which an amount counts as used up
+_EPSILON = 1e-9
+
+
+class Pantry:
+    """
+    Stock levels keyed by ingredient name and dimension. Adding stock,
+    looking it up and removing it are constant time, and subtracting the
+    pantry from a shopping list is a single pass over the list.
+
+    Parameters: Optional iterable of ingredient details as tuples of amount,
+    measure and ingredient name, and the file the pantry is saved to.
+
+    Example:
+    >>> pantry = Pantry([(1.0, 'kg', 'peanuts'), (1.0, 'tsp', 'salt')])
+    >>> pantry.subtract([(1200.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt'),
+    (2.0, 'tsp', 'oil')])
+    [(200.0, 'g', 'peanuts'), (2.0, 'tsp', 'oil')]
+    """
+
+    __slots__ = ('base_amounts', '_measures', '_names', 'path', 'changed')
+
+    def __init__(self, items=(), path: str | None = None) -> None:
+        # Maps (name, dimension) to the base amount in stock
+        self.base_amounts = {}
+        # Maps (name, dimension) to the measure stock is shown in
+        self._measures = {}
+        # Maps name to its keys, in the order first stocked
+        self._names = {}
+        self.path = path
+        # Whether stock changed since the pantry was loaded or saved
+        self.changed = False
+        self.add_many(items)
+
+    @classmethod
+    def open(cls, path: str) -> 'Pantry':
+        """
+        Loads a pantry from a file of ingredient lines, or starts an empty
+        one that will be saved there if the file does not exist yet.
+
+        Parameters: Path of the pantry file.
+
+        Return: The Pantry. Raises ValueError naming the line of a
+        malformed ingredient.
+        """
+        pantry = cls(path=path)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as lines:
+                pantry.add_lines(lines)
+            pantry.changed = False
+        return pantry
+
+    def add(self, ingredient_details: tuple[float, str, str]) -> None:
+        """
+        Adds stock of an ingredient, or takes it away for a negative
+        amount. Stock that runs out is removed.
+
+        Parameters: Ingredient details as a tuple of amount, measure and
+        ingredient name.
+
+        Return: Returns None.
+        """
+        amount, measure, name = ingredient_details
+        dimension, factor = unit_info(measure)
+        key = (name, dimension)
+        base_amount = self.base_amounts.get(key)
+        self.changed = True
+        if base_amount is None:
+            if amount <= 0.0:
+                return None
+            self.base_amounts[key] = amount * factor
+            self._measures[key] = measure
+            self._names.setdefault(name, []).append(key)
+            return None
+        base_amount += amount * factor
+        if base_amount > _EPSILON * max(abs(base_amount), 1.0):
+            self.base_amounts[key] = base_amount
+        else:
+            self._delete(key)
+        return None
+
+    def add_many(self, items) -> int:
+        """
+        Adds stock of many ingredients at once, for example a delivery.
+
+        Parameters: Iterable of ingredient details as tuples of amount,
+        measure and ingredient name.
+
+        Return: Number of ingredients added.
+        """
+        count = 0
+        for count, item in enumerate(items, 1):
+            self.add(item)
+        return count
+
+    def add_lines(self, lines) -> int:
+        """
+        Adds stock from ingredient lines such as '2 kg flour', skipping
+        blank lines.
+
+        Parameters: Iterable of lines, such as an open file.
+
+        Return: Number of ingredients added. Raises ValueError naming the
+        line of a malformed ingredient.
+        """
+        count = 0
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                self.add(parse(line, signed=True))
+            except ValueError as error:
+                raise ValueError(f"line {line_number}: {error}") from None
+            count += 1
+        return count
+
+    def discard(self, ingredient_name: str) -> None:
+        """
+        Removes an ingredient from the pantry in every measure.
+
+        Parameters: Ingredient name as a string.
+
+        Return: Returns None.
+        """
+        for key in list(self._names.get(ingredient_name, ())):
+            self._delete(key)
+            self.changed = True
+        return None
+
+    def _delete(self, key: tuple[str, str]) -> None:
+        del self.base_amounts[key]
+        del self._measures[key]
+        keys = self._names[key[0]]
+        keys.remove(key)
+        if not keys:
+            del self._names[key[0]]
+
+    def get(self, ingredient_name: str) -> tuple[float, str, str] | None:
+        """
+        Looks up the stock of an ingredient.
+
+        Parameters: Ingredient name as a string.
+
+        Return: The first stock of the ingredient as a tuple of amount,
+        measure and name, or None if not in stock.
+        """
+        keys = self._names.get(ingredient_name)
+        if not keys:
+            return None
+        measure = self._measures[keys[0]]
+        return (from_base(self.base_amounts[keys[0]], measure), measure,
+                ingredient_name)
+
+    def subtract(self, shopping_list: list[tuple[float, str, str]]) -> list[tuple[float, str, str]]:
+        """
+        Takes the stock off a shopping list in one pass. Rows fully covered
+        by stock are left out.
+
+        Parameters: The shopping list as a list of tuples containing float
+        of amount, and strings of measure and ingredient name.
+
+        Return: The shopping list still to buy, in the same form and order.
+        """
+        stock = self.base_amounts
+        if not stock:
+            return list(shopping_list)
+        # Dimension and factor of each measure, looked up once per measure
+        units = {}
+        result = []
+        append = result.append
+        for item in shopping_list:
+            amount, measure, name = item
+            info = units.get(measure)
+            if info is None:
+                info = units[measure] = unit_info(measure)
+            held = stock.get((name, info[0]))
+            if held is None:
+                append(item)
+                continue
+            base_amount = amount * info[1] - held
+            if base_amount > _EPSILON * max(abs(base_amount), 1.0):
+                append((from_base(base_amount, measure), measure, name))
+        return result
+
+    def save(self, path: str | None = None) -> None:
+        """
+        Writes the pantry to a file of ingredient lines, replacing it
+        atomically.
+
+        Parameters: Path of the file, the pantry's own path by default.
+
+        Return: Returns None.
+        """
+        path = self.path if path is None else path
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as pantry_file:
+            pantry_file.write(''.join(f"{amount!r} {measure} {name}\n"
+                                      for amount, measure, name in self))
+        os.replace(temporary_path, path)
+        self.changed = False
+        return None
+
+    def close(self) -> None:
+        """
+        Saves the pantry to its file if stock changed.
+        """
+        if self.path is not None and self.changed:
+            self.save()
+
+    def __contains__(self, ingredient_name: str) -> bool:
+        return ingredient_name in self._names
+
+    def __len__(self) -> int:
+        return len(self.base_amounts)
+
+    def __iter__(self):
+        measures = self._measures
+        for key, base_amount in self.base_amounts.items():
+            yield (from_base(base_amount, measures[key]), measures[key],
+                   key[0])
+
+    def __repr__(self) -> str:
+        return f"Pantry({list(self)!r})"
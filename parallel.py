@@ -0,0 +1,161 @@
+"""
+Parallel shopping list generation for very large meal plans. The plan is cut
+into contiguous shards, and each shard is parsed and grouped per ingredient
+in a worker process. The parent then adds up each ingredient's amounts in
+shard order, one C-level reduction per distinct ingredient of each shard.
+Amounts are added one at a time in plan order, exactly as the serial
+generate_shopping_list adds them, and merging keeps the first-seen order
+and first measure of every ingredient, so the result is identical to the
+serial one.
+"""
+
+import os
+from array import array
+from functools import reduce
+from operator import add
+
+from recipe import ScaledRecipe, compile_recipe
+from units import from_base
+
+# Smallest shard worth sending to another process
+MIN_SHARD_SIZE = 1000
+
+
+def aggregate_shard(recipes: list[tuple[str, str]]) -> tuple[list[array], list[tuple[str, str, str]]]:
+    """
+    Parses one shard of a meal plan and groups its amounts per ingredient.
+    Runs in a worker process.
+
+    Parameters: List of recipes as tuples containing two strings, with the
+    number of servings as a third item for recipes made more than once.
+
+    Return: Partial result: the base amounts of each code in plan order,
+    and the (name, dimension, first measure) of each code in first-seen
+    order.
+    """
+    code_of = {}
+    labels = []
+    amounts = []
+    for recipe in recipes:
+        servings = recipe[2] if len(recipe) > 2 else 1.0
+        for ingredient in compile_recipe(recipe).ingredients:
+            key = (ingredient.name, ingredient.dimension)
+            code = code_of.get(key)
+            if code is None:
+                code = code_of[key] = len(labels)
+                labels.append((ingredient.name, ingredient.dimension,
+                               ingredient.measure))
+                amounts.append(array('d'))
+            amounts[code].append(ingredient.base_amount * servings)
+    return amounts, labels
+
+
+def merge_partials(first: tuple, second: tuple) -> tuple[list[array], list[tuple[str, str, str]]]:
+    """
+    Merges the partial results of two consecutive shards. Merging only
+    appends amounts, so it is associative and shards may be combined in any
+    grouping as long as their order is kept.
+
+    Parameters: Partial results of the earlier and the later shard.
+
+    Return: Partial result covering both shards.
+
+    Example:
+    >>> merged = merge_partials(aggregate_shard([PEANUT_BUTTER]),
+    ...                         aggregate_shard([PEANUT_BUTTER]))
+    >>> list(merged[0][0]), [label[0] for label in merged[1]]
+    ([300.0, 300.0], ['peanuts', 'salt', 'oil'])
+    """
+    amounts = [array('d', code_amounts) for code_amounts in first[0]]
+    labels = list(first[1])
+    code_of = {label[:2]: code for code, label in enumerate(labels)}
+    for code_amounts, label in zip(*second):
+        code = code_of.get(label[:2])
+        if code is None:
+            code_of[label[:2]] = len(labels)
+            labels.append(label)
+            amounts.append(array('d', code_amounts))
+        else:
+            amounts[code].extend(code_amounts)
+    return amounts, labels
+
+
+def _shopping_list(partials) -> list[tuple[float, str, str]]:
+    # Adds each shard's amounts in order to running totals, one at a time
+    # like ShoppingList.merge_base, so the sums round the same way
+    totals = []
+    labels = []
+    code_of = {}
+    for partial in partials:
+        for code_amounts, label in zip(*partial):
+            code = code_of.get(label[:2])
+            if code is None:
+                code_of[label[:2]] = len(labels)
+                labels.append(label)
+                totals.append(reduce(add, code_amounts))
+            else:
+                totals[code] = reduce(add, code_amounts, totals[code])
+    return [(from_base(total, measure), measure, name)
+            for total, (name, _, measure) in zip(totals, labels)]
+
+
+def shards(recipes: list, shard_size: int):
+    """
+    Cuts a meal plan into consecutive shards of recipes in the plain tuple
+    form, which is cheap to send to worker processes.
+
+    Parameters: List of recipes and the number of recipes per shard.
+
+    Return: Generator of lists of tuples containing two strings, and the
+    servings for ScaledRecipe entries.
+    """
+    for start in range(0, len(recipes), shard_size):
+        yield [(recipe[0], recipe[1], recipe.servings)
+               if isinstance(recipe, ScaledRecipe) else (recipe[0], recipe[1])
+               for recipe in recipes[start:start + shard_size]]
+
+
+def aggregate_parallel(recipes, workers: int | None = None,
+                       shard_size: int | None = None,
+                       executor: 'concurrent.futures.Executor | None' = None) -> list[tuple[float, str, str]]:
+    """
+    Generates the shopping list of a meal plan across several processes.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings. Optionally the number of worker
+    processes (the number of CPUs by default), the number of recipes per
+    shard (an even split across the workers by default) and an executor to
+    reuse instead of starting a new process pool.
+
+    Return: Returns the shopping list of ingredients formatted as a list
+    of tuples containing float of amount, and strings of measure and
+    ingredient name.
+
+    Example:
+    >>> aggregate_parallel([PEANUT_BUTTER] * 10000, workers=4)
+    [(3000000.0, 'g', 'peanuts'), (5000.000000001, 'tsp', 'salt'),
+    (20000.000000004, 'tsp', 'oil')]
+    """
+    recipes = list(recipes)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if shard_size is None:
+        shard_size = max(MIN_SHARD_SIZE, -(-len(recipes) // workers))
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1")
+    # Small plans are not worth the cost of starting processes. They are
+    # still cut into the tuple form, which carries the servings of
+    # ScaledRecipe entries to aggregate_shard
+    if workers <= 1 or len(recipes) <= shard_size:
+        return _shopping_list(map(aggregate_shard,
+                                  shards(recipes, max(len(recipes), 1))))
+    # map returns results in shard order, whichever finishes first
+    if executor is not None:
+        return _shopping_list(executor.map(aggregate_shard,
+                                           shards(recipes, shard_size)))
+    # Imported here, as multiprocessing is slow to import and only large
+    # plans need it
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        return _shopping_list(pool.map(aggregate_shard,
+                                       shards(recipes, shard_size)))
@@ -0,0 +1,197 @@
+"""
+Memoised shopping lists for meal plans that are generated again and again.
+Plans are keyed by the servings of each of their recipes, so the same
+recipes in any order share one entry, and entries are evicted least recently
+used first. A recipe's contents are part of its identity, and every cache drops
+the entries of a recipe when it is edited or removed from a cook book.
+"""
+
+import threading
+import weakref
+from collections import Counter, OrderedDict
+
+from cook_book import CookBook
+from recipe import servings_of
+from units import from_base
+
+# Every live cache, so cook book changes can reach all of them
+_CACHES = weakref.WeakSet()
+# Finished lists kept per plan, one for each order its recipes came in
+MAX_ORDERS = 8
+
+
+def invalidate(recipe_name: str) -> int:
+    """
+    Drops the cached plans that use a recipe from every cache. Called when
+    a recipe is edited or removed through add_recipe or remove_recipe.
+
+    Parameters: Recipe name as a string, compared ignoring case.
+
+    Return: Number of entries dropped.
+    """
+    return sum(cache.invalidate(recipe_name) for cache in list(_CACHES))
+
+
+class ShoppingListCache:
+    """
+    A bounded cache of shopping lists keyed by the multiset of recipes in a
+    meal plan. Totals are cached in base units; the order of rows and the
+    measure each is shown in follow the order of the recipes in each
+    request, so results match generate_shopping_list. The finished list is
+    also cached for the last few orders each plan was requested in, so a
+    repeated request only copies its rows.
+
+    Parameters: Maximum number of meal plans to keep.
+
+    Example:
+    >>> cache = ShoppingListCache()
+    >>> cache.generate([PEANUT_BUTTER, SEITAN])
+    [(300.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt'), ...]
+    >>> cache.generate([SEITAN, PEANUT_BUTTER])[:2]
+    [(1.0, 'cup', 'vital wheat gluten'), (0.2, 'cup', 'chickpea flour')]
+    >>> cache.stats()
+    {'hits': 1, 'misses': 1, 'evictions': 0, 'invalidations': 0, 'entries': 1}
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Maps a plan key to its totals per (name, dimension) and its
+        # finished lists by recipe order, oldest first
+        self._entries = OrderedDict()
+        # Maps a case-folded recipe name to the plan keys using it
+        self._by_recipe = {}
+        self._lock = threading.Lock()
+        _CACHES.add(self)
+
+    def generate(self, recipes) -> list[tuple[float, str, str]]:
+        """
+        Returns the shopping list for the recipes, from the cache when the
+        same recipes have been seen before.
+
+        Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe
+        entries or tuples containing two strings.
+
+        Return: List of tuples containing float of amount, and strings of
+        measure and ingredient name.
+        """
+        # Distinct recipes with their total servings, in first-seen order
+        counts = Counter()
+        for entry in recipes:
+            recipe, servings = servings_of(entry)
+            counts[recipe] += servings
+        order = tuple(counts.items())
+        key = frozenset(order)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                totals, orders = cached
+                shopping_list = orders.get(order)
+                if shopping_list is not None:
+                    orders.move_to_end(order)
+                    return list(shopping_list)
+        if cached is None:
+            totals = self._aggregate(counts)
+            cached = self._store(key, counts, totals)
+        shopping_list = self._ordered(counts, totals)
+        with self._lock:
+            orders = cached[1]
+            orders[order] = shopping_list
+            while len(orders) > MAX_ORDERS:
+                orders.popitem(last=False)
+        return list(shopping_list)
+
+    @staticmethod
+    def _ordered(counts: Counter,
+                 totals: dict) -> list[tuple[float, str, str]]:
+        # Rows follow the order and first measure of the recipes
+        shopping_list = []
+        seen = set()
+        for recipe in counts:
+            for ingredient in recipe.ingredients:
+                row_key = (ingredient.name, ingredient.dimension)
+                if row_key not in seen:
+                    seen.add(row_key)
+                    shopping_list.append((from_base(totals[row_key],
+                                                    ingredient.measure),
+                                          ingredient.measure,
+                                          ingredient.name))
+        return shopping_list
+
+    @staticmethod
+    def _aggregate(counts: Counter) -> dict[tuple[str, str], float]:
+        # Each distinct recipe contributes once, scaled by its count
+        totals = {}
+        for recipe, count in counts.items():
+            for ingredient in recipe.ingredients:
+                row_key = (ingredient.name, ingredient.dimension)
+                totals[row_key] = totals.get(row_key, 0.0) + \
+                    ingredient.base_amount * count
+        return totals
+
+    def _store(self, key: frozenset, counts: Counter, totals: dict) -> list:
+        with self._lock:
+            self.misses += 1
+            if key in self._entries:
+                return self._entries[key]
+            entry = self._entries[key] = [totals, OrderedDict()]
+            for recipe in counts:
+                self._by_recipe.setdefault(CookBook.fold(recipe.name),
+                                           set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+                self.evictions += 1
+            return entry
+
+    def _forget(self, key: frozenset) -> None:
+        # Removes a plan key from the reverse index
+        for recipe, _ in key:
+            keys = self._by_recipe.get(CookBook.fold(recipe.name))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_recipe[CookBook.fold(recipe.name)]
+
+    def invalidate(self, recipe_name: str) -> int:
+        """
+        Drops the cached plans that use a recipe.
+
+        Parameters: Recipe name as a string, compared ignoring case.
+
+        Return: Number of entries dropped.
+        """
+        with self._lock:
+            keys = self._by_recipe.pop(CookBook.fold(recipe_name), set())
+            for key in keys:
+                self._entries.pop(key, None)
+                self._forget(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """
+        Empties the cache, keeping its counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._by_recipe.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the hit, miss, eviction and invalidation counters and the
+        number of cached plans.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions,
+                    'invalidations': self.invalidations,
+                    'entries': len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
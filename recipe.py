@@ -0,0 +1,222 @@
+"""
+Compiled recipe representation. Ingredients are parsed once into compact
+records so the shopping list functions never re-split recipe strings.
+"""
+
+from array import array
+from functools import lru_cache
+from math import isfinite
+
+from ingredient_parser import parse
+from metrics import measured
+from name_index import fold
+from units import unit_info
+
+
+class Ingredient:
+    """
+    A single parsed ingredient of a recipe.
+
+    Parameters: Amount as a float, measure and ingredient name as strings.
+
+    Example:
+    >>> Ingredient.from_string('0.5 tsp coffee granules')
+    Ingredient(0.5, 'tsp', 'coffee granules')
+    """
+
+    __slots__ = ('amount', 'measure', 'name', 'folded_name', 'base_amount',
+                 'dimension')
+
+    def __init__(self, amount: float, measure: str, name: str) -> None:
+        self.amount = amount
+        self.measure = measure
+        self.name = name
+        # Case-folded name used for case-insensitive searches
+        self.folded_name = fold(name)
+        # Amount in the base unit of its dimension, used for aggregation
+        self.dimension, factor = unit_info(measure)
+        self.base_amount = amount * factor
+
+    @classmethod
+    def from_string(cls, raw_ingredient_detail: str) -> 'Ingredient':
+        """
+        Parses an ingredient written as amount, measure and name, with the
+        shared parser in ingredient_parser.
+
+        Parameters: The raw ingredient as a string.
+
+        Return: The parsed Ingredient.
+        """
+        return cls(*parse(raw_ingredient_detail))
+
+    def as_tuple(self) -> tuple[float, str, str]:
+        """
+        Returns the ingredient as a tuple of amount, measure and name.
+        """
+        return (self.amount, self.measure, self.name)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Ingredient):
+            return self.as_tuple() == other.as_tuple()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Ingredient({self.amount!r}, {self.measure!r}, {self.name!r})"
+
+
+class Recipe:
+    """
+    A recipe whose ingredients have been parsed once and cached. It still
+    behaves like the (name, ingredients) tuple form, so it can be indexed,
+    unpacked, compared and printed exactly like the tuples in constants.py.
+
+    Parameters: Recipe name and comma separated ingredients as strings.
+
+    Example:
+    >>> recipe = Recipe('peanut butter', '300 g peanuts,0.5 tsp salt')
+    >>> recipe.ingredients
+    (Ingredient(300.0, 'g', 'peanuts'), Ingredient(0.5, 'tsp', 'salt'))
+    >>> recipe == ('peanut butter', '300 g peanuts,0.5 tsp salt')
+    True
+    """
+
+    __slots__ = ('name', 'raw_ingredients', 'ingredients', 'base_amounts')
+
+    def __init__(self, name: str, raw_ingredients: str) -> None:
+        self.name = name
+        self.raw_ingredients = raw_ingredients
+        self.ingredients = tuple(Ingredient.from_string(ingredient)
+                                 for ingredient in raw_ingredients.split(','))
+        # Base amounts as a packed float64 array for batch aggregation
+        self.base_amounts = array('d', (ingredient.base_amount
+                                        for ingredient in self.ingredients))
+
+    def as_tuple(self) -> tuple[str, str]:
+        """
+        Returns the recipe in its (name, ingredients) tuple form.
+        """
+        return (self.name, self.raw_ingredients)
+
+    def __getitem__(self, index):
+        return self.as_tuple()[index]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Recipe):
+            return self.as_tuple() == other.as_tuple()
+        if isinstance(other, tuple):
+            return self.as_tuple() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.as_tuple())
+
+    def __repr__(self) -> str:
+        return repr(self.as_tuple())
+
+
+class ScaledRecipe:
+    """
+    A meal plan entry for a recipe made a number of times, so a plan holding
+    a recipe twenty times keeps one entry and aggregates it as a single
+    contribution scaled by twenty. Like Recipe it can be indexed and
+    unpacked in the (name, ingredients) tuple form.
+
+    Parameters: Recipe as a Recipe or a tuple containing two strings, and
+    the number of servings as a positive float.
+
+    Example:
+    >>> ScaledRecipe(PEANUT_BUTTER, 3)
+    ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil') x 3
+    >>> ScaledRecipe(PEANUT_BUTTER, 3)[0]
+    'peanut butter'
+    """
+
+    __slots__ = ('recipe', 'servings')
+
+    def __init__(self, recipe: Recipe | tuple[str, str],
+                 servings: float = 1.0) -> None:
+        servings = float(servings)
+        if not (isfinite(servings) and servings > 0.0):
+            raise ValueError("servings must be a positive number")
+        self.recipe = compile_recipe(recipe)
+        self.servings = servings
+
+    def as_tuple(self) -> tuple[str, str]:
+        """
+        Returns the recipe in its (name, ingredients) tuple form.
+        """
+        return self.recipe.as_tuple()
+
+    def __getitem__(self, index):
+        return self.recipe.as_tuple()[index]
+
+    def __len__(self) -> int:
+        return 2
+
+    def __iter__(self):
+        return iter(self.recipe.as_tuple())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ScaledRecipe):
+            return (self.recipe, self.servings) == (other.recipe,
+                                                    other.servings)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.recipe, self.servings))
+
+    def __repr__(self) -> str:
+        return f"{self.recipe!r} x {self.servings:g}"
+
+
+@lru_cache(maxsize=4096)
+@measured('parse')
+def _compile_tuple(name: str, raw_ingredients: str) -> Recipe:
+    return Recipe(name, raw_ingredients)
+
+
+def compile_recipe(recipe: Recipe | tuple[str, str]) -> Recipe:
+    """
+    Returns the compiled form of a recipe. Compiled recipes are returned as
+    they are, scaled plan entries give their recipe and tuple recipes are
+    parsed once and cached.
+
+    Parameters: Recipe as a Recipe, a ScaledRecipe or a tuple containing two
+    strings.
+
+    Return: The compiled Recipe.
+
+    Example:
+    >>> compile_recipe(('peanut butter', '300 g peanuts')).ingredients
+    (Ingredient(300.0, 'g', 'peanuts'),)
+    """
+    if isinstance(recipe, Recipe):
+        return recipe
+    if isinstance(recipe, ScaledRecipe):
+        return recipe.recipe
+    return _compile_tuple(recipe[0], recipe[1])
+
+
+def servings_of(entry: Recipe | ScaledRecipe | tuple[str, str]) -> tuple[Recipe, float]:
+    """
+    Returns the compiled recipe of a meal plan entry and the number of
+    times it is made, one for plain recipes.
+
+    Parameters: Recipe as a Recipe, a ScaledRecipe or a tuple containing two
+    strings.
+
+    Return: Tuple of the compiled Recipe and the servings as a float.
+
+    Example:
+    >>> servings_of(ScaledRecipe(PEANUT_BUTTER, 2))
+    (('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil'), 2.0)
+    """
+    if isinstance(entry, ScaledRecipe):
+        return entry.recipe, entry.servings
+    return compile_recipe(entry), 1.0
@@ -0,0 +1,625 @@
+"""
+On-disk recipe store. Recipes are appended to a record file and found
+through a hash index file. Both files are memory-mapped, so opening a store
+reads only the index header and a lookup touches only the bytes it needs.
+
+The record file starts with an 8 byte magic and is followed by records of
+    payload length (u32), crc32 (u32), name length (u32), flags (u8), payload
+where the payload is the UTF-8 recipe name followed by the UTF-8
+ingredients. Removing a recipe appends a tombstone record carrying only the
+name. The index file is an open-addressing hash table of
+    hash of case-folded name (u64), record offset (u64)
+slots behind a header that records how much of the record file it covers.
+Records written after that point, for example by an append interrupted by a
+crash, are checked against their crc32 when the store is next opened:
+complete records are indexed and a torn tail is truncated.
+
+Operations that need every recipe, such as listing names by prefix or
+building the ingredient and name indexes, read the current records once and
+keep them up to date from then on. They are saved to a snapshot file next
+to the store, along with the ingredient index once it has been built, and
+later sessions load the snapshot instead of reading the record file and
+parsing every recipe for as long as the record file has the size and
+modification time the snapshot was taken at.
+"""
+
+import gc
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from cook_book import CookBook
+from ingredient_index import IngredientIndex
+from name_index import NameIndex
+from recipe import Recipe, compile_recipe
+
+DATA_MAGIC = b'SMRDAT01'
+INDEX_MAGIC = b'SMRIDX01'
+SNAPSHOT_MAGIC = b'SMRSNP03'
+
+_RECORD_HEADER = struct.Struct('<IIIB')
+_RECORD_CHECKED = struct.Struct('<IB')
+_INDEX_HEADER = struct.Struct('<8sQQQQ')
+_SLOT = struct.Struct('<QQ')
+
+# Record flag marking a removed recipe
+_TOMBSTONE = 1
+# Slot offsets with special meaning; real records never start this early
+_EMPTY = 0
+_DELETED = 1
+# The index is grown once this fraction of its slots is in use
+_MAX_LOAD = 0.6
+_MIN_CAPACITY = 64
+
+
+def _hash(key: str) -> int:
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _unmarshal(data: bytes):
+    # Loading builds many containers at once, which the cyclic garbage
+    # collector would otherwise scan over and over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loaded = marshal.loads(data)
+        # Moves every tracked object, the loaded ones included, straight to
+        # the oldest generation, so younger collections do not scan them
+        gc.freeze()
+        gc.unfreeze()
+        return loaded
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode_record(name: str, ingredients: str, flags: int = 0) -> bytes:
+    name_bytes = name.encode('utf-8')
+    payload = name_bytes + ingredients.encode('utf-8')
+    checked = _RECORD_CHECKED.pack(len(name_bytes), flags) + payload
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(checked),
+                               len(name_bytes), flags) + payload
+
+
+class RecipeStore:
+    """
+    A cook book kept on disk. It offers the same add, find, remove,
+    listing and prefix operations as CookBook, so it can be used wherever
+    the program expects a cook book.
+
+    Parameters: Path of the record file. The index is kept next to it with
+    an '.idx' suffix and the snapshot with a '.snap' suffix. The record file
+    and index are created if they do not exist.
+
+    Example:
+    >>> with RecipeStore('cookbook.smr') as store:
+    ...     store.add(PEANUT_BUTTER)
+    ...     store.find('Peanut Butter')
+    ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index_path = path + '.idx'
+        self.snapshot_path = path + '.snap'
+        if not os.path.exists(path):
+            with open(path, 'wb') as new_file:
+                new_file.write(DATA_MAGIC)
+        self._data_file = open(path, 'r+b')
+        if self._data_file.read(len(DATA_MAGIC)) != DATA_MAGIC:
+            self._data_file.close()
+            raise ValueError(f"{path} is not a recipe store")
+        self._data_size = os.path.getsize(path)
+        self._data_map = None
+        self._index_file = None
+        self._index_map = None
+        # Ingredient index, built on the first ingredient query
+        self._ingredients = None
+        # Marshalled ingredient index from the snapshot, restored on the
+        # first ingredient query unless the store changes before it
+        self._saved_ingredients = None
+        # Name index, built on the first request for similar names
+        self._names = None
+        # Maps case-folded name to the current (name, ingredients) record in
+        # store order, loaded when every recipe is first needed
+        self._recipes = None
+        # Size and modification time of the record file the snapshot file
+        # was taken at
+        self._snapshot_state = None
+        # Held while loading every recipe or building an index, so readers
+        # sharing the store load them once
+        self._load_lock = threading.RLock()
+        self._open_index()
+        self._recover()
+
+    # Opening and recovery
+
+    def _open_index(self) -> None:
+        if not self._index_is_valid():
+            slots, data_end = self._scan_slots()
+            self._write_index(slots, _MIN_CAPACITY, data_end)
+        self._index_file = open(self.index_path, 'r+b')
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0)
+        _, self._capacity, self._count, self._used, self._data_end = \
+            _INDEX_HEADER.unpack_from(self._index_map, 0)
+
+    def _index_is_valid(self) -> bool:
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                header = index_file.read(_INDEX_HEADER.size)
+                magic, capacity, _, _, data_end = _INDEX_HEADER.unpack(header)
+                index_file.seek(0, os.SEEK_END)
+                size = index_file.tell()
+        except (OSError, struct.error):
+            return False
+        data_size = os.path.getsize(self.path)
+        return (magic == INDEX_MAGIC and capacity > 0
+                and capacity & (capacity - 1) == 0
+                and size == _INDEX_HEADER.size + capacity * _SLOT.size
+                and len(DATA_MAGIC) <= data_end <= data_size)
+
+    def _recover(self) -> None:
+        # Indexes complete records past the covered end, drops a torn tail
+        size = self._data_size
+        if self._data_end == size:
+            return
+        offset = self._data_end
+        for record_offset, name, _, flags, next_offset in \
+                self._records(self._data_end):
+            self._apply(name, flags, record_offset)
+            offset = next_offset
+        if offset < size:
+            self._unmap_data()
+            self._data_file.truncate(offset)
+            self._data_file.flush()
+            os.fsync(self._data_file.fileno())
+            self._data_size = offset
+        self._commit(offset)
+
+    def _scan_slots(self):
+        # Rebuilds the live (hash, offset) pairs from the record file, along
+        # with the end of its last intact record
+        live = {}
+        data_end = len(DATA_MAGIC)
+        with open(self.path, 'rb') as data_file:
+            data = data_file.read()
+        for offset, name, _, flags, data_end in \
+                self._records(len(DATA_MAGIC), data):
+            key = CookBook.fold(name)
+            if flags & _TOMBSTONE:
+                live.pop(key, None)
+            else:
+                live[key] = offset
+        slots = [(_hash(key), offset) for key, offset in live.items()]
+        return slots, data_end
+
+    # Record access
+
+    def _map_data(self):
+        data = self._data_map
+        if data is None or len(data) < self._data_size:
+            with self._load_lock:
+                data = self._data_map
+                if data is None or len(data) < self._data_size:
+                    # The old map is left open for readers still decoding
+                    # from it and is unmapped when the last one drops it
+                    data = mmap.mmap(self._data_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+                    self._data_map = data
+        return data
+
+    def _unmap_data(self) -> None:
+        if self._data_map is not None:
+            self._data_map.close()
+            self._data_map = None
+
+    def _records(self, offset: int, data=None):
+        # Yields (offset, name, ingredients, flags, next offset) for every
+        # intact record from offset, stopping at the first damaged one
+        if data is None:
+            data = self._map_data()
+        while offset + _RECORD_HEADER.size <= len(data):
+            record = self._decode(data, offset)
+            if record is None:
+                return
+            yield record
+            offset = record[4]
+
+    @staticmethod
+    def _decode(data, offset: int):
+        length, crc, name_length, flags = \
+            _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        end = start + length
+        if end > len(data) or name_length > length:
+            return None
+        payload = data[start:end]
+        checked = _RECORD_CHECKED.pack(name_length, flags) + payload
+        if zlib.crc32(checked) != crc:
+            return None
+        try:
+            name = payload[:name_length].decode('utf-8')
+            ingredients = payload[name_length:].decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        return (offset, name, ingredients, flags, end)
+
+    def _read(self, offset: int):
+        data = self._map_data()
+        if offset + _RECORD_HEADER.size > len(data):
+            return None
+        return self._decode(data, offset)
+
+    # Hash index
+
+    def _slot(self, index: int) -> tuple[int, int]:
+        return _SLOT.unpack_from(self._index_map,
+                                 _INDEX_HEADER.size + index * _SLOT.size)
+
+    def _set_slot(self, index: int, key_hash: int, offset: int) -> None:
+        _SLOT.pack_into(self._index_map,
+                        _INDEX_HEADER.size + index * _SLOT.size,
+                        key_hash, offset)
+
+    def _probe(self, key: str) -> tuple[int | None, int | None]:
+        # Returns the slot holding key, or None and the first free slot
+        key_hash = _hash(key)
+        mask = self._capacity - 1
+        index = key_hash & mask
+        free = None
+        while True:
+            slot_hash, offset = self._slot(index)
+            if offset == _EMPTY:
+                return None, index if free is None else free
+            if offset == _DELETED:
+                if free is None:
+                    free = index
+            elif slot_hash == key_hash:
+                record = self._read(offset)
+                if record is not None and CookBook.fold(record[1]) == key:
+                    return index, None
+            index = (index + 1) & mask
+
+    def _apply(self, name: str, flags: int, offset: int) -> None:
+        key = CookBook.fold(name)
+        found, free = self._probe(key)
+        if flags & _TOMBSTONE:
+            if found is not None:
+                self._set_slot(found, 0, _DELETED)
+                self._count -= 1
+        elif found is not None:
+            self._set_slot(found, _hash(key), offset)
+        else:
+            if self._slot(free)[1] == _EMPTY:
+                self._used += 1
+            self._set_slot(free, _hash(key), offset)
+            self._count += 1
+            if self._used > self._capacity * _MAX_LOAD:
+                self._resize()
+
+    def _resize(self) -> None:
+        slots = [self._slot(index) for index in range(self._capacity)]
+        live = [(key_hash, offset) for key_hash, offset in slots
+                if offset not in (_EMPTY, _DELETED)]
+        self._close_index()
+        self._write_index(live, self._capacity * 2, self._data_end)
+        self._index_file = open(self.index_path, 'r+b')
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0)
+        _, self._capacity, self._count, self._used, _ = \
+            _INDEX_HEADER.unpack_from(self._index_map, 0)
+
+    def _write_index(self, slots, minimum_capacity: int,
+                     data_end: int) -> None:
+        # Writes a fresh index to a temporary file and swaps it in
+        capacity = _MIN_CAPACITY
+        while capacity < minimum_capacity or \
+                len(slots) > capacity * _MAX_LOAD / 2:
+            capacity *= 2
+        table = bytearray(capacity * _SLOT.size)
+        mask = capacity - 1
+        for key_hash, offset in slots:
+            index = key_hash & mask
+            while _SLOT.unpack_from(table, index * _SLOT.size)[1] != _EMPTY:
+                index = (index + 1) & mask
+            _SLOT.pack_into(table, index * _SLOT.size, key_hash, offset)
+        header = _INDEX_HEADER.pack(INDEX_MAGIC, capacity, len(slots),
+                                    len(slots), data_end)
+        temporary_path = self.index_path + '.tmp'
+        with open(temporary_path, 'wb') as index_file:
+            index_file.write(header)
+            index_file.write(table)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temporary_path, self.index_path)
+
+    def _commit(self, data_end: int) -> None:
+        # Slots reach disk before the header that says they cover data_end
+        self._index_map.flush()
+        self._data_end = data_end
+        _INDEX_HEADER.pack_into(self._index_map, 0, INDEX_MAGIC,
+                                self._capacity, self._count, self._used,
+                                data_end)
+        self._index_map.flush()
+
+    def _close_index(self) -> None:
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+
+    def _append(self, records: list[tuple[str, str, int]]) -> None:
+        # Records reach disk before the index refers to them
+        self._data_file.seek(0, os.SEEK_END)
+        offset = self._data_file.tell()
+        # A saved ingredient index would miss these records
+        self._saved_ingredients = None
+        offsets = []
+        chunks = []
+        for name, ingredients, flags in records:
+            chunk = _encode_record(name, ingredients, flags)
+            offsets.append(offset)
+            chunks.append(chunk)
+            offset += len(chunk)
+        self._data_file.write(b''.join(chunks))
+        self._data_file.flush()
+        os.fsync(self._data_file.fileno())
+        self._data_size = offset
+        for (name, _, flags), record_offset in zip(records, offsets):
+            self._apply(name, flags, record_offset)
+        self._commit(offset)
+        # The writer maps the grown file, so readers sharing the store
+        # rarely have to wait to map it themselves
+        if self._data_map is not None:
+            self._map_data()
+
+    # Snapshot of every recipe
+
+    def _all_recipes(self) -> dict:
+        if self._recipes is None:
+            with self._load_lock:
+                if self._recipes is None:
+                    recipes = self._read_snapshot()
+                    if recipes is None:
+                        recipes = self._scan_recipes()
+                        self._write_snapshot(recipes)
+                    self._recipes = recipes
+        return self._recipes
+
+    def _scan_recipes(self) -> dict:
+        # A record is current when the index still points at it
+        recipes = {}
+        for offset, name, ingredients, flags, _ in \
+                self._records(len(DATA_MAGIC)):
+            if flags & _TOMBSTONE:
+                continue
+            key = CookBook.fold(name)
+            found, _ = self._probe(key)
+            if found is not None and self._slot(found)[1] == offset:
+                recipes[key] = (name, ingredients)
+        return recipes
+
+    def _keep(self, name: str, ingredients: str) -> None:
+        # A replaced recipe moves to the end, as its new record does
+        key = CookBook.fold(name)
+        self._recipes.pop(key, None)
+        self._recipes[key] = (name, ingredients)
+
+    def _file_state(self) -> tuple[int, int]:
+        status = os.fstat(self._data_file.fileno())
+        return (status.st_size, status.st_mtime_ns)
+
+    def _read_snapshot(self) -> dict | None:
+        # Returns the recipes in the snapshot, or None if it is missing,
+        # damaged or older than the record file. An ingredient index saved
+        # with them is restored too
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return None
+                # One read, as marshal.load reads a file in small pieces
+                state, recipes, ingredients = \
+                    _unmarshal(snapshot_file.read())
+                if tuple(state) != self._file_state():
+                    return None
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        self._saved_ingredients = ingredients
+        self._snapshot_state = self._file_state()
+        return recipes
+
+    def _write_snapshot(self, recipes: dict) -> None:
+        state = self._file_state()
+        ingredients = self._saved_ingredients
+        if self._ingredients is not None:
+            ingredients = marshal.dumps(self._ingredients.as_tuple())
+        temporary_path = self.snapshot_path + '.tmp'
+        try:
+            with open(temporary_path, 'wb') as snapshot_file:
+                snapshot_file.write(SNAPSHOT_MAGIC)
+                snapshot_file.write(marshal.dumps((state, recipes,
+                                                   ingredients)))
+            os.replace(temporary_path, self.snapshot_path)
+        except OSError:
+            # The snapshot only saves time, so a store in a read-only
+            # directory works without one
+            return None
+        self._snapshot_state = state
+        return None
+
+    # Cook book operations
+
+    def add(self, recipe: Recipe | tuple[str, str]) -> Recipe:
+        """
+        Adds a recipe to the store. A recipe with the same name replaces the
+        existing one.
+
+        Parameters: Recipe as a Recipe or a tuple containing two strings.
+
+        Return: The compiled recipe that was stored.
+        """
+        recipe = compile_recipe(recipe)
+        self._append([(recipe.name, recipe.raw_ingredients, 0)])
+        if self._recipes is not None:
+            self._keep(recipe.name, recipe.raw_ingredients)
+        if self._ingredients is not None:
+            self._ingredients.add(recipe)
+        if self._names is not None:
+            self._names.add(recipe.name)
+        return recipe
+
+    def add_many(self, recipes) -> int:
+        """
+        Adds several recipes with a single write and sync, which is much
+        faster than adding them one at a time.
+
+        Parameters: Iterable of recipes, as Recipe objects or tuples
+        containing two strings.
+
+        Return: Number of recipes added.
+        """
+        records = [(recipe[0], recipe[1], 0) for recipe in recipes]
+        if records:
+            self._append(records)
+            if self._recipes is not None:
+                for name, ingredients, _ in records:
+                    self._keep(name, ingredients)
+            if self._ingredients is not None:
+                for name, ingredients, _ in records:
+                    self._ingredients.add((name, ingredients))
+            if self._names is not None:
+                for name, _, _ in records:
+                    self._names.add(name)
+        return len(records)
+
+    def find(self, name: str) -> Recipe | None:
+        """
+        Finds a recipe by name, ignoring case. Only the index slots probed
+        and the matching record are read.
+
+        Parameters: Recipe name as a string.
+
+        Return: The recipe, or None if it is not in the store.
+        """
+        found, _ = self._probe(CookBook.fold(name))
+        if found is None:
+            return None
+        record = self._read(self._slot(found)[1])
+        return compile_recipe((record[1], record[2]))
+
+    def remove(self, name: str) -> Recipe | None:
+        """
+        Removes a recipe by name, ignoring case.
+
+        Parameters: Recipe name as a string.
+
+        Return: The removed recipe, or None if it was not in the store.
+        """
+        recipe = self.find(name)
+        if recipe is None:
+            return None
+        self._append([(recipe.name, '', _TOMBSTONE)])
+        if self._recipes is not None:
+            del self._recipes[CookBook.fold(recipe.name)]
+        if self._ingredients is not None:
+            self._ingredients.remove(recipe.name)
+        if self._names is not None:
+            self._names.remove(recipe.name)
+        return recipe
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        """
+        Lists the names of recipes starting with a prefix, ignoring case, in
+        the order they were stored. The first call loads every recipe, from
+        the snapshot when it is fresh.
+
+        Parameters: Prefix as a string.
+
+        Return: List of recipe names.
+        """
+        prefix = CookBook.fold(prefix)
+        return [record[0] for key, record in self._all_recipes().items()
+                if key.startswith(prefix)]
+
+    def recipes_using(self, ingredient: str, prefix: bool = False,
+                      limit: int | None = None) -> list[tuple[str, float, str, str]]:
+        """
+        Lists the recipes using an ingredient, matching ingredient names the
+        same way as CookBook.recipes_using. The first query loads every
+        recipe to build the ingredient index, which is then kept up to date
+        as recipes are added and removed.
+
+        Parameters: Ingredient name or part of one as a string, whether to
+        match word prefixes and an optional limit on the number of results.
+
+        Return: List of (recipe name, amount, measure, ingredient name)
+        tuples, in the order recipes were first stored.
+        """
+        if self._ingredients is None:
+            with self._load_lock:
+                # The snapshot may hold the index
+                recipes = self._all_recipes()
+                if self._ingredients is None and \
+                        self._saved_ingredients is not None:
+                    self._ingredients = IngredientIndex.from_tuple(
+                        _unmarshal(self._saved_ingredients), recipes.values())
+                    self._saved_ingredients = None
+                elif self._ingredients is None:
+                    self._ingredients = IngredientIndex(recipes.values())
+                    # Saves the index with the snapshot on close
+                    self._snapshot_state = None
+        return self._ingredients.recipes_using(ingredient, prefix, limit)
+
+    def similar_names(self, name: str, limit: int = 5) -> list[str]:
+        """
+        Lists the names of recipes most similar to a possibly mistyped name.
+        The first call loads every name to build the name index, which is
+        then kept up to date as recipes are added and removed.
+
+        Parameters: Recipe name as a string and the largest number of names
+        to return.
+
+        Return: List of recipe names, most similar first.
+        """
+        if self._names is None:
+            with self._load_lock:
+                if self._names is None:
+                    self._names = NameIndex(
+                        record[0] for record in self._all_recipes().values())
+        return [found for found, _ in self._names.similar(name, limit)]
+
+    def __iter__(self):
+        # A copy, so recipes can be added and removed while iterating
+        for record in list(self._all_recipes().values()):
+            yield compile_recipe(record)
+
+    def __contains__(self, name: str) -> bool:
+        return self._probe(CookBook.fold(name))[0] is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        """
+        Flushes and closes the store's files, first bringing the snapshot up
+        to date if every recipe was loaded and the store has changed since.
+        """
+        if self._recipes is not None and not self._data_file.closed and \
+                self._snapshot_state != self._file_state():
+            self._write_snapshot(self._recipes)
+        self._unmap_data()
+        self._close_index()
+        if not self._data_file.closed:
+            self._data_file.close()
+
+    def __enter__(self) -> 'RecipeStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,304 @@
+"""
+Asynchronous HTTP API for ShopMania, built on asyncio streams.
+
+    GET    /recipes[?prefix=...]   names of recipes in the cook book
+    GET    /recipes/{name}         one recipe
+    POST   /recipes                add or replace a recipe, JSON body
+                                   {"name": ..., "ingredients": ...}
+    DELETE /recipes/{name}         remove a recipe
+    POST   /shopping-list          JSON body {"recipes": [names, ...]}
+    GET    /shopping-list/cache    hit and miss counters of the list cache
+
+The cook book is only touched from the event loop, so requests share one
+index without locking. Recipes are looked up there and large plans are then
+aggregated in an executor so other requests keep being served.
+
+Run from the repository root:
+    python server.py [--host HOST] [--port PORT] [cook book path]
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+from functools import partial
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from importer import validate_recipe
+from plan_cache import ShoppingListCache
+from recipe import compile_recipe
+
+shop_mania = importlib.import_module('shop-mania')
+
+# Plans with at least this many recipes are aggregated in the executor
+EXECUTOR_THRESHOLD = 500
+# Largest request body accepted, in bytes
+MAX_BODY = 16 * 1024 * 1024
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    """
+    Raised by request handlers to send an error response.
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ShopManiaServer:
+    """
+    Serves a cook book over HTTP.
+
+    Parameters: The cook book, any of the cook books accepted by
+    find_recipe, and optionally the executor for large aggregations (the
+    event loop's default executor if None).
+
+    Example:
+    >>> server = ShopManiaServer(CookBook(COOK_BOOK))
+    >>> port = await server.start('127.0.0.1', 0)
+    >>> await request('127.0.0.1', port, 'POST', '/shopping-list',
+    ...               {'recipes': ['peanut butter']})
+    (200, {'shopping_list': [{'amount': 300.0, 'measure': 'g', ...}]})
+    """
+
+    def __init__(self, cook_book, executor=None) -> None:
+        self.cook_book = cook_book
+        self.executor = executor
+        # Shopping lists of plans requested before
+        self.cache = ShoppingListCache()
+        self._server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> int:
+        """
+        Starts listening for connections.
+
+        Parameters: Host and port to listen on. Port 0 picks a free port.
+
+        Return: The port the server is listening on.
+        """
+        self._server = await asyncio.start_server(self._serve_connection,
+                                                  host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stops accepting connections and waits for the server to close.
+        """
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        # Serves requests on one connection until the client closes it
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = await self._serve_request(request_line, reader,
+                                                       writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_request(self, request_line: bytes,
+                             reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> bool:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            length = int(headers.get('content-length', 0))
+            if length > MAX_BODY:
+                keep_alive = False
+                raise HTTPError(413, "request body too large")
+            body = await reader.readexactly(length) if length else b''
+            status, payload = await self.handle(method.upper(), target, body)
+        except HTTPError as error:
+            status, payload = error.status, {'error': error.message}
+        except ValueError:
+            status, payload = 400, {'error': "malformed request"}
+        except Exception:
+            # Keeps the connection usable after an unexpected failure
+            status, payload = 500, {'error': "internal error"}
+        content = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            f"\r\n".encode('latin-1') + content)
+        return keep_alive
+
+    async def handle(self, method: str, target: str, body: bytes):
+        """
+        Handles a single request.
+
+        Parameters: HTTP method, request target and body.
+
+        Return: Tuple of status code and JSON payload.
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        if parts[0] == 'recipes' and len(parts) == 1:
+            if method == 'GET':
+                prefix = parse_qs(url.query).get('prefix', [''])[0]
+                return 200, {'recipes':
+                             self.cook_book.names_with_prefix(prefix)}
+            if method == 'POST':
+                return self._add_recipe(_json_body(body))
+        elif parts[0] == 'recipes' and len(parts) == 2:
+            if method == 'GET':
+                recipe = self._find(parts[1])
+                return 200, _recipe_json(recipe)
+            if method == 'DELETE':
+                recipe = self._find(parts[1])
+                shop_mania.remove_recipe(recipe.name, self.cook_book)
+                return 200, _recipe_json(recipe)
+        elif parts == ['shopping-list']:
+            if method == 'POST':
+                return await self._shopping_list(_json_body(body))
+        elif parts == ['shopping-list', 'cache']:
+            if method == 'GET':
+                return 200, self.cache.stats()
+        else:
+            raise HTTPError(404, "no such resource")
+        raise HTTPError(405, f"{method} is not supported here")
+
+    def _find(self, name: str):
+        recipe = shop_mania.find_recipe(name, self.cook_book)
+        if recipe is None:
+            raise HTTPError(404, f"recipe {name!r} does not exist")
+        return recipe
+
+    def _add_recipe(self, data):
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected an object with a name and "
+                            "ingredients")
+        # The same checks as imported recipes, so names are non-empty
+        # strings and ingredients are strings of amount, measure and name
+        try:
+            recipe = compile_recipe(validate_recipe(data.get('name'),
+                                                    data.get('ingredients')))
+        except ValueError as error:
+            raise HTTPError(400, str(error))
+        shop_mania.add_recipe(recipe, self.cook_book)
+        return 201, _recipe_json(recipe)
+
+    async def _shopping_list(self, data):
+        try:
+            names = data['recipes']
+        except (KeyError, TypeError):
+            names = None
+        # A string would otherwise be taken one character at a time
+        if not isinstance(names, list) or \
+                not all(isinstance(name, str) for name in names):
+            raise HTTPError(400, "expected a list of recipe names")
+        # Recipes are resolved on the event loop, the only place the cook
+        # book is touched
+        recipes = []
+        missing = []
+        for name in names:
+            recipe = shop_mania.find_recipe(name, self.cook_book)
+            if recipe is None:
+                missing.append(name)
+            else:
+                recipes.append(recipe)
+        if missing:
+            raise HTTPError(404, f"recipes do not exist: {missing}")
+        if len(recipes) >= EXECUTOR_THRESHOLD:
+            loop = asyncio.get_running_loop()
+            shopping_list = await loop.run_in_executor(
+                self.executor, partial(shop_mania.generate_shopping_list,
+                                       recipes, cache=self.cache))
+        else:
+            shopping_list = shop_mania.generate_shopping_list(
+                recipes, cache=self.cache)
+        return 200, {'shopping_list': [
+            {'amount': amount, 'measure': measure, 'ingredient': name}
+            for amount, measure, name in shopping_list]}
+
+
+def _json_body(body: bytes):
+    try:
+        return json.loads(body or b'null')
+    except ValueError:
+        raise HTTPError(400, "body is not valid JSON")
+
+
+def _recipe_json(recipe) -> dict:
+    return {'name': recipe.name, 'ingredients': recipe.raw_ingredients}
+
+
+async def request(host: str, port: int, method: str, path: str, data=None):
+    """
+    Minimal HTTP client for talking to the server over loopback.
+
+    Parameters: Host and port of the server, HTTP method, path and optional
+    JSON-serialisable body.
+
+    Return: Tuple of status code and decoded JSON payload.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    body = b'' if data is None else json.dumps(data).encode('utf-8')
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                 f"Content-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    content = await reader.readexactly(int(headers.get('content-length', 0)))
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), json.loads(content)
+
+
+async def _serve(host: str, port: int, cook_book_path: str | None) -> None:
+    session = shop_mania.open_session(cook_book_path)
+    server = ShopManiaServer(session.cook_book)
+    port = await server.start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves ShopMania over HTTP.")
+    parser.add_argument('cook_book', nargs='?',
+                        help="recipe store or SQLite database to serve")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.cook_book))
+    except KeyboardInterrupt:
+        pass
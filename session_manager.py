@@ -0,0 +1,281 @@
+"""
+Many users' sessions in one process. The cook book is shared by every
+session behind a reader-writer lock, so any number of sessions look recipes
+up at once while mkrec and recipe removal wait for exclusive access. Each
+user has their own lightweight meal plan, pantry and shopping list.
+
+Sessions can be driven from a thread pool or from asyncio tasks. Each
+user's commands run one at a time under that user's lock, and no lock is
+held across an await.
+"""
+
+import asyncio
+import importlib
+import io
+import threading
+from contextlib import contextmanager
+
+from meal_plan import MealPlan
+
+shop_mania = importlib.import_module('shop-mania')
+
+
+class ReadWriteLock:
+    """
+    A lock held by any number of readers or by one writer. A waiting writer
+    stops new readers from joining, so a steady stream of lookups cannot
+    keep mkrec waiting forever. Neither side may be taken again by a thread
+    already holding the lock.
+
+    Example:
+    >>> lock = ReadWriteLock()
+    >>> with lock.read():
+    ...     cook_book.find('seitan')
+    >>> with lock.write():
+    ...     cook_book.add(PEANUT_BUTTER)
+    """
+
+    __slots__ = ('_condition', '_readers', '_writing', '_writers_waiting')
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the lock shared for the duration of a with block.
+        """
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the lock exclusively for the duration of a with block.
+        """
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writing or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class SharedCookBook:
+    """
+    A cook book shared between threads. Lookups hold its lock shared and
+    changes hold it exclusively, so readers never see a half-made change.
+    It offers the operations of the cook book it wraps, so sessions use it
+    like any other cook book.
+
+    Parameters: The cook book to share, such as a CookBook, RecipeStore or
+    SQLiteCookBook.
+
+    Example:
+    >>> shared = SharedCookBook(CookBook(COOK_BOOK))
+    >>> shared.find('Seitan')[0]
+    'seitan'
+    """
+
+    __slots__ = ('cook_book', 'lock')
+
+    def __init__(self, cook_book) -> None:
+        self.cook_book = cook_book
+        self.lock = ReadWriteLock()
+
+    def add(self, recipe):
+        with self.lock.write():
+            return self.cook_book.add(recipe)
+
+    def add_many(self, recipes) -> int:
+        # Recipes are read before taking the lock, as they may be a slow
+        # generator such as an import file
+        recipes = list(recipes)
+        with self.lock.write():
+            return self.cook_book.add_many(recipes)
+
+    def remove(self, name: str):
+        with self.lock.write():
+            return self.cook_book.remove(name)
+
+    def find(self, name: str):
+        with self.lock.read():
+            return self.cook_book.find(name)
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        with self.lock.read():
+            return self.cook_book.names_with_prefix(prefix)
+
+    def recipes_using(self, ingredient: str, prefix: bool = False,
+                      limit: int | None = None) -> list[tuple[str, float, str, str]]:
+        with self.lock.read():
+            return self.cook_book.recipes_using(ingredient, prefix, limit)
+
+    def similar_names(self, name: str, limit: int = 5) -> list[str]:
+        with self.lock.read():
+            return self.cook_book.similar_names(name, limit)
+
+    def __iter__(self):
+        # Iterates over a copy taken under the lock
+        with self.lock.read():
+            return iter(list(self.cook_book))
+
+    def __contains__(self, name: str) -> bool:
+        with self.lock.read():
+            return name in self.cook_book
+
+    def __len__(self) -> int:
+        with self.lock.read():
+            return len(self.cook_book)
+
+
+class SessionManager:
+    """
+    Keeps one session per user over a single shared cook book. Sessions are
+    opened on a user's first command and closed when they quit.
+
+    Parameters: The cook book to share, and optionally a function returning
+    a new meal plan for a user name (an in-memory MealPlan by default, or
+    for example SQLiteBackend.plan to keep plans in a database). Other
+    options are passed on to each Session, such as output_format.
+
+    Example:
+    >>> manager = SessionManager(CookBook(COOK_BOOK))
+    >>> manager.run('sam', 'add peanut butter')
+    ''
+    >>> print(manager.run('sam', 'g'), end='')
+    | 300.0 |   g  | peanuts  |
+    |   0.5 |  tsp | salt     |
+    |   2.0 |  tsp | oil      |
+    >>> manager.run('alex', 'g')
+    ''
+    """
+
+    def __init__(self, cook_book, plan_factory=None, **options) -> None:
+        if not isinstance(cook_book, SharedCookBook):
+            cook_book = SharedCookBook(cook_book)
+        self.cook_book = cook_book
+        self.plan_factory = plan_factory
+        self.options = options
+        # Maps a user name to their session and the lock their commands
+        # run under
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, user: str):
+        """
+        Returns a user's session, opening it if they have none yet.
+
+        Parameters: User name as a string.
+
+        Return: The user's Session.
+        """
+        return self._entry(user)[0]
+
+    def _entry(self, user: str) -> tuple[object, threading.Lock]:
+        entry = self._sessions.get(user)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._sessions.get(user)
+            if entry is None:
+                meal_plan = MealPlan() if self.plan_factory is None \
+                    else self.plan_factory(user)
+                session = shop_mania.Session(self.cook_book, meal_plan,
+                                             out=io.StringIO(), **self.options)
+                entry = self._sessions[user] = (session, threading.Lock())
+        return entry
+
+    def run(self, user: str, command: str, lines=()) -> str:
+        """
+        Runs one command in a user's session. Safe to call from many
+        threads at once; commands of the same user run one at a time.
+
+        Parameters: User name, the command as typed and, for mkrec, the
+        lines giving the recipe name and ingredients.
+
+        Return: The command's output as a string. A user who quits has
+        their session closed.
+        """
+        session, lock = self._entry(user)
+        lines = iter(lines)
+        out = io.StringIO()
+        with lock:
+            session.out = out
+            session.read = lambda prompt: next(lines, '')
+            running = session.run(command)
+        if not running:
+            self.close(user)
+        return out.getvalue()
+
+    async def run_async(self, user: str, command: str, lines=(),
+                        executor=None) -> str:
+        """
+        Runs one command in a user's session from asyncio, in an executor
+        so the event loop keeps serving other users meanwhile.
+
+        Parameters: As for run, and optionally the executor to use (the
+        event loop's default executor if None).
+
+        Return: The command's output as a string.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self.run, user, command,
+                                          tuple(lines))
+
+    def close(self, user: str) -> None:
+        """
+        Closes a user's session, if they have one. The shared cook book
+        stays open.
+
+        Parameters: User name as a string.
+
+        Return: Returns None.
+        """
+        with self._lock:
+            entry = self._sessions.pop(user, None)
+        if entry is not None:
+            session, lock = entry
+            with lock:
+                session.close()
+        return None
+
+    def close_all(self) -> None:
+        """
+        Closes every user's session.
+        """
+        for user in self.users():
+            self.close(user)
+
+    def users(self) -> list[str]:
+        """
+        Returns the names of the users with an open session.
+        """
+        with self._lock:
+            return list(self._sessions)
+
+    def __contains__(self, user: str) -> bool:
+        return user in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
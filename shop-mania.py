@@ -5,7 +5,52 @@ Program that generates a shopping list.
 __author__ = "Shravya Chandrasekar"
 __date__ = "24/03/2023"
 
+import io
+import json
+import sys
+from math import isfinite
+
 from constants import *
+from cook_book import CookBook
+from ingredient_parser import parse
+from meal_plan import MealPlan
+from pantry import Pantry
+from metrics import Metrics, measured, profile, span
+from recipe import ScaledRecipe, compile_recipe, servings_of
+from shopping_list import ShoppingList
+from streaming import DEFAULT_EVERY, stream_shopping_list
+from table_renderer import FORMATS, write_table
+from units import convert
+
+# File extensions opened with the SQLite backend rather than a recipe store
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# Digits deleted from ASCII commands in one pass, without a character loop
+_DIGITS = b'0123456789'
+
+
+def _is_loaded_instance(value, module: str, class_name: str) -> bool:
+    # Storage backends are imported when a cook book file is opened, so
+    # nothing can be one of their classes before their module is loaded
+    loaded = sys.modules.get(module)
+    return loaded is not None and isinstance(value, getattr(loaded,
+                                                            class_name))
+
+
+def _invalidate_plans(recipe_name: str) -> None:
+    # Shopping list caches only exist once plan_cache has been imported
+    loaded = sys.modules.get('plan_cache')
+    if loaded is not None:
+        loaded.invalidate(recipe_name)
+
+
+def _is_indexed(recipes) -> bool:
+    # Cook books find, add and remove recipes through an index
+    return (isinstance(recipes, CookBook)
+            or _is_loaded_instance(recipes, 'recipe_store', 'RecipeStore')
+            or _is_loaded_instance(recipes, 'sqlite_backend',
+                                   'SQLiteCookBook')
+            or _is_loaded_instance(recipes, 'session_manager',
+                                   'SharedCookBook'))
 
 
 def num_hours() -> float:
@@ -54,24 +99,20 @@ def parse_ingredient(raw_ingredient_detail: str) -> tuple[float, str, str]:
     Example:
     >>> parse_ingredient('0.5 tsp coffee granules')
     (0.5, 'tsp', 'coffee granules')
+    >>> parse_ingredient('1 1/2 cup flour')
+    (1.5, 'cup', 'flour')
     """
-    # split the raw ingredient into tokens
-    result = raw_ingredient_detail.split()
-    
-    # set default values for the amount, measure, and ingredient
-    amount = float(result[0])
-    measure = result[1]
-    ingredient = ' '.join(result[2:])
-    return amount, measure, ingredient
+    return parse(raw_ingredient_detail)
 
 
-def create_recipe() -> tuple[str, str]:
+def create_recipe(read=input) -> tuple[str, str]:
     """
     Creates a recipe by asking user to input recipe name and as many ingredients
     required. Ingredients are listed with order of amount, measure and name.
     Breaks when ingredient input is empty.
 
-    Parameters: Nothing is to be inputted for function to work. 
+    Parameters: Nothing is to be inputted for function to work. Optionally
+    the function used to read each line, input by default.
 
     Return: A recipe in tuple format generated from inputs. 
 
@@ -84,12 +125,12 @@ def create_recipe() -> tuple[str, str]:
     Please enter an ingredient:
     ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')
     """
-    recipe_name = input("Please enter the recipe name: ")
+    recipe_name = read("Please enter the recipe name: ")
     recipe_ingredients = []
-    ingredient = input("Please enter an ingredient: ")
+    ingredient = read("Please enter an ingredient: ")
     while ingredient!= "":
         recipe_ingredients.append(ingredient)
-        ingredient = input("Please enter an ingredient: ")
+        ingredient = read("Please enter an ingredient: ")
     recipe = (recipe_name, ",".join(recipe_ingredients))
     return recipe
 
@@ -108,23 +149,18 @@ def recipe_ingredients(recipe: tuple[str, str]) -> tuple[tuple[float, str, str]]
     0.5 tsp salt,2 tsp oil'))
     ((300.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt'), (2.0, 'tsp', 'oil'))
     """
-    ingredients = recipe[1].split(',')
-    ingredient_detail = []
-    for ingredient in ingredients:
-        result = ingredient.split()
-        amount = float(result[0])
-        measure = result[1]
-        name = ' '.join(result[2:])
-        ingredient_detail.append((amount, measure, name))
-    return tuple(ingredient_detail)
+    # Ingredients are parsed once when the recipe is compiled
+    return tuple(ingredient.as_tuple()
+                 for ingredient in compile_recipe(recipe).ingredients)
 
 
-def add_recipe(new_recipe: tuple[str, str],recipes: list[tuple[str, str]]) -> None:
+def add_recipe(new_recipe: tuple[str, str],recipes: list[tuple[str, str]], servings: float = 1.0) -> None:
     """
     An inputted recipe is added into the list of recipes.
 
     Parameters: Recipe as a tuple containing two strings and recipes as the
-    list of recipes.
+    list of recipes. Optionally the number of servings to add to a meal
+    plan, which keeps one entry scaled by the servings.
 
     Return: None
 
@@ -134,7 +170,18 @@ def add_recipe(new_recipe: tuple[str, str],recipes: list[tuple[str, str]]) -> No
     >>> add_recipe(recipe, recipes)
     >>> recipes
     [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')]
+    >>> add_recipe(recipe, recipes, 3)
+    >>> recipes
+    [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil'),
+    ('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil') x 3]
     """
+    if _is_indexed(recipes):
+        recipes.add(new_recipe)
+        # Cached shopping lists may hold an older version of the recipe
+        _invalidate_plans(new_recipe[0])
+        return None
+    if servings != 1:
+        new_recipe = ScaledRecipe(new_recipe, servings)
     recipes.append(new_recipe)
     
     return None
@@ -158,12 +205,70 @@ def find_recipe(recipe_name:str, recipes: list[tuple[str, str]]) -> tuple[str, s
     >>> print(find_recipe('cinnamon rolls', recipes))
     None
     """
+    # Cook books look the name up in their index
+    if _is_indexed(recipes):
+        return recipes.find(recipe_name)
     for recipe in recipes:
         if recipe_name == recipe[0]:
             return recipe
     return None
 
 
+def suggest_recipes(recipe_name: str, recipes: list[tuple[str, str]],
+                    limit: int = 5) -> list[str]:
+    """
+    Suggests the recipes whose names are closest to a name that was not
+    found, tolerating typos.
+
+    Parameters: String of recipe name, list of recipes and the largest number
+    of names to suggest.
+
+    Return: List of recipe names, most similar first.
+
+    Example:
+    >>> recipes = [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')]
+    >>> suggest_recipes('peanut buter', recipes)
+    ['peanut butter']
+    """
+    # Cook books keep a name index; a plain list is indexed for this call
+    if _is_indexed(recipes):
+        return recipes.similar_names(recipe_name, limit)
+    from name_index import NameIndex
+    index = NameIndex(recipe[0] for recipe in recipes)
+    return [name for name, _ in index.similar(recipe_name, limit)]
+
+
+def find_recipes_using(ingredient: str, recipes: list[tuple[str, str]],
+                       prefix: bool = False) -> list[tuple[str, float, str, str]]:
+    """
+    Finds the recipes that use an ingredient. Ingredient names match when
+    they contain the ingredient, or with prefix, when one of their words
+    starts with it, ignoring case.
+
+    Parameters: Ingredient name or part of one as a string, list of recipes
+    and whether to match word prefixes.
+
+    Return: List of tuples containing strings of recipe name, float of
+    amount, and strings of measure and ingredient name.
+
+    Example:
+    >>> recipes = [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')]
+    >>> find_recipes_using('pea', recipes)
+    [('peanut butter', 300.0, 'g', 'peanuts')]
+    """
+    # Cook books answer from their ingredient index
+    if _is_indexed(recipes):
+        return recipes.recipes_using(ingredient, prefix)
+    from ingredient_index import matches
+    found = []
+    for recipe in recipes:
+        recipe = compile_recipe(recipe)
+        for ing in recipe.ingredients:
+            if matches(ing.name, ingredient, prefix):
+                found.append((recipe.name, ing.amount, ing.measure, ing.name))
+    return found
+
+
 def remove_recipe(name: str, recipes: list[tuple[str, str]]) -> None:
     """
     When inputted a recipe name, it removes it from recipes if previously
@@ -191,8 +296,19 @@ def remove_recipe(name: str, recipes: list[tuple[str, str]]) -> None:
     >>> recipes
     [('peanut butter', '300 g peanuts,0.5 tsp salt,2 tsp oil')]
     """
+    # Cook books remove the name through their index
+    if _is_indexed(recipes):
+        recipes.remove(name)
+        _invalidate_plans(name)
+        return
     for recipe in recipes:
         if name == recipe[0]:
+            # Meal plans take one serving off a recipe made several times
+            if isinstance(recipe, ScaledRecipe) and \
+                    (isinstance(recipes, MealPlan) or
+                     _is_loaded_instance(recipes, 'sqlite_backend',
+                                         'SQLitePlan')):
+                recipe = recipe.recipe
             recipes.remove(recipe)
             return
 
@@ -214,23 +330,19 @@ def get_ingredient_amount(ingredient: str, recipe: tuple[str, str]) -> tuple[flo
     (300.0, 'g')
     >>> get_ingredient_amount('soy beans', recipe)
     """
-    ingredients = recipe[1].split(',')
-    # Loops through ingredients
-    for ing in ingredients:
-        amount_unit = ing.split()
-        amount = amount_unit[0]
-        unit = amount_unit[1]
-        name = ' '.join(amount_unit[0:11])
-        if ingredient.lower() in name.lower():
-            return (float(amount), unit)
+    ingredient = CookBook.fold(ingredient)
+    # Loops through the pre-parsed ingredients
+    for ing in compile_recipe(recipe).ingredients:
+        if ingredient in ing.folded_name:
+            return (ing.amount, ing.measure)
     return None
 
 
 def add_to_shopping_list(ingredient_details: tuple[float, str, str], shopping_list: list[tuple[float, str, str] | None]) -> None:
     """
-    Adds an ingredient to the shopping list. If same ingredient is added,
-    the amount is combined. If ingredient doesn't previously exist in
-    shopping list, it is just added as it is.
+    Adds an ingredient to the shopping list. If same ingredient is added
+    in a compatible measure, the amount is converted to the measure already
+    in the list and combined. Otherwise it is just added as it is.
 
     Parameters: Ingredient details as a tuple of amount, meausure and
     ingredient name. Shopping list contains either an empty tuple or
@@ -254,11 +366,19 @@ def add_to_shopping_list(ingredient_details: tuple[float, str, str], shopping_li
     [(1500.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt'), (2.0, 'tsp', 'oil'),
     (9000.0, 'g', 'tofu')]
     """
+    # Aggregators merge by name without scanning the list
+    if isinstance(shopping_list, ShoppingList):
+        shopping_list.add(ingredient_details)
+        return None
     # Goes through each item in the shopping list
     for i, item in enumerate(shopping_list):
         if item and item[2] == ingredient_details[2]:
-            shopping_list[i] = (item[0] + ingredient_details[0],
-            item[1], item[2])
+            # Converts the amount into the measure already in the list
+            amount = convert(ingredient_details[0], ingredient_details[1],
+            item[1])
+            if amount is None:
+                continue
+            shopping_list[i] = (item[0] + amount, item[1], item[2])
             break
     else:
         shopping_list.append(ingredient_details)
@@ -300,7 +420,10 @@ def remove_from_shopping_list(ingredient_name: str, amount: float, shopping_list
     (9000.0, 'g', 'tofu'), (50.0, 'g', 'tomato sauce'), (120.0, 'g',
     'rice')]
     """
-    
+    # Aggregators look the ingredient up by name
+    if isinstance(shopping_list, ShoppingList):
+        shopping_list.remove(ingredient_name, amount)
+        return None
     for i in range(len(shopping_list)):
         # Checks if ingredient name given is in shopping list
         if shopping_list[i][2] == ingredient_name:
@@ -316,11 +439,23 @@ def remove_from_shopping_list(ingredient_name: str, amount: float, shopping_list
     return None
 
 
-def generate_shopping_list(recipes: list[tuple[str, str]]) -> list[tuple[float, str, str]]:
+@measured('aggregate')
+def generate_shopping_list(recipes: list[tuple[str, str]], batch: bool = False, cache: 'ShoppingListCache | None' = None, partial_results=None, every: int = DEFAULT_EVERY, workers: int | None = None, shard_size: int | None = None) -> list[tuple[float, str, str]]:
     """
-    Generates a list of ingredients of given recipes.
-
-    Parameters: Recipes are a list of tuple containing two strings.
+    Generates a list of ingredients of given recipes. Amounts of the same
+    ingredient in compatible measures, such as tbsp and tsp, are combined
+    and shown in the first measure used.
+
+    Parameters: Recipes are a list of tuple containing two strings, or of
+    ScaledRecipe entries for recipes made several times. Batch selects
+    vectorised aggregation, which is faster for large meal plans and adds
+    up each distinct recipe once.
+    An optional cache remembers the lists of meal plans seen before. An
+    optional partial_results callback streams the recipes instead, so any
+    iterable such as a file or a database cursor can be aggregated without
+    holding it in memory; it is given the number of recipes read and the
+    list so far every so many recipes. Workers spreads aggregation across
+    that many processes, each given shards of shard_size recipes.
 
     Return: Returns the shopping list of ingredients formatted as a list
     of tuples containing float of amount, and strings of measure and ingredient name.
@@ -341,39 +476,44 @@ def generate_shopping_list(recipes: list[tuple[str, str]]) -> list[tuple[float,
     'garlic powder'), (0.25, 'tsp', 'onion powder'), (0.125, 'tsp',
     'pepper'), (0.25, 'tsp', 'turmeric'), (1.0, 'cup', 'soy milk')]
     """
-    # Establish an empty list to store ingredients 
-    shopping_list = []
+    if partial_results is not None:
+        return stream_shopping_list(recipes, partial_results, every)
+    if cache is not None:
+        return cache.generate(recipes)
+    if workers is not None:
+        from parallel import aggregate_parallel
+        return aggregate_parallel(recipes, workers, shard_size)
+    if batch:
+        # Imported here, as it loads NumPy when installed
+        from aggregate import aggregate_batch
+        return aggregate_batch(recipes)
+    # Database plans aggregate with a GROUP BY query
+    if _is_loaded_instance(recipes, 'sqlite_backend', 'SQLitePlan'):
+        return recipes.aggregate()
+    # Aggregate ingredients by name, keeping first-seen order
+    shopping_list = ShoppingList()
     for recipe in recipes:
-        ingredients = recipe[1].split(',')
-        for ingredient in ingredients:
-            # Split ingredients
-            result = ingredient.split()
-            # Retrieve amount and measure from ingredient 
-            amount = float(result[0])
-            measure = result[1]
-            ingredient_name = ' '.join(result[2:])
-            # False indicates whether ingredient has been found in list
-            found = False
-            # Goes through each item in the shopping list
-            for i, item_data in enumerate(shopping_list):
-                if ingredient_name == item_data[2]:
-                    # Update shopping list
-                    shopping_list[i] = (item_data[0] +
-                    amount, item_data[1], item_data[2])
-                    found = True
-                    break
-            if not found:
-                shopping_list.append((amount, measure, ingredient_name))
-    return shopping_list
-
-
-def display_ingredients(shopping_list: list[tuple[float, str, str]]) -> None:
+        # Ingredients are parsed once when the recipe is compiled, and
+        # scaled entries contribute once, multiplied by their servings
+        recipe, servings = servings_of(recipe)
+        for ingredient in recipe.ingredients:
+            shopping_list.merge_base(ingredient.base_amount * servings,
+            ingredient.dimension, ingredient.measure, ingredient.name)
+    return shopping_list.to_list()
+
+
+@measured('render')
+def display_ingredients(shopping_list: list[tuple[float, str, str]], file=None, output_format: str = 'table', widths: tuple[int, int] | None = None, page_size: int | None = None, pause=None) -> None:
     """
     Prints the inputted and updated shopping list according to user.
 
     Parameters: The shopping list of ingredients formatted as a
     list of tuples containing float of amount, and strings
-    of measure and ingredient name.
+    of measure and ingredient name. Optionally the file to print to,
+    standard output by default, the output format ('table', 'tsv', 'json'
+    or 'markdown'), the widths of the measure and name columns if already
+    known, the number of rows per page and a function asked between pages
+    whether to go on.
 
     Return: Returns None.
 
@@ -398,22 +538,15 @@ def display_ingredients(shopping_list: list[tuple[float, str, str]]) -> None:
     |â£â£â£1.0â£|â£â£tbspâ£â£â£|â£cocaoâ£nibsâ£â£â£â£â£|
     |â£â£â£1.0â£|â£â£tbspâ£â£â£|â£flaxâ£seedâ£â£â£â£â£â£|
     Output above has visible spaces for better understanding of format.
+    >>> display_ingredients([(1.0, 'large', 'banana')],
+    output_format='markdown')
+    | amount | measure | ingredient |
+    | ---: | :---: | :--- |
+    | 1.0 | large | banana |
     """
-    # Determines the max width for the three columns
-    max_amount_width = max(len(str(item[0])) for item in shopping_list)
-    max_measure_width = max(len(item[1]) for item in shopping_list) 
-    max_ingredient_width = max(len(item[2]) for item in shopping_list)
-
-    # Prints the table rows for amount, measure and ingredient name
-    for item in shopping_list:
-        amount_str = f" {item[0]:>{max_amount_width}} "
-        measure_str = item[1]
-        if len(measure_str) % 2 == 1:
-            measure_str = f"  {measure_str:^{max_measure_width}} "
-        else:
-            measure_str = f" {measure_str:^{max_measure_width}}  "
-        ingredient_str = f" {item[2]:<{max_ingredient_width}}  "
-        print(f"|{amount_str}|{measure_str}|{ingredient_str}|")
+    # The table is built in one buffer and written at once, or a page at a
+    # time when paging
+    write_table(shopping_list, file, output_format, widths, page_size, pause)
     return None
 
 
@@ -438,25 +571,493 @@ def sanitise_command(command: str) -> str:
     >>> sanitise_command('add chocolate Brownies ')
     'add chocolate brownies'
     """
-    # Converts input to lowercase and removes leading/trailing whitespaces
-    command = command.lower().strip()
-    # Removes any numbers from the input string
-    command = ''.join([char for char in command if not char.isdigit()])
-    # Replaces any whitespaces with a single space
-    command = ' '.join(command.split())
-    return command
+    # Converts input to lowercase
+    command = command.lower()
+    # Removes any numbers from the input string, deleting the bytes of
+    # ASCII text in one pass
+    if command.isascii():
+        command = command.encode().translate(None, _DIGITS).decode()
+    else:
+        command = ''.join([char for char in command if not char.isdigit()])
+    # Replaces any whitespaces with a single space, which also removes
+    # leading/trailing whitespaces
+    return ' '.join(command.split())
+
+
+def enable_tab_completion(cook_book: 'CookBook | RecipeStore | SQLiteCookBook') -> None:
+    """
+    Enables tab-completion of recipe names after the add and rm commands,
+    using the cook book's prefix index. Does nothing on platforms without
+    the readline module.
+
+    Parameters: The cook book to complete recipe names from.
+
+    Return: Returns None.
+    """
+    try:
+        import readline
+    except ImportError:
+        return None
+
+    def complete(text: str, state: int) -> str | None:
+        # Only recipe commands are completed, rm -i takes ingredients
+        for prefix in ('add ', 'rm '):
+            if text.lower().startswith(prefix) and \
+                    not text.startswith('rm -i'):
+                names = cook_book.names_with_prefix(text[len(prefix):])
+                if state < len(names):
+                    return prefix + names[state]
+        return None
+
+    # Complete on the whole line so names with spaces are kept together
+    readline.set_completer_delims('')
+    readline.set_completer(complete)
+    readline.parse_and_bind('tab: complete')
+    return None
 
 
-def main() -> None:
+class Session:
+    """
+    One user's session with the program: their cook book, their meal plan and
+    where the output of their commands goes. Commands are run through a
+    dispatch table rather than one long chain of checks.
+
+    Parameters: The cook book and meal plan. Optionally a file to write
+    output to, whether to write output as JSON lines, the function used to
+    read further input for mkrec, a storage backend to close at the end,
+    a Metrics registry to record command latencies in, the format the
+    shopping list is shown in, the number of rows shown before asking
+    whether to go on and the Pantry of ingredients already in stock.
+
+    Example:
+    >>> session = Session(CookBook(COOK_BOOK), MealPlan())
+    >>> session.run('add peanut butter')
+    True
+    >>> session.run('g')
+    | 300.0 |   g  | peanuts  |
+    |   0.5 |  tsp | salt     |
+    |   2.0 |  tsp | oil      |
+    True
+    """
+
+    def __init__(self, cook_book, meal_plan, out=None, json_output: bool = False,
+                 read=input, backend=None, metrics: Metrics | None = None,
+                 output_format: str = 'table',
+                 page_size: int | None = None,
+                 pantry: Pantry | None = None) -> None:
+        if output_format not in FORMATS:
+            raise ValueError(f"unknown output format {output_format!r}")
+        self.cook_book = cook_book
+        self.meal_plan = meal_plan
+        self.out = sys.stdout if out is None else out
+        self.json_output = json_output
+        self.output_format = output_format
+        self.page_size = page_size
+        # Stock taken off the shopping list when it is shown
+        self.pantry = Pantry() if pantry is None else pantry
+        self.read = read
+        self.backend = backend
+        # Instrumentation is off unless a registry is given
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.enable()
+        self.running = True
+        # Output of the current command when writing JSON
+        self._messages = []
+        self._result = None
+
+    def say(self, text: str = '') -> None:
+        """
+        Writes a line of text output, or keeps it as a message in JSON mode.
+        """
+        if self.json_output:
+            self._messages.append(text)
+        else:
+            print(text, file=self.out)
+
+    def result(self, data) -> None:
+        """
+        Records the structured result of the current command for JSON mode.
+        """
+        self._result = data
+
+    def run(self, command: str) -> bool:
+        """
+        Runs a single command.
+
+        Parameters: The command as typed by the user.
+
+        Return: False once the user has quit, True otherwise.
+        """
+        name, handler = _lookup_command(command)
+        if self.metrics is None:
+            self.dispatch(handler, command)
+        else:
+            with self.metrics.timer('command.' + name):
+                self.dispatch(handler, command)
+        if self.json_output:
+            self.out.write(json.dumps({'command': command,
+                                       'result': self._result,
+                                       'messages': self._messages}) + '\n')
+            self._messages = []
+            self._result = None
+        return self.running
+
+    def dispatch(self, handler, command: str) -> None:
+        """
+        Runs a command's handler, reporting malformed input.
+        """
+        try:
+            handler(self, command)
+        except (ValueError, IndexError):
+            # Malformed amounts or ingredients
+            self.say("Incorrect input, please try again")
+
+    def more(self) -> bool:
+        """
+        Asks whether to show the next page of a long shopping list.
+        """
+        answer = self.read("-- more, press enter or q to stop -- ")
+        return answer.strip().lower() != 'q'
+
+    def close(self) -> None:
+        """
+        Closes the storage behind the session's cook book, if any.
+        """
+        if _is_loaded_instance(self.cook_book, 'recipe_store', 'RecipeStore'):
+            self.cook_book.close()
+        if self.backend is not None:
+            self.backend.close()
+        self.pantry.close()
+        if self.metrics is not None:
+            self.metrics.disable()
+
+
+def _lookup_command(command: str) -> tuple[str, object]:
+    # Finds a command's name and handler in the dispatch tables
+    lowered = command.lower()
+    handler = COMMANDS.get(lowered)
+    if handler is not None:
+        return lowered, handler
+    for prefix, prefix_handler in PREFIX_COMMANDS:
+        if lowered.startswith(prefix):
+            return prefix.strip(), prefix_handler
+    return 'unknown', command_unknown
+
+
+def command_help(session: Session, command: str) -> None:
+    # Lists the commands
+    session.say(HELP_TEXT)
+
+
+def command_mkrec(session: Session, command: str) -> None:
+    # Creates a new recipe and adds it to cook_book
+    recipe = compile_recipe(create_recipe(session.read))
+    add_recipe(recipe, session.cook_book)
+    session.result({'name': recipe.name, 'ingredients': recipe.raw_ingredients})
+
+
+def command_add(session: Session, command: str) -> None:
+    # A trailing number is the number of servings, as in add seitan 3
+    words = command.split()
+    servings = 1.0
+    if len(words) > 2:
+        try:
+            servings = float(words[-1])
+        except ValueError:
+            pass
+        else:
+            command = ' '.join(words[:-1])
+            if not (isfinite(servings) and servings > 0.0):
+                raise ValueError("servings must be a positive number")
+    # Separates the recipe name given by user, keeping any digits in it as
+    # in 7 layer dip
+    recipe_name = ' '.join(command.lower().split())[3:].strip()
+    # Looks the recipe up in the cook book index, then as sanitised input
+    recipe = find_recipe(recipe_name, session.cook_book)
+    if recipe is None:
+        recipe = find_recipe(sanitise_command(command)[3:].strip(),
+                             session.cook_book)
+    if recipe is not None:
+        add_recipe(recipe, session.meal_plan, servings)
+        session.result(recipe.name)
+    else:
+        suggestions = suggest_recipes(recipe_name, session.cook_book)
+        session.result({'suggestions': suggestions})
+        session.say("")
+        session.say("Recipe does not exist in the cook book. ")
+        if suggestions:
+            session.say(f"Did you mean: {', '.join(suggestions)}?")
+        session.say("Use the mkrec command to create a new recipe.")
+        session.say("")
+
+
+def command_remove_ingredient(session: Session, command: str) -> None:
+    # Removes ingredient from shopping list
+    result = command[5:].split()
+    ingredient_name = ' '.join(result[:-1])
+    # Converts the last element to a float and equals the amount
+    amount = float(result[-1])
+    # Kept as an adjustment so it survives changes to the plan
+    session.meal_plan.adjust(ingredient_name, amount)
+
+
+def command_remove(session: Session, command: str) -> None:
+    # Remove recipe from collection
+    name = command[3:].strip()
+    remove_recipe(name, session.meal_plan)
+
+
+def command_list(session: Session, command: str) -> None:
+    # Lists all recipes in the shopping cart
+    recipe_list = [recipe for recipe in session.meal_plan]
+    session.result([{'name': recipe[0], 'ingredients': recipe[1],
+                     'servings': servings_of(recipe)[1]}
+                    for recipe in recipe_list])
+    if not recipe_list:
+        session.say("No recipe in meal plan yet.")
+    elif not session.json_output:
+        session.say(str(recipe_list))
+
+
+def command_list_cook_book(session: Session, command: str) -> None:
+    # Lists all recipes in the cook book
+    names = [recipe[0] for recipe in session.cook_book]
+    _list_names(session, names)
+
+
+def command_list_prefix(session: Session, command: str) -> None:
+    # Lists recipes in the cook book starting with a prefix
+    _list_names(session, session.cook_book.names_with_prefix(command[6:]))
+
+
+def command_list_using(session: Session, command: str) -> None:
+    # Lists recipes in the cook book using an ingredient
+    ingredient = command[6:].strip()
+    found = find_recipes_using(ingredient, session.cook_book)
+    session.result([{'recipe': name, 'amount': amount, 'measure': measure,
+                     'ingredient': ingredient_name}
+                    for name, amount, measure, ingredient_name in found])
+    if not found:
+        session.say(f"No recipe in the cook book uses {ingredient}.")
+    elif not session.json_output:
+        for name, amount, measure, ingredient_name in found:
+            session.say(f"{name}: {amount} {measure} {ingredient_name}")
+
+
+def _list_names(session: Session, names: list[str]) -> None:
+    session.result(names)
+    if not session.json_output:
+        for name in names:
+            session.say(name)
+
+
+def command_show(session: Session, command: str) -> None:
+    # Shows the shopping_list, which is kept up to date as recipes are
+    # added and removed
+    # Stock in the pantry is taken off in the same pass
+    pantry = session.pantry if session.pantry else None
+    with span('aggregate'):
+        shopping_list = session.meal_plan.shopping_list(pantry)
+    if session.json_output:
+        session.result([{'amount': amount, 'measure': measure,
+                         'ingredient': name}
+                        for amount, measure, name in shopping_list])
+    elif shopping_list:
+        # The plan tracks its column widths as recipes come and go
+        widths = None
+        if isinstance(session.meal_plan, MealPlan) and pantry is None:
+            widths = session.meal_plan.column_widths()
+        display_ingredients(shopping_list, session.out, session.output_format,
+                            widths, session.page_size,
+                            session.more if session.page_size else None)
+
+
+def command_save(session: Session, command: str) -> None:
+    # Saves the shopping list as it is shown to a columnar file
+    from columnar import ColumnarShoppingList
+    path = command[5:].strip()
+    pantry = session.pantry if session.pantry else None
+    shopping_list = ColumnarShoppingList(session.meal_plan.shopping_list(pantry))
+    try:
+        shopping_list.save(path)
+    except OSError as error:
+        session.say(f"Could not save to {path}: {error.strerror}")
+        return
+    session.result({'path': path, 'rows': len(shopping_list)})
+
+
+def command_save_plan(session: Session, command: str) -> None:
+    # Saves the recipes in the meal plan to a columnar file
+    from columnar import save_plan
+    path = command[8:].strip()
+    try:
+        save_plan(session.meal_plan, path)
+    except OSError as error:
+        session.say(f"Could not save to {path}: {error.strerror}")
+        return
+    session.result({'path': path, 'recipes': len(session.meal_plan)})
+
+
+def command_load_plan(session: Session, command: str) -> None:
+    # Adds the recipes of a saved meal plan to the current one
+    from columnar import load_plan
+    path = command[8:].strip()
+    try:
+        entries = load_plan(path)
+    except OSError as error:
+        session.say(f"Could not load {path}: {error.strerror}")
+        return
+    except ValueError as error:
+        session.say(f"Could not load the plan: {error}")
+        return
+    for entry in entries:
+        add_recipe(entry, session.meal_plan)
+    session.result([entry[0] for entry in entries])
+
+
+def command_stock(session: Session, command: str) -> None:
+    # Adds stock to the pantry, or takes it away for a negative amount
+    amount, measure, name = parse(command[6:], signed=True)
+    session.pantry.add((amount, measure, name))
+    session.result(session.pantry.get(name))
+
+
+def command_remove_stock(session: Session, command: str) -> None:
+    # Removes an ingredient from the pantry
+    session.pantry.discard(command[6:].strip())
+
+
+def command_list_pantry(session: Session, command: str) -> None:
+    # Lists the ingredients in the pantry
+    stock = list(session.pantry)
+    session.result([{'amount': amount, 'measure': measure,
+                     'ingredient': name} for amount, measure, name in stock])
+    if not stock:
+        session.say("The pantry is empty.")
+    elif not session.json_output:
+        display_ingredients(stock, session.out, session.output_format)
+
+
+def command_stats(session: Session, command: str) -> None:
+    # Shows the latency of each command and phase recorded so far
+    if session.metrics is None:
+        session.say("Metrics are off, start the program with --metrics.")
+        return
+    session.result(session.metrics.to_dict())
+    if not session.json_output:
+        session.say(session.metrics.format_table())
+
+
+def command_profile(session: Session, command: str) -> None:
+    # Runs one command under the profiler and shows where the time went
+    inner = command[8:].strip()
+    if not inner or inner.lower().startswith('profile'):
+        session.say("Usage: profile {command}")
+        return
+    _, handler = _lookup_command(inner)
+    _, report = profile(session.dispatch, handler, inner)
+    session.say(report)
+
+
+def command_quit(session: Session, command: str) -> None:
+    # Quits the loop and program
+    session.running = False
+
+
+def command_unknown(session: Session, command: str) -> None:
+    # Occurs when input doesn't match any statements
+    session.say("Incorrect input, please try again")
+
+
+# Commands matched against the whole lower-cased input
+COMMANDS = {
+    'h': command_help,
+    'mkrec': command_mkrec,
+    'ls': command_list,
+    'ls -a': command_list_cook_book,
+    'ls -s': command_show,
+    'ls -p': command_list_pantry,
+    'g': command_show,
+    'stats': command_stats,
+    'q': command_quit,
+}
+
+# Commands matched against the start of the lower-cased input, in order
+PREFIX_COMMANDS = (
+    ('add', command_add),
+    ('rm -i', command_remove_ingredient),
+    ('rm -p ', command_remove_stock),
+    ('rm', command_remove),
+    ('ls -a ', command_list_prefix),
+    ('ls -i ', command_list_using),
+    ('profile ', command_profile),
+    ('stock ', command_stock),
+    ('save -p ', command_save_plan),
+    ('save ', command_save),
+    ('load -p ', command_load_plan),
+)
+
+
+def open_session(cook_book_path: str | None = None, plan_name: str = 'default',
+                 pantry_path: str | None = None, **options) -> Session:
+    """
+    Opens the cook book and meal plan for a session.
+
+    Parameters: Optional path of a recipe store file, which keeps the cook
+    book between sessions. Paths ending in .db, .sqlite or .sqlite3 open a
+    shared SQLite database instead, where the meal plan is kept under the
+    given plan name. Optional path of a pantry file, which keeps the stock
+    between sessions. Other options are passed on to Session.
+
+    Return: The new Session.
+    """
+    backend = None
+    if cook_book_path is None:
+        cook_book = CookBook(COOK_BOOK)
+    elif cook_book_path.lower().endswith(SQLITE_EXTENSIONS):
+        # Cook book and meal plan are shared through a database
+        from sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend(cook_book_path)
+        cook_book = backend.cook_book
+        if not cook_book:
+            for recipe in COOK_BOOK:
+                cook_book.add(recipe)
+    else:
+        # Recipes persist in an on-disk store between sessions
+        from recipe_store import RecipeStore
+        cook_book = RecipeStore(cook_book_path)
+        if not cook_book:
+            cook_book.add_many(COOK_BOOK)
+    # Establish a meal plan that keeps its shopping list up to date
+    if backend is None:
+        meal_plan = MealPlan()
+    else:
+        meal_plan = backend.plan(plan_name)
+    pantry = Pantry() if pantry_path is None else Pantry.open(pantry_path)
+    return Session(cook_book, meal_plan, backend=backend, pantry=pantry,
+                   **options)
+
+
+def main(cook_book_path: str | None = None, plan_name: str = 'default',
+         metrics: Metrics | None = None, output_format: str = 'table',
+         page_size: int | None = None,
+         pantry_path: str | None = None) -> None:
     """
     The main interaction loop that the user interacts with. Program prompts user
     to enter a command which allows them to navigate and operate the shopping
     list.
 
-    Parameters: The input is prompted by the user and is a string.
+    Parameters: The input is prompted by the user and is a string. Optional
+    path of the cook book file and name of the meal plan, see open_session,
+    a Metrics registry to record command latencies in, the format the
+    shopping list is shown in, the number of its rows shown at a time and
+    the path of the pantry file.
 
     Return: The function returns None. The function breaks when user inputs
-    'q' or 'Q'.
+    'q' or 'Q', or at the end of input. The session is closed however the
+    loop ends, so pantry changes are saved and the cook book is closed
+    cleanly even after Ctrl-C.
 
     Example:
     Please enter a command: add coconut
@@ -484,122 +1085,156 @@ def main() -> None:
     | 1.0 | large | coconut |
     Please enter a command:
     """
-    #cook book
-    recipe_collection = [
-        CHOCOLATE_PEANUT_BUTTER_SHAKE, 
-        BROWNIE, 
-        SEITAN, 
-        CINNAMON_ROLLS, 
-        PEANUT_BUTTER, 
-        MUNG_BEAN_OMELETTE
-    ]
-    # Establish an empty lists to store recipes and shopping list 
-    recipes = []
-    shopping_list = []
-    
-    while True:
-        command = input("Please enter a command: ")
-        
-        if command == 'h' or command == 'H':
-            print("    H or h: Help")
-            print("    mkrec: creates a recipe, add to cook book.")
-            print("    add {recipe}: adds a recipe to the collection.")
-            print("    rm {recipe}: removes a recipe from the collection.")
-            print("    rm -i {ingredient_name} {amount}: removes ingredient from shopping list.")
-            print("    ls: list all recipes in shopping cart.")
-            print("    ls -a: list all available recipes in cook book.")
-            print("    ls -s: display shopping list.")
-            print("    g or G: generates a shopping list.")
-            print("    Q or q: Quit.")
-
-        elif command == 'mkrec':
-            # Creates a new recipe and adds it to cook_book
-            recipe = create_recipe()
-            add_recipe(recipe, recipe_collection)
-
-
-        elif command.lower().startswith('add'):
-            # Sanitises user input
-            command = sanitise_command(command)
-            # Separates the recipe name given by user
-            recipe_name = command[3:].strip()
-            found = False
-            # Loops through recipe collection
-            for recipe in recipe_collection:
-                # Checks if recipe name matches recipe name given by user
-                if recipe[0].lower() == recipe_name.lower():
-                    found = True
-                    add_recipe(recipe, recipes)
-                    break
-            if not found:
-                print("")
-                print("Recipe does not exist in the cook book. ")
-                print("Use the mkrec command to create a new recipe.")
-                print("")
-       
-
-        elif command.startswith('rm'):
-            # Distinguishes between similar starting inputs
-            if command.startswith('rm -i'):
-                # Removes ingredient from shopping list
-                result = command[5:].split()
-                ingredient_name = ''
-                for i in result[:-1]:
-                    # Checks if the element is a string
-                    if type(i) == str:
-                        # Add the string to ingredient_name with a space 
-                        ingredient_name += i + ' '
-                ingredient_name = ingredient_name.strip()
-                # Converts the last element to a float and equals the amount
-                amount = float(result[-1])
-                generate_shopping_list(recipes)
-                remove_from_shopping_list(ingredient_name, amount,
-                shopping_list)
-                shopping_list
-            
-            else:
-                # Remove recipe from collection
-                name = command[3:].strip()
-                remove_recipe(name, recipes)
-            
-            
-        elif command.lower() == 'ls':
-            # Lists all recipes in the shopping cart
-            if not recipes:
-                print("No recipe in meal plan yet.")
-            else:
-                recipe_list = [recipe for recipe in recipes]
-                print(recipe_list)
-
-
-        elif command.lower() == 'ls -a':
-            # Lists all recipes in recipe_collection
-            for recipe in recipe_collection:
-                print(recipe[0])
-
-        elif command.lower() == 'ls -s':
-            # Displays the shopping_list
-            generate_shopping_list(recipes)
-            if shopping_list!=[]:
-                display_ingredients(shopping_list)
-            else:
-                pass    
-
-        elif command.lower() == 'g' or command.lower() == 'G':
-            # Generates a shopping_list
-            shopping_list = generate_shopping_list(recipes)
-            if shopping_list!=[]:
-                display_ingredients(shopping_list)
-            else:
-                pass
-        
-        elif command.lower() == 'q' or command.lower() == 'Q':
-            # Quits the loop and program
-            break
+    session = open_session(cook_book_path, plan_name, pantry_path,
+                           metrics=metrics, output_format=output_format,
+                           page_size=page_size)
+    try:
+        enable_tab_completion(session.cook_book)
+        while session.run(input("Please enter a command: ")):
+            pass
+    except EOFError:
+        # End of input quits, as q does
+        print()
+    finally:
+        session.close()
+
+
+def run_script(lines, cook_book_path: str | None = None,
+               plan_name: str = 'default', json_output: bool = False,
+               out=None, metrics: Metrics | None = None,
+               output_format: str = 'table',
+               pantry_path: str | None = None) -> int:
+    """
+    Runs commands non-interactively, one per line, for example from a script
+    file or standard input. Lines following mkrec give the recipe name and
+    ingredients, ending with an empty line. All output is buffered and
+    written once at the end.
+
+    Parameters: Iterable of command lines. Optional cook book path and plan
+    name as for open_session, whether to write JSON lines instead of text,
+    the file to write to, standard output by default, a Metrics registry
+    to record command latencies in, the format the shopping list is shown
+    in and the path of the pantry file.
+
+    Return: Number of commands run.
+
+    Example:
+    >>> run_script(['add peanut butter', 'g'], json_output=True)
+    {"command": "add peanut butter", "result": "peanut butter", "messages": []}
+    {"command": "g", "result": [{"amount": 300.0, "measure": "g", ...}], "messages": []}
+    2
+    """
+    buffer = io.StringIO()
+    lines = (line.rstrip('\r\n') for line in lines)
+    session = open_session(cook_book_path, plan_name, pantry_path,
+                           out=buffer, json_output=json_output,
+                           read=lambda prompt: next(lines, ''),
+                           metrics=metrics, output_format=output_format)
+    count = 0
+    try:
+        for command in lines:
+            count += 1
+            if not session.run(command):
+                break
+    finally:
+        session.close()
+    (sys.stdout if out is None else out).write(buffer.getvalue())
+    return count
+
+
+def import_into(path: str, cook_book_path: str,
+                file_format: str | None = None, out=None) -> 'ImportReport':
+    """
+    Imports a CSV or JSON-lines recipe file into a cook book and prints how
+    it went, including the line numbers of malformed lines.
+
+    Parameters: Path of the file to import, path of the recipe store or
+    SQLite database to import into, optional format ('csv' or 'jsonl') and
+    the file to write to, standard output by default.
+
+    Return: The ImportReport. Raises ValueError without a cook book path,
+    as the built-in cook book is not kept between sessions.
+
+    Example:
+    >>> import_into('recipes.csv', 'cookbook.smr')
+    line 3: ingredient 2 'lots of butter': amount is not a number
+    Imported 999999 recipes, rejected 1 line.
+    """
+    from importer import import_file
+    if cook_book_path is None:
+        raise ValueError("importing needs a recipe store or database to "
+                         "import into")
+    out = sys.stdout if out is None else out
+    session = open_session(cook_book_path)
+    try:
+        report = import_file(path, session.cook_book, file_format)
+    finally:
+        session.close()
+    for line_number, message in report.errors:
+        print(f"line {line_number}: {message}", file=out)
+    if report.rejected > len(report.errors):
+        print(f"... and {report.rejected - len(report.errors)} more "
+              f"malformed lines", file=out)
+    print(f"Imported {report.imported} recipes, rejected {report.rejected} "
+          f"line{'' if report.rejected == 1 else 's'}.", file=out)
+    return report
+
 
-        else:
-            # Occurs when input doesn't match any statements
-            print("Incorrect input, please try again")
-        
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Generates a shopping list.")
+    parser.add_argument('cook_book', nargs='?',
+                        help="recipe store or SQLite database to keep the "
+                        "cook book in")
+    parser.add_argument('plan', nargs='?', default='default',
+                        help="name of the meal plan in a SQLite database")
+    parser.add_argument('--script',
+                        help="run commands from a file, or - for standard "
+                        "input, instead of prompting")
+    parser.add_argument('--json', action='store_true',
+                        help="write script output as JSON lines")
+    parser.add_argument('--import', dest='import_path',
+                        help="import recipes from a CSV or JSON-lines file "
+                        "into the cook book and exit")
+    parser.add_argument('--metrics', action='store_true',
+                        help="record command latencies, shown by the stats "
+                        "command")
+    parser.add_argument('--metrics-out',
+                        help="write the recorded latencies to a JSON file "
+                        "on exit, implies --metrics")
+    parser.add_argument('--format', choices=FORMATS, default='table',
+                        help="how the shopping list is shown")
+    parser.add_argument('--page', type=int,
+                        help="when prompting, show the shopping list this "
+                        "many rows at a time")
+    parser.add_argument('--pantry',
+                        help="file of ingredients in stock, taken off the "
+                        "shopping list and kept between sessions")
+    args = parser.parse_args()
+    registry = Metrics() if args.metrics or args.metrics_out else None
+    if args.import_path is not None and args.cook_book is None:
+        parser.error("--import needs a recipe store or SQLite database to "
+                     "import into")
+    if args.import_path is not None:
+        try:
+            import_into(args.import_path, args.cook_book)
+        except OSError as error:
+            parser.exit(1, f"Could not load {args.import_path}: "
+                        f"{error.strerror}\n")
+        except ValueError as error:
+            # An unknown file extension, or a file that is not UTF-8
+            parser.exit(1, f"Could not load {args.import_path}: {error}\n")
+    elif args.script is None:
+        main(args.cook_book, args.plan, registry, args.format, args.page,
+             args.pantry)
+    elif args.script == '-':
+        run_script(sys.stdin, args.cook_book, args.plan, args.json,
+                   metrics=registry, output_format=args.format,
+                   pantry_path=args.pantry)
+    else:
+        with open(args.script) as script:
+            run_script(script, args.cook_book, args.plan, args.json,
+                       metrics=registry, output_format=args.format,
+                       pantry_path=args.pantry)
+    if args.metrics_out:
+        registry.export(args.metrics_out)
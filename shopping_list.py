@@ -0,0 +1,267 @@
+"""
+Shopping list aggregator that merges ingredients by name and unit dimension.
+"""
+
+from table_renderer import ColumnWidths
+from units import from_base, unit_info
+
+# Relative tolerance when deciding whether a removal uses up a row
+_EPSILON = 1e-9
+
+
+class ShoppingList:
+    """
+    A shopping list keyed by ingredient name. Merging, removing and looking
+    up an ingredient are constant time, and rows keep the order in which
+    their ingredient was first seen, matching the plain list of
+    (amount, measure, name) tuples used elsewhere in the program.
+
+    Amounts are held in the base unit of their dimension (grams,
+    millilitres or items), so '2 tbsp' and '1 tsp' of an ingredient add up
+    correctly. Rows are shown in the first measure seen for them. The same
+    ingredient in two dimensions, such as cups and grams of flour, is kept
+    as two rows.
+
+    Parameters: Optional iterable of ingredient details as tuples of amount,
+    measure and ingredient name.
+
+    Example:
+    >>> shopping_list = ShoppingList([(300.0, 'g', 'peanuts'),
+    (2.0, 'tbsp', 'salt')])
+    >>> shopping_list.add((0.2, 'kg', 'peanuts'))
+    >>> shopping_list.add((1.0, 'tsp', 'salt'))
+    >>> shopping_list.to_list()
+    [(500.0, 'g', 'peanuts'), (2.333333333, 'tbsp', 'salt')]
+    """
+
+    __slots__ = ('_rows', '_names', '_widths')
+
+    def __init__(self, items=()) -> None:
+        # Maps (name, dimension) to a mutable
+        # [base amount, measure, number of contributions] row
+        self._rows = {}
+        # Maps name to its row keys, in first-seen order
+        self._names = {}
+        # Widths of the measure and name columns when shown as a table
+        self._widths = ColumnWidths(2)
+        for item in items:
+            self.add(item)
+
+    def add(self, ingredient_details: tuple[float, str, str]) -> None:
+        """
+        Adds an ingredient to the list. If the ingredient is already present
+        in the same dimension the amount is combined and the first measure
+        is kept.
+
+        Parameters: Ingredient details as a tuple of amount, measure and
+        ingredient name.
+
+        Return: Returns None.
+        """
+        if not ingredient_details:
+            return None
+        amount, measure, name = ingredient_details
+        self.merge(amount, measure, name)
+        return None
+
+    def merge(self, amount: float, measure: str, name: str) -> None:
+        """
+        Same as add, but takes the amount, measure and name separately so
+        callers holding parsed ingredients need not build a tuple.
+
+        Parameters: Amount as a float, measure and ingredient name as strings.
+
+        Return: Returns None.
+        """
+        dimension, factor = unit_info(measure)
+        self.merge_base(amount * factor, dimension, measure, name)
+        return None
+
+    def merge_base(self, base_amount: float, dimension: str, measure: str,
+                   name: str) -> None:
+        """
+        Adds an amount that is already converted to its base unit.
+
+        Parameters: Base amount as a float, dimension, measure and ingredient
+        name as strings.
+
+        Return: Returns None.
+        """
+        key = (name, dimension)
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = [base_amount, measure, 1]
+            self._names.setdefault(name, []).append(key)
+            self._widths.add(measure, name)
+        else:
+            row[0] += base_amount
+            row[2] += 1
+        return None
+
+    def shift_base(self, base_amount: float, dimension: str,
+                   name: str) -> None:
+        """
+        Adds an amount, which may be negative, to an existing row without
+        counting it as a new contribution, for example when a recipe in the
+        meal plan is made more or fewer times.
+
+        Parameters: Base amount as a float, dimension and ingredient name as
+        strings.
+
+        Return: Returns None.
+        """
+        row = self._rows.get((name, dimension))
+        if row is not None:
+            row[0] += base_amount
+        return None
+
+    def withdraw_base(self, base_amount: float, dimension: str,
+                      name: str) -> None:
+        """
+        Undoes an earlier merge_base of the same amount, for example when a
+        recipe leaves the meal plan. The row is removed once every amount
+        merged into it has been withdrawn.
+
+        Parameters: Base amount as a float, dimension and ingredient name as
+        strings.
+
+        Return: Returns None.
+        """
+        key = (name, dimension)
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        row[2] -= 1
+        if row[2] <= 0:
+            self._delete(key)
+        else:
+            row[0] -= base_amount
+        return None
+
+    def base_rows(self):
+        """
+        Iterates over the rows as (name, dimension, base amount, measure)
+        tuples in first-seen order.
+        """
+        for (name, dimension), row in self._rows.items():
+            yield (name, dimension, row[0], row[1])
+
+    def reorder(self, position, measures: dict) -> None:
+        """
+        Puts the rows in a new order and shows some in a new measure, for
+        example when the recipe that first used an ingredient leaves a meal
+        plan.
+
+        Parameters: Function giving the sort key of a (name, dimension) key,
+        and a dict mapping (name, dimension) keys to their new measure.
+
+        Return: Returns None.
+        """
+        for key, measure in measures.items():
+            row = self._rows[key]
+            self._widths.discard(row[1], key[0])
+            row[1] = measure
+            self._widths.add(measure, key[0])
+        self._rows = {key: self._rows[key]
+                      for key in sorted(self._rows, key=position)}
+        names = {}
+        for key in self._rows:
+            names.setdefault(key[0], []).append(key)
+        self._names = names
+        return None
+
+    def key_of(self, ingredient_name: str) -> tuple[str, str] | None:
+        """
+        Returns the (name, dimension) key of the first row for an
+        ingredient, or None if not present.
+        """
+        keys = self._names.get(ingredient_name)
+        return keys[0] if keys else None
+
+    def base_row(self, key: tuple[str, str]) -> tuple[float, str] | None:
+        """
+        Returns the base amount and measure of the row with a
+        (name, dimension) key, or None if not present.
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return (row[0], row[1])
+
+    def remove(self, ingredient_name: str, amount: float) -> None:
+        """
+        Takes an amount of an ingredient off the list, in the measure the
+        ingredient is shown in. The ingredient is removed entirely once the
+        amount reaches zero.
+
+        Parameters: Ingredient name as a string and amount as a float.
+
+        Return: Returns None.
+        """
+        keys = self._names.get(ingredient_name)
+        if not keys:
+            return None
+        key = keys[0]
+        row = self._rows[key]
+        base_amount = amount * unit_info(row[1])[1]
+        if row[0] - base_amount > _EPSILON * max(abs(row[0]), 1.0):
+            row[0] -= base_amount
+        else:
+            self._delete(key)
+        return None
+
+    def _delete(self, key: tuple[str, str]) -> None:
+        self._widths.discard(self._rows.pop(key)[1], key[0])
+        keys = self._names[key[0]]
+        keys.remove(key)
+        if not keys:
+            del self._names[key[0]]
+
+    def get(self, ingredient_name: str) -> tuple[float, str, str] | None:
+        """
+        Looks up an ingredient by name.
+
+        Parameters: Ingredient name as a string.
+
+        Return: The first row for the ingredient as a tuple, or None if not
+        present.
+        """
+        keys = self._names.get(ingredient_name)
+        if not keys:
+            return None
+        row = self._rows[keys[0]]
+        return (from_base(row[0], row[1]), row[1], ingredient_name)
+
+    def column_widths(self) -> tuple[int, int]:
+        """
+        Returns the widths of the widest measure and ingredient name, kept
+        up to date as rows are added and removed.
+        """
+        return self._widths.widths()
+
+    def to_list(self) -> list[tuple[float, str, str]]:
+        """
+        Returns the rows as a list of (amount, measure, name) tuples in
+        first-seen order.
+        """
+        return list(self)
+
+    def __contains__(self, ingredient_name: str) -> bool:
+        return ingredient_name in self._names
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self):
+        for (name, _), row in self._rows.items():
+            yield (from_base(row[0], row[1]), row[1], name)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ShoppingList):
+            return self.to_list() == other.to_list()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self.to_list())
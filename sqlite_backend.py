@@ -0,0 +1,527 @@
+"""
+SQLite storage for the cook book and meal plans, so several kitchens can
+share one database. Recipes, their parsed ingredients and the recipes in
+each plan live in normalised tables, and shopping lists are aggregated with
+a GROUP BY query. Connections come from a small pool and the database runs
+in WAL mode so readers do not block each other.
+"""
+
+import json
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from cook_book import CookBook
+from ingredient_index import matches
+from name_index import NameIndex
+from pantry import Pantry
+from recipe import Recipe, ScaledRecipe, compile_recipe, servings_of
+from units import from_base, unit_info
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipe (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    folded_name TEXT NOT NULL UNIQUE,
+    raw_ingredients TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredient (
+    recipe_id INTEGER NOT NULL REFERENCES recipe(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    measure TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    base_amount REAL NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+);
+CREATE INDEX IF NOT EXISTS ingredient_name ON ingredient(name, dimension);
+CREATE TABLE IF NOT EXISTS plan (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS plan_recipe (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plan_id INTEGER NOT NULL REFERENCES plan(id) ON DELETE CASCADE,
+    recipe_id INTEGER NOT NULL REFERENCES recipe(id) ON DELETE CASCADE,
+    servings REAL NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS plan_recipe_plan ON plan_recipe(plan_id, recipe_id);
+CREATE TABLE IF NOT EXISTS plan_adjustment (
+    plan_id INTEGER NOT NULL REFERENCES plan(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    base_amount REAL NOT NULL,
+    PRIMARY KEY (plan_id, name, dimension)
+);
+"""
+
+# Totals per (name, dimension) in first-seen order. With a single MIN()
+# aggregate SQLite takes the bare measure column from the first-seen row.
+AGGREGATE_QUERY = """
+SELECT i.name, i.dimension, i.measure, SUM(i.base_amount * pr.servings),
+       MIN((pr.id << 20) + i.position) AS first_seen
+FROM plan_recipe pr JOIN ingredient i ON i.recipe_id = pr.recipe_id
+WHERE pr.plan_id = ? {extra}
+GROUP BY i.name, i.dimension
+ORDER BY first_seen
+"""
+
+# Relative tolerance below which an adjusted amount counts as used up
+_EPSILON = 1e-9
+
+
+class ConnectionPool:
+    """
+    A small pool of SQLite connections to one database file. Connections
+    are opened on demand up to the pool size and are safe to hand between
+    threads.
+
+    Parameters: Path of the database file and the number of connections.
+    """
+
+    def __init__(self, path: str, size: int = 4) -> None:
+        self.path = path
+        # Idle connections, with None standing for one not yet opened
+        self._connections = queue.LifoQueue()
+        for _ in range(size):
+            self._connections.put(None)
+        self._all = []
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30.0,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        self._all.append(connection)
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection for the duration of a with block, waiting for one
+        to be returned if all are in use. The block runs as one
+        transaction, committed on success and rolled back on error.
+        """
+        connection = self._connections.get()
+        try:
+            if connection is None:
+                connection = self._connect()
+            with connection:
+                yield connection
+        finally:
+            self._connections.put(connection)
+
+    def close(self) -> None:
+        """
+        Closes every connection the pool has opened.
+        """
+        for connection in self._all:
+            connection.close()
+        self._all = []
+
+
+class SQLiteBackend:
+    """
+    Opens a shared database of recipes and meal plans.
+
+    Parameters: Path of the database file and the connection pool size.
+
+    Example:
+    >>> backend = SQLiteBackend('kitchens.db')
+    >>> recipe = backend.cook_book.add(PEANUT_BUTTER)
+    >>> plan = backend.plan('north kitchen')
+    >>> plan.append(PEANUT_BUTTER)
+    >>> plan.aggregate()
+    [(300.0, 'g', 'peanuts'), (0.5, 'tsp', 'salt'), (2.0, 'tsp', 'oil')]
+    """
+
+    def __init__(self, path: str, pool_size: int = 4) -> None:
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+            # Databases made before plans had servings gain the column
+            columns = [row[1] for row in
+                       connection.execute("PRAGMA table_info(plan_recipe)")]
+            if 'servings' not in columns:
+                connection.execute("ALTER TABLE plan_recipe ADD COLUMN "
+                                   "servings REAL NOT NULL DEFAULT 1")
+        self.cook_book = SQLiteCookBook(self.pool)
+
+    def plan(self, name: str) -> 'SQLitePlan':
+        """
+        Returns the meal plan with the given name, creating it if needed.
+        """
+        with self.pool.connection() as connection:
+            connection.execute("INSERT OR IGNORE INTO plan(name) VALUES (?)",
+                               (name,))
+            plan_id = connection.execute("SELECT id FROM plan WHERE name = ?",
+                                         (name,)).fetchone()[0]
+        return SQLitePlan(self.pool, plan_id)
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+def _store_recipe(connection: sqlite3.Connection, recipe: Recipe) -> int:
+    # Inserts or replaces a recipe, keeping its id, and returns the id
+    connection.execute(
+        "INSERT INTO recipe(name, folded_name, raw_ingredients) "
+        "VALUES (?, ?, ?) ON CONFLICT(folded_name) DO UPDATE SET "
+        "name = excluded.name, raw_ingredients = excluded.raw_ingredients",
+        (recipe.name, CookBook.fold(recipe.name), recipe.raw_ingredients))
+    recipe_id = connection.execute(
+        "SELECT id FROM recipe WHERE folded_name = ?",
+        (CookBook.fold(recipe.name),)).fetchone()[0]
+    connection.execute("DELETE FROM ingredient WHERE recipe_id = ?",
+                       (recipe_id,))
+    connection.executemany(
+        "INSERT INTO ingredient VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(recipe_id, position, ingredient.amount, ingredient.measure,
+          ingredient.name, ingredient.dimension, ingredient.base_amount)
+         for position, ingredient in enumerate(recipe.ingredients)])
+    return recipe_id
+
+
+class SQLiteCookBook:
+    """
+    The cook book stored in the database. It offers the same add, find,
+    remove, listing and prefix operations as CookBook.
+
+    Parameters: The connection pool of the database.
+    """
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self.pool = pool
+        # NameIndex of the recipe names with the recipe count and largest id
+        # it was built at, as other processes may change the database
+        self._names = None
+
+    def add(self, recipe: Recipe | tuple[str, str]) -> Recipe:
+        """
+        Adds a recipe, replacing any recipe with the same name.
+
+        Parameters: Recipe as a Recipe or a tuple containing two strings.
+
+        Return: The compiled recipe that was stored.
+        """
+        recipe = compile_recipe(recipe)
+        with self.pool.connection() as connection:
+            _store_recipe(connection, recipe)
+        return recipe
+
+    def add_many(self, recipes) -> int:
+        """
+        Adds several recipes in a single transaction, which is much faster
+        than adding them one at a time.
+
+        Parameters: Iterable of recipes, as Recipe objects or tuples
+        containing two strings.
+
+        Return: Number of recipes added.
+        """
+        count = 0
+        with self.pool.connection() as connection:
+            for recipe in recipes:
+                _store_recipe(connection, compile_recipe(recipe))
+                count += 1
+        return count
+
+    def find(self, name: str) -> Recipe | None:
+        """
+        Finds a recipe by name, ignoring case.
+
+        Parameters: Recipe name as a string.
+
+        Return: The recipe, or None if it is not in the cook book.
+        """
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT name, raw_ingredients FROM recipe "
+                "WHERE folded_name = ?", (CookBook.fold(name),)).fetchone()
+        return None if row is None else compile_recipe(row)
+
+    def remove(self, name: str) -> Recipe | None:
+        """
+        Removes a recipe by name, ignoring case. The recipe is also taken
+        out of every meal plan that uses it.
+
+        Parameters: Recipe name as a string.
+
+        Return: The removed recipe, or None if it was not in the cook book.
+        """
+        recipe = self.find(name)
+        if recipe is not None:
+            with self.pool.connection() as connection:
+                connection.execute("DELETE FROM recipe WHERE folded_name = ?",
+                                   (CookBook.fold(name),))
+        return recipe
+
+    def names_with_prefix(self, prefix: str) -> list[str]:
+        """
+        Lists the names of recipes starting with a prefix, ignoring case, in
+        the order they were added.
+
+        Parameters: Prefix as a string.
+
+        Return: List of recipe names.
+        """
+        prefix = CookBook.fold(prefix)
+        if not prefix:
+            return [recipe.name for recipe in self]
+        # Range scan on the unique index instead of LIKE
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT name FROM recipe WHERE folded_name >= ? "
+                "AND folded_name < ? ORDER BY id", (prefix, upper)).fetchall()
+        return [row[0] for row in rows]
+
+    def recipes_using(self, ingredient: str, prefix: bool = False,
+                      limit: int | None = None) -> list[tuple[str, float, str, str]]:
+        """
+        Lists the recipes using an ingredient, matching ingredient names the
+        same way as CookBook.recipes_using.
+
+        Parameters: Ingredient name or part of one as a string, whether to
+        match word prefixes and an optional limit on the number of results.
+
+        Return: List of (recipe name, amount, measure, ingredient name)
+        tuples, in the order recipes were added.
+        """
+        with self.pool.connection() as connection:
+            # The distinct names come from the ingredient index; only the
+            # rows of matching names are read
+            names = [row[0] for row in connection.execute(
+                "SELECT DISTINCT name FROM ingredient")
+                if matches(row[0], ingredient, prefix)]
+            if not names:
+                return []
+            rows = connection.execute(
+                "SELECT r.name, i.amount, i.measure, i.name "
+                "FROM ingredient i JOIN recipe r ON r.id = i.recipe_id "
+                "WHERE i.name IN (SELECT value FROM json_each(?)) "
+                "ORDER BY r.id, i.position LIMIT ?",
+                (json.dumps(names), -1 if limit is None else limit)
+            ).fetchall()
+        return rows
+
+    def similar_names(self, name: str, limit: int = 5) -> list[str]:
+        """
+        Lists the names of recipes most similar to a possibly mistyped name.
+        The name index is built on first use and built again once recipes
+        have been added or removed since.
+
+        Parameters: Recipe name as a string and the largest number of names
+        to return.
+
+        Return: List of recipe names, most similar first.
+        """
+        with self.pool.connection() as connection:
+            state = connection.execute("SELECT COUNT(*), MAX(id) FROM recipe"
+                                       ).fetchone()
+            if self._names is None or self._names[0] != state:
+                rows = connection.execute(
+                    "SELECT name FROM recipe ORDER BY id").fetchall()
+                self._names = (state, NameIndex(row[0] for row in rows))
+        return [found for found, _ in self._names[1].similar(name, limit)]
+
+    def __iter__(self):
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT name, raw_ingredients FROM recipe ORDER BY id"
+            ).fetchall()
+        return iter([compile_recipe(row) for row in rows])
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def __len__(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM recipe"
+                                      ).fetchone()[0]
+
+
+class SQLitePlan:
+    """
+    A meal plan stored in the database. It has the same append, remove,
+    adjust and shopping_list operations as MealPlan, with the shopping list
+    worked out by the database.
+
+    Parameters: The connection pool of the database and the plan's id.
+    """
+
+    def __init__(self, pool: ConnectionPool, plan_id: int) -> None:
+        self.pool = pool
+        self.plan_id = plan_id
+
+    def append(self, recipe: Recipe | ScaledRecipe | tuple[str, str]) -> None:
+        """
+        Adds a recipe to the plan, or makes a recipe already in the plan
+        more times. Recipes not yet in the cook book are added to it.
+
+        Parameters: Recipe as a Recipe, a ScaledRecipe giving the number of
+        servings, or a tuple containing two strings.
+
+        Return: Returns None.
+        """
+        recipe, servings = servings_of(recipe)
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT id FROM recipe WHERE folded_name = ?",
+                (CookBook.fold(recipe.name),)).fetchone()
+            recipe_id = _store_recipe(connection, recipe) if row is None \
+                else row[0]
+            entry = connection.execute(
+                "SELECT MIN(id) FROM plan_recipe WHERE plan_id = ? "
+                "AND recipe_id = ?", (self.plan_id, recipe_id)).fetchone()
+            if entry[0] is None:
+                connection.execute(
+                    "INSERT INTO plan_recipe(plan_id, recipe_id, servings) "
+                    "VALUES (?, ?, ?)", (self.plan_id, recipe_id, servings))
+            else:
+                connection.execute(
+                    "UPDATE plan_recipe SET servings = servings + ? "
+                    "WHERE id = ?", (servings, entry[0]))
+        return None
+
+    def remove(self, recipe: Recipe | ScaledRecipe | tuple[str, str]) -> None:
+        """
+        Takes servings of a recipe off the plan, one for plain recipes. The
+        recipe leaves the plan once no servings are left.
+
+        Parameters: Recipe as a Recipe, a ScaledRecipe giving the number of
+        servings, or a tuple containing two strings.
+
+        Return: Returns None. Raises ValueError if the recipe is not in the
+        plan, like list.remove.
+        """
+        servings = recipe.servings if isinstance(recipe, ScaledRecipe) \
+            else 1.0
+        with self.pool.connection() as connection:
+            row = connection.execute(
+                "SELECT pr.id, pr.servings FROM plan_recipe pr "
+                "JOIN recipe r ON r.id = pr.recipe_id "
+                "WHERE pr.plan_id = ? AND r.folded_name = ? "
+                "ORDER BY pr.id LIMIT 1",
+                (self.plan_id, CookBook.fold(recipe[0]))).fetchone()
+            if row is None:
+                raise ValueError("recipe is not in the meal plan")
+            entry_id, current = row
+            if current - servings > _EPSILON * current:
+                connection.execute(
+                    "UPDATE plan_recipe SET servings = ? WHERE id = ?",
+                    (current - servings, entry_id))
+                return None
+            connection.execute("DELETE FROM plan_recipe WHERE id = ?",
+                               (entry_id,))
+            # Adjustments go with the row once nothing in the plan needs it
+            connection.execute(
+                "DELETE FROM plan_adjustment WHERE plan_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM plan_recipe pr JOIN ingredient i "
+                "ON i.recipe_id = pr.recipe_id WHERE pr.plan_id = ? "
+                "AND i.name = plan_adjustment.name "
+                "AND i.dimension = plan_adjustment.dimension)",
+                (self.plan_id, self.plan_id))
+        return None
+
+    def _totals(self, connection: sqlite3.Connection, name: str | None = None):
+        if name is None:
+            return connection.execute(AGGREGATE_QUERY.format(extra=''),
+                                      (self.plan_id,)).fetchall()
+        return connection.execute(AGGREGATE_QUERY.format(extra='AND i.name = ?'),
+                                  (self.plan_id, name)).fetchall()
+
+    def aggregate(self) -> list[tuple[float, str, str]]:
+        """
+        Generates the plan's shopping list with a GROUP BY query, without
+        manual adjustments.
+
+        Return: List of tuples containing float of amount, and strings of
+        measure and ingredient name.
+        """
+        with self.pool.connection() as connection:
+            rows = self._totals(connection)
+        return [(from_base(total, measure), measure, name)
+                for name, _, measure, total, _ in rows]
+
+    def adjust(self, ingredient_name: str, amount: float) -> None:
+        """
+        Removes an amount of an ingredient from the shopping list, in the
+        measure it is shown in. The adjustment is stored with the plan.
+
+        Parameters: Ingredient name as a string and amount as a float.
+
+        Return: Returns None.
+        """
+        with self.pool.connection() as connection:
+            rows = self._totals(connection, ingredient_name)
+            if not rows:
+                return None
+            name, dimension, measure, total, _ = rows[0]
+            row = connection.execute(
+                "SELECT base_amount FROM plan_adjustment WHERE plan_id = ? "
+                "AND name = ? AND dimension = ?",
+                (self.plan_id, name, dimension)).fetchone()
+            adjusted = 0.0 if row is None else row[0]
+            remaining = total - adjusted
+            if remaining <= 0.0:
+                return None
+            # Never remove more than is currently on the list
+            removed = min(amount * unit_info(measure)[1], remaining)
+            connection.execute(
+                "INSERT INTO plan_adjustment VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(plan_id, name, dimension) DO UPDATE SET "
+                "base_amount = base_amount + excluded.base_amount",
+                (self.plan_id, name, dimension, removed))
+        return None
+
+    def shopping_list(self, pantry: Pantry | None = None) -> list[tuple[float, str, str]]:
+        """
+        Returns the plan's shopping list with manual adjustments applied.
+
+        Parameters: Optionally a Pantry whose stock is taken off the list in
+        the same pass.
+
+        Return: List of tuples containing float of amount, and strings of
+        measure and ingredient name.
+        """
+        with self.pool.connection() as connection:
+            rows = self._totals(connection)
+            adjustments = dict(((name, dimension), base_amount)
+                               for name, dimension, base_amount in
+                               connection.execute(
+                                   "SELECT name, dimension, base_amount "
+                                   "FROM plan_adjustment WHERE plan_id = ?",
+                                   (self.plan_id,)))
+        shopping_list = []
+        stock = {} if pantry is None else pantry.base_amounts
+        for name, dimension, measure, total, _ in rows:
+            if adjustments or stock:
+                key = (name, dimension)
+                total -= adjustments.get(key, 0.0) + stock.get(key, 0.0)
+                if total <= _EPSILON * max(abs(total), 1.0):
+                    continue
+            shopping_list.append((from_base(total, measure), measure, name))
+        return shopping_list
+
+    def __iter__(self):
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT r.name, r.raw_ingredients, pr.servings "
+                "FROM plan_recipe pr JOIN recipe r ON r.id = pr.recipe_id "
+                "WHERE pr.plan_id = ? ORDER BY pr.id",
+                (self.plan_id,)).fetchall()
+        # Recipes made once are given as they are
+        return iter([compile_recipe(row) if row[2] == 1.0
+                     else ScaledRecipe(row[:2], row[2]) for row in rows])
+
+    def __len__(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM plan_recipe WHERE plan_id = ?",
+                (self.plan_id,)).fetchone()[0]
+
+    def __repr__(self) -> str:
+        return repr(list(self))
@@ -0,0 +1,110 @@
+"""
+Single-pass shopping list generation over any iterable of recipes, such as
+rows read from a file or fetched from a database cursor. Recipes are parsed
+and merged one at a time and never kept, so memory grows with the number of
+distinct ingredients rather than the number of recipes.
+"""
+
+from recipe import Ingredient, Recipe, ScaledRecipe
+from shopping_list import ShoppingList
+
+# Recipes between two partial results when no interval is given
+DEFAULT_EVERY = 10000
+
+
+def _ingredients_of(recipe) -> tuple[Ingredient, ...] | list[Ingredient]:
+    # Tuples are parsed directly rather than through the compiled recipe
+    # cache, so a long stream does not push the cook book's recipes out
+    if isinstance(recipe, Recipe):
+        return recipe.ingredients
+    if isinstance(recipe, ScaledRecipe):
+        return recipe.recipe.ingredients
+    if not recipe[1]:
+        return []
+    return [Ingredient.from_string(raw_ingredient)
+            for raw_ingredient in recipe[1].split(',')]
+
+
+def iter_ingredients(recipes):
+    """
+    Parses the ingredients of each recipe as it is reached.
+
+    Parameters: Iterable of recipes, as Recipe objects or tuples containing
+    two strings.
+
+    Return: Generator of Ingredient.
+
+    Example:
+    >>> next(iter_ingredients([PEANUT_BUTTER]))
+    Ingredient(300.0, 'g', 'peanuts')
+    """
+    for recipe in recipes:
+        yield from _ingredients_of(recipe)
+
+
+def iter_running_totals(recipes, every: int = DEFAULT_EVERY):
+    """
+    Aggregates recipes in one pass, yielding the running shopping list after
+    every so many recipes and at the end.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings, and the number of recipes between
+    results.
+
+    Return: Generator of tuples containing the number of recipes read so far
+    and the shopping list up to them. The same ShoppingList is yielded each
+    time and keeps changing, so copy it with to_list to keep a snapshot.
+
+    Example:
+    >>> for count, totals in iter_running_totals(COOK_BOOK, every=4):
+    ...     print(count, len(totals))
+    4 34
+    6 41
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    shopping_list = ShoppingList()
+    merge_base = shopping_list.merge_base
+    count = 0
+    for recipe in recipes:
+        servings = recipe.servings if isinstance(recipe, ScaledRecipe) \
+            else 1.0
+        for ingredient in _ingredients_of(recipe):
+            merge_base(ingredient.base_amount * servings,
+                       ingredient.dimension, ingredient.measure,
+                       ingredient.name)
+        count += 1
+        if count % every == 0:
+            yield count, shopping_list
+    # The end, unless it was just yielded
+    if count % every or not count:
+        yield count, shopping_list
+
+
+def stream_shopping_list(recipes, partial_results=None,
+                         every: int = DEFAULT_EVERY) -> list[tuple[float, str, str]]:
+    """
+    Generates the shopping list of recipes in a single pass without holding
+    them in memory. The result matches generate_shopping_list.
+
+    Parameters: Iterable of recipes, as Recipe objects, ScaledRecipe entries
+    or tuples containing two strings. Optionally a callback given the number
+    of recipes read and the shopping list so far every so many recipes, and
+    that number.
+
+    Return: Returns the shopping list of ingredients formatted as a list
+    of tuples containing float of amount, and strings of measure and
+    ingredient name.
+
+    Example:
+    >>> rows = (line.rstrip('\\n').split('|') for line in open('recipes.txt'))
+    >>> stream_shopping_list(rows, lambda count, totals: print(count),
+    ...                      every=100000)
+    100000
+    200000
+    [(3000000.0, 'g', 'peanuts'), (1.5, 'tsp', 'salt'), ...]
+    """
+    for count, shopping_list in iter_running_totals(recipes, every):
+        if partial_results is not None and count and count % every == 0:
+            partial_results(count, shopping_list.to_list())
+    return shopping_list.to_list()
@@ -0,0 +1,210 @@
+"""
+Renders shopping lists as text. Every output format builds its rows from a
+precompiled row template and writes them to the file in one call, or in one
+call per chunk for very long lists, instead of printing row by row. The
+formats are
+
+    table     the padded table display_ingredients has always printed
+    tsv       tab separated values with a header row
+    json      a JSON array of objects with an amount, measure and ingredient
+    markdown  a Markdown table
+
+The widths of the measure and ingredient name columns can be tracked as
+rows come and go with ColumnWidths, so showing a list does not need to
+measure every row again.
+"""
+
+import sys
+from json.encoder import encode_basestring
+
+# Output formats understood by render and write_table
+FORMATS = ('table', 'tsv', 'json', 'markdown')
+# Rows written per call to the file when no page size is given
+CHUNK_ROWS = 4096
+
+
+class ColumnWidths:
+    """
+    The widest value of each text column of a table, kept up to date as rows
+    are added and removed. Each column counts its values by width, so adding
+    is constant time and removing only looks at the distinct widths when the
+    widest value goes.
+
+    Parameters: Number of columns.
+
+    Example:
+    >>> widths = ColumnWidths(2)
+    >>> widths.add('tbsp', 'peanut butter')
+    >>> widths.add('g', 'salt')
+    >>> widths.discard('tbsp', 'peanut butter')
+    >>> widths.widths()
+    (1, 4)
+    """
+
+    __slots__ = ('_counts', '_widest')
+
+    def __init__(self, columns: int) -> None:
+        # Maps each width in a column to the number of values that wide
+        self._counts = [{} for _ in range(columns)]
+        self._widest = [0] * columns
+
+    def add(self, *cells: str) -> None:
+        """
+        Counts the values of a new row, one per column.
+        """
+        for column, cell in enumerate(cells):
+            width = len(cell)
+            counts = self._counts[column]
+            counts[width] = counts.get(width, 0) + 1
+            if width > self._widest[column]:
+                self._widest[column] = width
+
+    def discard(self, *cells: str) -> None:
+        """
+        Forgets the values of a removed row, one per column.
+        """
+        for column, cell in enumerate(cells):
+            width = len(cell)
+            counts = self._counts[column]
+            if counts[width] > 1:
+                counts[width] -= 1
+                continue
+            del counts[width]
+            if width == self._widest[column]:
+                self._widest[column] = max(counts, default=0)
+
+    def widths(self) -> tuple[int, ...]:
+        """
+        Returns the width of the widest value in each column.
+        """
+        return tuple(self._widest)
+
+
+def render(shopping_list: list[tuple[float, str, str]],
+           output_format: str = 'table',
+           widths: tuple[int, int] | None = None) -> str:
+    """
+    Renders a shopping list as one string.
+
+    Parameters: The shopping list as a list of tuples containing float of
+    amount, and strings of measure and ingredient name, the output format
+    and optionally the widths of the measure and name columns, measured
+    from the list when not given.
+
+    Return: The rendered text.
+
+    Example:
+    >>> render([(1.0, 'large', 'banana'), (0.5, 'cup', 'ice')], 'tsv')
+    'amount\\tmeasure\\tingredient\\n1.0\\tlarge\\tbanana\\n0.5\\tcup\\tice\\n'
+    """
+    chunks = []
+    write_table(shopping_list, chunks.append, output_format, widths)
+    return ''.join(chunks)
+
+
+def write_table(shopping_list: list[tuple[float, str, str]], file=None,
+                output_format: str = 'table',
+                widths: tuple[int, int] | None = None,
+                page_size: int | None = None, pause=None) -> None:
+    """
+    Writes a shopping list to a file with one write per chunk of rows.
+
+    Parameters: The shopping list as a list of tuples containing float of
+    amount, and strings of measure and ingredient name. Optionally the file
+    or write function to write to, standard output by default, the output
+    format, the widths of the measure and name columns, the number of rows
+    per write, and a function called between writes that stops the output
+    by returning False, for paging.
+
+    Return: Returns None. Raises ValueError for an unknown format.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"unknown output format {output_format!r}, "
+                         f"expected one of {', '.join(FORMATS)}")
+    if file is None:
+        file = sys.stdout
+    write = file if callable(file) else file.write
+    if not isinstance(shopping_list, list):
+        shopping_list = list(shopping_list)
+    header, separator, footer = _FRAMES[output_format]
+    if not shopping_list:
+        # An empty table prints nothing, other formats still frame it
+        if output_format == 'json':
+            write('[]\n')
+        elif output_format != 'table':
+            write(header)
+        return None
+    format_rows = _ROW_FORMATTERS[output_format]
+    size = page_size or CHUNK_ROWS
+    row_widths = None
+    if output_format == 'table':
+        row_widths = _table_widths(shopping_list, widths)
+    for start in range(0, len(shopping_list), size):
+        if start and pause is not None and not pause():
+            return None
+        lines = format_rows(shopping_list[start:start + size], row_widths)
+        text = separator.join(lines)
+        if start == 0:
+            text = header + text
+        if start + size >= len(shopping_list):
+            write(text + footer)
+        else:
+            write(text + separator)
+    return None
+
+
+def _table_widths(shopping_list, widths) -> tuple[int, int, int]:
+    # Amounts change with every recipe, so their width is always measured
+    amount_width = max(len(str(item[0])) for item in shopping_list)
+    if widths is None:
+        widths = (max(len(item[1]) for item in shopping_list),
+                  max(len(item[2]) for item in shopping_list))
+    return (amount_width,) + tuple(widths)
+
+
+def _table_rows(rows, widths) -> list[str]:
+    amount_width, measure_width, name_width = widths
+    # Odd length measures sit one space further right, as they always have
+    odd = (f"| {{:>{amount_width}}} |  {{:^{measure_width}}} "
+           f"| {{:<{name_width}}}  |").format
+    even = (f"| {{:>{amount_width}}} | {{:^{measure_width}}}  "
+            f"| {{:<{name_width}}}  |").format
+    return [(odd if len(measure) & 1 else even)(amount, measure, name)
+            for amount, measure, name in rows]
+
+
+def _tsv_rows(rows, widths) -> list[str]:
+    return [f"{amount}\t{measure}\t{name}" for amount, measure, name in rows]
+
+
+def _json_rows(rows, widths) -> list[str]:
+    return [f'  {{"amount": {amount!r}, '
+            f'"measure": {encode_basestring(measure)}, '
+            f'"ingredient": {encode_basestring(name)}}}'
+            for amount, measure, name in rows]
+
+
+def _markdown_rows(rows, widths) -> list[str]:
+    return [f"| {amount} | {_markdown_cell(measure)} "
+            f"| {_markdown_cell(name)} |" for amount, measure, name in rows]
+
+
+def _markdown_cell(text: str) -> str:
+    return text.replace('|', '\\|') if '|' in text else text
+
+
+_ROW_FORMATTERS = {
+    'table': _table_rows,
+    'tsv': _tsv_rows,
+    'json': _json_rows,
+    'markdown': _markdown_rows,
+}
+
+# Text written before the first row, between rows and after the last row
+_FRAMES = {
+    'table': ('', '\n', '\n'),
+    'tsv': ('amount\tmeasure\tingredient\n', '\n', '\n'),
+    'json': ('[\n', ',\n', '\n]\n'),
+    'markdown': ('| amount | measure | ingredient |\n| ---: | :---: | :--- |\n',
+                 '\n', '\n'),
+}
@@ -0,0 +1,59 @@
+"""
+Tests that the meal plan's running shopping list matches one generated
+afresh from the plan.
+"""
+
+import importlib
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+from meal_plan import MealPlan
+from recipe import ScaledRecipe
+
+INGREDIENTS = ['1 tbsp salt', '1 tsp salt', '2 g sugar', '1 kg sugar',
+               '1 cup flour', '100 g flour', '3 ml oil', '1 tbsp oil',
+               '1 each egg', '2 g yeast', '1 cup water', '5 ml water']
+
+
+def assert_same_list(test: unittest.TestCase, meal_plan: MealPlan) -> None:
+    expected = shop_mania.generate_shopping_list(list(meal_plan))
+    found = meal_plan.shopping_list()
+    test.assertEqual([row[1:] for row in found],
+                     [row[1:] for row in expected])
+    for (amount, _, _), (expected_amount, _, _) in zip(found, expected):
+        test.assertAlmostEqual(amount, expected_amount, places=6)
+
+
+class MealPlanRemoveTest(unittest.TestCase):
+
+    def test_remove_first_user_of_a_row(self):
+        first = ('a', '1 tbsp salt,1 g x')
+        second = ('b', '1 g y,1 tsp salt')
+        meal_plan = MealPlan([first, second])
+        meal_plan.remove(first)
+        self.assertEqual(meal_plan.shopping_list(),
+                         [(1.0, 'g', 'y'), (1.0, 'tsp', 'salt')])
+        self.assertEqual(meal_plan.shopping_list(),
+                         shop_mania.generate_shopping_list([second]))
+
+    def test_remove_matches_regeneration(self):
+        rng = random.Random(6)
+        recipes = [(f'recipe {chr(ord("a") + i)}',
+                    ','.join(rng.sample(INGREDIENTS, rng.randint(1, 5))))
+                   for i in range(12)]
+        meal_plan = MealPlan()
+        for _ in range(300):
+            recipe = rng.choice(recipes)
+            if meal_plan.servings(recipe) and rng.random() < 0.5:
+                meal_plan.remove(recipe)
+            else:
+                meal_plan.append(ScaledRecipe(recipe, rng.choice((1, 2))))
+            assert_same_list(self, meal_plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
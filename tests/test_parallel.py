@@ -0,0 +1,60 @@
+"""
+Tests that parallel shopping list generation matches the serial path.
+"""
+
+import importlib
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+shop_mania = importlib.import_module('shop-mania')
+from constants import PEANUT_BUTTER, SEITAN
+from parallel import aggregate_parallel
+from recipe import ScaledRecipe, compile_recipe
+from shopping_list import ShoppingList
+
+# Amounts whose sums round differently depending on the order they are
+# added in
+THIRDS = ('thirds', '1/3 g flour,0.1 g salt,2/7 tsp oil,1/3 tbsp oil')
+SEVENTHS = ('sevenths', '123456.7 g flour,1/7 g salt,1/3 tsp oil')
+
+
+class AggregateParallelTest(unittest.TestCase):
+
+    def test_scaled_plan_in_one_shard(self):
+        meal_plan = [ScaledRecipe(PEANUT_BUTTER, 3), SEITAN]
+        self.assertEqual(aggregate_parallel(meal_plan, workers=1),
+                         shop_mania.generate_shopping_list(meal_plan))
+        self.assertEqual(aggregate_parallel(meal_plan)[0],
+                         (900.0, 'g', 'peanuts'))
+
+    def test_scaled_plan_in_many_shards(self):
+        meal_plan = [ScaledRecipe(PEANUT_BUTTER, 3), SEITAN,
+                     ScaledRecipe(SEITAN, 2.5), PEANUT_BUTTER] * 5
+        with ThreadPoolExecutor(2) as executor:
+            found = aggregate_parallel(meal_plan, workers=2, shard_size=3,
+                                       executor=executor)
+        self.assertEqual(found, shop_mania.generate_shopping_list(meal_plan))
+
+    def test_fractional_amounts_match_shopping_list(self):
+        meal_plan = [THIRDS, SEVENTHS, ScaledRecipe(THIRDS, 1.1)] * 40
+        expected = ShoppingList()
+        for entry in meal_plan:
+            servings = entry.servings if isinstance(entry, ScaledRecipe) \
+                else 1.0
+            for ingredient in compile_recipe(entry).ingredients:
+                expected.merge_base(ingredient.base_amount * servings,
+                                    ingredient.dimension, ingredient.measure,
+                                    ingredient.name)
+        for shard_size in (1, 7, 50):
+            with ThreadPoolExecutor(3) as executor:
+                found = aggregate_parallel(meal_plan, workers=3,
+                                           shard_size=shard_size,
+                                           executor=executor)
+            self.assertEqual(found, expected.to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
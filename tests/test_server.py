@@ -0,0 +1,66 @@
+"""
+Tests for the HTTP API, talking to a server on the loopback interface.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from constants import COOK_BOOK
+from cook_book import CookBook
+from server import ShopManiaServer, request
+
+
+class RecipesTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = ShopManiaServer(CookBook(COOK_BOOK))
+        self.port = await self.server.start('127.0.0.1', 0)
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def call(self, method, path, data=None):
+        return await request('127.0.0.1', self.port, method, path, data)
+
+    async def test_add_and_get_recipe(self):
+        status, payload = await self.call(
+            'POST', '/recipes', {'name': ' toast ',
+                                 'ingredients': ['2 each bread', '20 g jam']})
+        self.assertEqual(status, 201)
+        self.assertEqual(payload, {'name': 'toast',
+                                   'ingredients': '2 each bread,20 g jam'})
+        status, payload = await self.call('GET', '/recipes/toast')
+        self.assertEqual((status, payload['name']), (200, 'toast'))
+
+    async def test_malformed_recipes_are_rejected(self):
+        for data in ({'name': 5, 'ingredients': '1 g salt'},
+                     {'name': 'salty', 'ingredients': 5},
+                     {'name': 'salty', 'ingredients': ['1 g salt', 2]},
+                     {'name': '', 'ingredients': '1 g salt'},
+                     {'name': '   ', 'ingredients': '1 g salt'},
+                     {'name': 'salty', 'ingredients': 'lots of salt'},
+                     {'ingredients': '1 g salt'},
+                     ['salty', '1 g salt'],
+                     None):
+            with self.subTest(data=data):
+                status, payload = await self.call('POST', '/recipes', data)
+                self.assertEqual(status, 400)
+                self.assertIn('error', payload)
+        self.assertEqual((await self.call('GET', '/recipes/salty'))[0], 404)
+
+    async def test_missing_recipes(self):
+        for method in ('GET', 'DELETE'):
+            with self.subTest(method=method):
+                status, payload = await self.call(method, '/recipes/gruel')
+                self.assertEqual(status, 404)
+                self.assertIn('error', payload)
+        status, _ = await self.call('POST', '/shopping-list',
+                                    {'recipes': ['gruel']})
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
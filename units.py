@@ -0,0 +1,170 @@
+"""
+Units of measure. Every known measure belongs to a dimension (mass, volume
+or count) and has a factor into that dimension's base unit (grams,
+millilitres or items). Conversions between measures are precomputed once.
+"""
+
+from functools import lru_cache
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Base units the dimensions are stored in
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'each'}
+
+# Measure -> (dimension, factor into the base unit)
+UNITS = {
+    'mg': (MASS, 0.001),
+    'g': (MASS, 1.0),
+    'kg': (MASS, 1000.0),
+    'oz': (MASS, 28.349523125),
+    'lb': (MASS, 453.59237),
+    'ml': (VOLUME, 1.0),
+    'l': (VOLUME, 1000.0),
+    'tsp': (VOLUME, 4.92892159375),
+    'tbsp': (VOLUME, 14.78676478125),
+    'cup': (VOLUME, 236.5882365),
+    'pint': (VOLUME, 473.176473),
+    'each': (COUNT, 1.0),
+    'dozen': (COUNT, 12.0),
+}
+
+# Alternative spellings of the measures above
+ALIASES = {
+    'milligram': 'mg', 'milligrams': 'mg',
+    'gram': 'g', 'grams': 'g', 'gm': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
+    'ounce': 'oz', 'ounces': 'oz',
+    'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'millilitre': 'ml', 'millilitres': 'ml', 'milliliter': 'ml',
+    'milliliters': 'ml',
+    'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbs': 'tbsp',
+    'cups': 'cup',
+    'pints': 'pint',
+    'piece': 'each', 'pieces': 'each', 'whole': 'each',
+}
+
+# Decimal places kept when converting out of base units, which hides
+# rounding noise such as 0.30000000000000004
+DISPLAY_PRECISION = 9
+
+
+def _build_conversion_matrix() -> dict[str, dict[str, float]]:
+    # Factor from every measure to every other measure of the same dimension
+    matrix = {}
+    for source, (source_dimension, source_factor) in UNITS.items():
+        matrix[source] = {
+            target: source_factor / target_factor
+            for target, (target_dimension, target_factor) in UNITS.items()
+            if target_dimension == source_dimension
+        }
+    return matrix
+
+
+CONVERSION = _build_conversion_matrix()
+
+
+def canonical_unit(measure: str) -> str | None:
+    """
+    Returns the canonical spelling of a measure, or None if it is not a
+    known unit.
+
+    Parameters: Measure as a string.
+
+    Return: The canonical unit as a string, or None.
+
+    Example:
+    >>> canonical_unit('Tablespoons')
+    'tbsp'
+    >>> canonical_unit('large')
+    """
+    unit = measure.lower()
+    unit = ALIASES.get(unit, unit)
+    return unit if unit in UNITS else None
+
+
+@lru_cache(maxsize=1024)
+def unit_info(measure: str) -> tuple[str, float]:
+    """
+    Returns the dimension of a measure and its factor into the base unit.
+    Measures that are not units, such as 'large' or 'stalk', describe a
+    number of items and are counted one to one.
+
+    Parameters: Measure as a string.
+
+    Return: Tuple of the dimension as a string and the factor as a float.
+
+    Example:
+    >>> unit_info('tbsp')
+    ('volume', 14.78676478125)
+    >>> unit_info('large')
+    ('count', 1.0)
+    """
+    unit = canonical_unit(measure)
+    if unit is None:
+        return (COUNT, 1.0)
+    return UNITS[unit]
+
+
+def to_base(amount: float, measure: str) -> tuple[float, str]:
+    """
+    Converts an amount into the base unit of its dimension.
+
+    Parameters: Amount as a float and measure as a string.
+
+    Return: Tuple of the base amount as a float and the dimension.
+
+    Example:
+    >>> to_base(2.0, 'kg')
+    (2000.0, 'mass')
+    """
+    dimension, factor = unit_info(measure)
+    return (amount * factor, dimension)
+
+
+def from_base(base_amount: float, measure: str) -> float:
+    """
+    Converts a base amount back into the given measure for display.
+
+    Parameters: Base amount as a float and measure as a string.
+
+    Return: The amount in the given measure.
+
+    Example:
+    >>> from_base(34.50245115625, 'tbsp')
+    2.333333333
+    """
+    return round(base_amount / unit_info(measure)[1], DISPLAY_PRECISION)
+
+
+def convert(amount: float, source: str, target: str) -> float | None:
+    """
+    Converts an amount between two measures using the precomputed
+    conversion matrix. Identical measures convert without any arithmetic.
+
+    Parameters: Amount as a float, source and target measures as strings.
+
+    Return: The converted amount, or None if the measures have different
+    dimensions.
+
+    Example:
+    >>> convert(1.0, 'tbsp', 'tsp')
+    3.0
+    >>> convert(1.0, 'cup', 'g')
+    """
+    if source == target:
+        return amount
+    source_unit = canonical_unit(source)
+    target_unit = canonical_unit(target)
+    if source_unit is None or target_unit is None:
+        # Descriptive measures only match other counts one to one
+        if unit_info(source)[0] == unit_info(target)[0] == COUNT:
+            return amount * unit_info(source)[1] / unit_info(target)[1]
+        return None
+    factor = CONVERSION[source_unit].get(target_unit)
+    if factor is None:
+        return None
+    return amount * factor